@@ -1,32 +1,84 @@
 import os
+import contextlib
 import random
-import asyncio
-import aiohttp
 import time
 import platform
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.common.keys import Keys
-from pydub import AudioSegment
-import speech_recognition as sr
+
+# asyncio, aiohttp, pydub e speech_recognition só são usados no desafio de áudio e são
+# importados quando ele aparece, para não pesar na abertura do programa
+
+# Lê o estado do reCAPTCHA no documento principal com uma única chamada
+SOLVED_STATE_SCRIPT = """
+if (window.grecaptcha && typeof window.grecaptcha.getResponse === 'function') {
+    try {
+        if (window.grecaptcha.getResponse()) { return true; }
+    } catch (e) {}
+}
+var fields = document.querySelectorAll('textarea[name="g-recaptcha-response"]');
+for (var i = 0; i < fields.length; i++) {
+    if (fields[i].value) { return true; }
+}
+return false;
+"""
+
+CHALLENGE_FRAME_XPATH = '//iframe[@title="recaptcha challenge expires in two minutes"]'
+
+# Prazos (s) das chamadas de rede fora do navegador: encerrar o navegador
+# (watchdog de etapas) não interrompe o download do áudio nem a transcrição
+AUDIO_DOWNLOAD_TIMEOUT = 20
+RECOGNIZE_TIMEOUT = 15
+
+
+def default_strategy(is_windows_10=False):
+    """Parâmetros usados quando quem chama não informa uma estratégia"""
+    return {
+        "skip_checkbox_wait": False,
+        "checkbox_wait": 1.0,
+        "frame_timeout": 10 if is_windows_10 else 5,
+        "audio_attempts": 3,
+        "solve_retries": 3 if is_windows_10 else 1,
+        "recognizers": ["google"],
+    }
 
 
 class RecaptchaSolver:
-    def __init__(self, driver, debug_mode=False):
+    def __init__(
+        self, driver, debug_mode=False, strategy=None, cancel_check=None, timer=None
+    ):
         self.driver = driver
         self.debug_mode = debug_mode
+        # Chamado durante as esperas; deve levantar uma exceção para cancelar
+        self.cancel_check = cancel_check or (lambda: None)
+        # timer(etapa) -> context manager que mede a etapa (checkbox / áudio)
+        self.timer = timer or (lambda stage: contextlib.nullcontext())
         self.is_windows_10 = (
             platform.system() == "Windows" and platform.release().startswith("10")
         )
 
+        # Parâmetros de resolução (podem ser ajustados por quem chama)
+        self.strategy = default_strategy(self.is_windows_10)
+        self.strategy.update(strategy or {})
+
+        # Resultado da última chamada a solveCaptcha (para telemetria)
+        self.last_attempt = {}
+
+        # Indica se o driver está dentro de um iframe do reCAPTCHA
+        self.in_frame = False
+
         if self.debug_mode:
             print(
                 f"RecaptchaSolver inicializado no {'Windows 10' if self.is_windows_10 else platform.system() + ' ' + platform.release()}"
             )
 
     async def download_audio(self, url, path):
-        async with aiohttp.ClientSession() as session:
+        import aiohttp
+
+        timeout = aiohttp.ClientTimeout(total=AUDIO_DOWNLOAD_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
             async with session.get(url) as response:
                 with open(path, "wb") as f:
                     f.write(await response.read())
@@ -36,45 +88,68 @@ class RecaptchaSolver:
         if self.debug_mode:
             print("Iniciando solução de CAPTCHA...")
 
+        t0 = time.time()
+        self.last_attempt = {
+            "success": False,
+            "checkbox_passed": False,
+            "checkbox_checked": not self.strategy["skip_checkbox_wait"],
+            "audio_attempts": 0,
+            "recognizer": None,
+            "frame_wait": None,
+            "duration": 0.0,
+            "error": None,
+        }
+
         # Detectar o tipo de CAPTCHA presente na página
         captcha_type = self._detect_captcha_type()
 
         if self.debug_mode:
             print(f"Tipo de CAPTCHA detectado: {captcha_type}")
 
-        # Ajustar timeouts para o Windows 10
-        wait_time = 5
-        if self.is_windows_10:
-            wait_time = 10
+        wait_time = self.strategy["frame_timeout"]
 
         try:
-            # Switch to the CAPTCHA iframe
-            iframe_inner = WebDriverWait(self.driver, wait_time).until(
-                EC.frame_to_be_available_and_switch_to_it(
-                    (By.XPATH, "//iframe[contains(@title, 'reCAPTCHA')]")
+            with self.timer("captcha_checkbox"):
+                # Switch to the CAPTCHA iframe
+                iframe_inner = self._until(
+                    wait_time,
+                    EC.frame_to_be_available_and_switch_to_it(
+                        (By.XPATH, "//iframe[contains(@title, 'reCAPTCHA')]")
+                    )
                 )
-            )
-
-            # Click on the CAPTCHA box
-            WebDriverWait(self.driver, wait_time).until(
-                EC.element_to_be_clickable((By.ID, "recaptcha-anchor"))
-            ).click()
-
-            # Check if the CAPTCHA is solved
-            time.sleep(1)  # Allow some time for the state to update
-            if self.isSolved():
-                print("CAPTCHA solved by clicking.")
-                self.driver.switch_to.default_content()  # Switch back to main content
-                return
+                self.in_frame = True
+                self.last_attempt["frame_wait"] = round(time.time() - t0, 3)
+
+                # Click on the CAPTCHA box
+                self._until(
+                    wait_time,
+                    EC.element_to_be_clickable((By.ID, "recaptcha-anchor"))
+                ).click()
+
+                # Check if the CAPTCHA is solved (skipped when the checkbox never passes here)
+                if not self.strategy["skip_checkbox_wait"]:
+                    if self.waitSolved(self.strategy["checkbox_wait"]):
+                        print("CAPTCHA solved by clicking.")
+                        self.last_attempt["checkbox_passed"] = True
+                        self.last_attempt["success"] = True
+                        return
+                elif self.debug_mode:
+                    print("Pulando espera do checkbox (histórico indica que não passa)")
 
             # If not solved, attempt audio CAPTCHA solving
-            self.solveAudioCaptcha()
+            with self.timer("captcha_audio"):
+                self.solveAudioCaptcha()
+            self.last_attempt["success"] = True
 
         except Exception as e:
             print(f"An error occurred while solving CAPTCHA: {e}")
-            self.driver.switch_to.default_content()  # Ensure we switch back in case of error
+            self.last_attempt["error"] = type(e).__name__
+            self.leaveFrame(force=True)  # Ensure we switch back in case of error
             raise
 
+        finally:
+            self.last_attempt["duration"] = time.time() - t0
+
     def _detect_captcha_type(self):
         """Detectar o tipo de CAPTCHA presente na página"""
         try:
@@ -109,14 +184,15 @@ class RecaptchaSolver:
         """Tenta clicar no botão de renovar CAPTCHA"""
         try:
             # Procurar pelo botão de atualização que geralmente tem ID recaptcha-reload-button
-            refresh_button = WebDriverWait(self.driver, 5).until(
+            refresh_button = self._until(
+                5,
                 EC.element_to_be_clickable((By.ID, "recaptcha-reload-button"))
             )
             print(
                 "Botão de atualização de CAPTCHA encontrado. Clicando para obter um novo CAPTCHA..."
             )
             refresh_button.click()
-            time.sleep(1.5)  # Aguardar o carregamento do novo CAPTCHA
+            self._sleep(1.5)  # Aguardar o carregamento do novo CAPTCHA
             return True
         except Exception as e:
             print(f"Não foi possível encontrar ou clicar no botão de atualização: {e}")
@@ -124,59 +200,73 @@ class RecaptchaSolver:
             # Tentar localizar por XPath alternativo
             try:
                 refresh_xpath = "//button[contains(@title, 'Get a new challenge') or contains(@class, 'reload')]"
-                refresh_button = WebDriverWait(self.driver, 3).until(
+                refresh_button = self._until(
+                    3,
                     EC.element_to_be_clickable((By.XPATH, refresh_xpath))
                 )
                 print(
                     "Botão de atualização encontrado por XPath alternativo. Clicando..."
                 )
                 refresh_button.click()
-                time.sleep(1.5)
+                self._sleep(1.5)
                 return True
-            except:
+            except Exception:
                 print(
                     "Nenhum botão de atualização encontrado por métodos alternativos."
                 )
                 return False
 
-    def solveAudioCaptcha(self):
-        try:
+    def enterChallengeFrame(self, timeout=10):
+        """Entra no iframe do desafio (imagem/áudio) a partir do documento principal"""
+        self.leaveFrame()
+        self._until(
+            timeout,
+            EC.frame_to_be_available_and_switch_to_it(
+                (By.XPATH, CHALLENGE_FRAME_XPATH)
+            )
+        )
+        self.in_frame = True
+
+    def leaveFrame(self, force=False):
+        """Volta ao documento principal, só fazendo a chamada se necessário"""
+        if self.in_frame or force:
             self.driver.switch_to.default_content()
+            self.in_frame = False
 
+    def solveAudioCaptcha(self):
+        try:
             # Switch to the audio CAPTCHA iframe
-            iframe_audio = WebDriverWait(self.driver, 10).until(
-                EC.frame_to_be_available_and_switch_to_it(
-                    (
-                        By.XPATH,
-                        '//iframe[@title="recaptcha challenge expires in two minutes"]',
-                    )
-                )
-            )
+            self.enterChallengeFrame()
 
             # Click on the audio button - support both English and Portuguese selectors
             try:
-                audio_button = WebDriverWait(self.driver, 5).until(
+                audio_button = self._until(
+                    5,
                     EC.element_to_be_clickable((By.ID, "recaptcha-audio-button"))
                 )
-            except:
+            except Exception:
                 # Tenta localizar botão de áudio em português ou por outras características
                 audio_xpath = "//button[contains(@title, 'áudio') or contains(@title, 'audio') or contains(@class, 'audio-button')]"
-                audio_button = WebDriverWait(self.driver, 5).until(
+                audio_button = self._until(
+                    5,
                     EC.element_to_be_clickable((By.XPATH, audio_xpath))
                 )
                 print("Botão de áudio localizado via XPath alternativo")
 
             audio_button.click()
 
-            # Tentar resolver até 3 CAPTCHAs diferentes
-            for attempt in range(1, 4):
+            # Tentar resolver até N CAPTCHAs diferentes
+            max_attempts = self.strategy["audio_attempts"]
+            for attempt in range(1, max_attempts + 1):
                 try:
                     print(f"\nTentativa {attempt} com CAPTCHA de áudio...")
+                    self.last_attempt["audio_attempts"] = attempt
 
                     # Get the audio source URL
                     audio_source = (
-                        WebDriverWait(self.driver, 10)
-                        .until(EC.presence_of_element_located((By.ID, "audio-source")))
+                        self._until(
+                            10, EC.presence_of_element_located((By.ID, "audio-source"))
+                        )
                         .get_attribute("src")
                     )
                     print(f"Audio source URL: {audio_source}")
@@ -190,41 +280,43 @@ class RecaptchaSolver:
                         os.path.join(temp_dir, f"{random.randrange(1, 1000)}.wav")
                     )
 
+                    import asyncio
+
                     asyncio.run(self.download_audio(audio_source, path_to_mp3))
 
                     # Convert mp3 to wav
+                    from pydub import AudioSegment
+
                     sound = AudioSegment.from_mp3(path_to_mp3)
                     sound.export(path_to_wav, format="wav")
                     print("Converted MP3 to WAV.")
 
                     # Recognize the audio
-                    recognizer = sr.Recognizer()
-                    with sr.AudioFile(path_to_wav) as source:
-                        audio = recognizer.record(source)
-                    captcha_text = recognizer.recognize_google(audio).lower()
+                    captcha_text = self.recognizeAudio(path_to_wav)
                     print(f"Recognized CAPTCHA text: {captcha_text}")
 
                     # Enter the CAPTCHA text
-                    audio_response = WebDriverWait(self.driver, 20).until(
+                    audio_response = self._until(
+                        20,
                         EC.presence_of_element_located((By.ID, "audio-response"))
                     )
                     audio_response.send_keys(captcha_text)
                     audio_response.send_keys(Keys.ENTER)
                     print("Entered and submitted CAPTCHA text.")
 
-                    # Wait for CAPTCHA to be processed
-                    time.sleep(1.2)  # Increase this if necessary
-
-                    # Verify CAPTCHA is solved
-                    if self.isSolved():
+                    # Wait for CAPTCHA to be processed and verify it is solved
+                    if self.waitSolved(1.2):  # Increase this if necessary
                         print("Audio CAPTCHA solved successfully.")
                         return True
 
                     # Se chegou aqui, o CAPTCHA não foi resolvido
                     print(f"Tentativa {attempt} falhou - resposta de áudio incorreta.")
 
+                    # A verificação acontece no documento principal; voltar ao desafio
+                    self.enterChallengeFrame()
+
                     # Se não for a última tentativa, clicar no botão de atualizar
-                    if attempt < 3:
+                    if attempt < max_attempts:
                         if not self.clickRefreshButton():
                             print("Não foi possível obter um novo CAPTCHA. Desistindo.")
                             break
@@ -233,7 +325,9 @@ class RecaptchaSolver:
                 except Exception as e:
                     print(f"Erro durante a tentativa {attempt}: {e}")
                     # Se não for a última tentativa, tentar obter um novo CAPTCHA
-                    if attempt < 3:
+                    if attempt < max_attempts:
+                        if not self.in_frame:
+                            self.enterChallengeFrame()
                         if not self.clickRefreshButton():
                             print("Não foi possível obter um novo CAPTCHA após erro.")
                             break
@@ -246,36 +340,71 @@ class RecaptchaSolver:
 
         except Exception as e:
             print(f"An error occurred while solving audio CAPTCHA: {e}")
-            self.driver.switch_to.default_content()  # Ensure we switch back in case of error
+            self.leaveFrame(force=True)  # Ensure we switch back in case of error
             raise
 
         finally:
             # Always switch back to the main content
-            self.driver.switch_to.default_content()
+            self.leaveFrame()
 
-    def isSolved(self):
-        try:
-            # Switch back to the default content
-            self.driver.switch_to.default_content()
+    def recognizeAudio(self, path_to_wav):
+        """Transcreve o áudio usando os reconhecedores da estratégia, em ordem"""
+        import speech_recognition as sr
 
-            # Switch to the reCAPTCHA iframe
-            iframe_check = self.driver.find_element(
-                By.XPATH, "//iframe[contains(@title, 'reCAPTCHA')]"
-            )
-            self.driver.switch_to.frame(iframe_check)
+        recognizer = sr.Recognizer()
+        recognizer.operation_timeout = RECOGNIZE_TIMEOUT  # recognize_google (rede)
+        with sr.AudioFile(path_to_wav) as source:
+            audio = recognizer.record(source)
 
-            # Find the checkbox element and check its aria-checked attribute
-            checkbox = WebDriverWait(self.driver, 10).until(
-                EC.presence_of_element_located((By.ID, "recaptcha-anchor"))
-            )
-            aria_checked = checkbox.get_attribute("aria-checked")
+        last_error = None
+        for name in self.strategy["recognizers"]:
+            try:
+                if name == "sphinx":
+                    text = recognizer.recognize_sphinx(audio)
+                else:
+                    text = recognizer.recognize_google(audio)
+                self.last_attempt["recognizer"] = name
+                return text.lower()
+            except Exception as e:
+                print(f"Reconhecedor '{name}' falhou: {e}")
+                last_error = e
+
+        raise last_error or Exception("Nenhum reconhecedor de áudio configurado")
+
+    def _until(self, timeout, condition):
+        """WebDriverWait.until que consulta cancel_check a cada 200 ms"""
+
+        def check(driver):
+            self.cancel_check()
+            return condition(driver)
+
+        return WebDriverWait(self.driver, timeout, poll_frequency=0.2).until(check)
+
+    def _sleep(self, seconds):
+        deadline = time.time() + seconds
+        while True:
+            self.cancel_check()
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                return
+            time.sleep(min(0.1, remaining))
 
-            # Return True if the aria-checked attribute is "true" or the checkbox has the 'recaptcha-checkbox-checked' class
-            return (
-                aria_checked == "true"
-                or "recaptcha-checkbox-checked" in checkbox.get_attribute("class")
-            )
+    def isSolved(self):
+        """Verifica se o CAPTCHA foi resolvido lendo o token no documento principal"""
+        try:
+            self.leaveFrame()
+            return bool(self.driver.execute_script(SOLVED_STATE_SCRIPT))
 
         except Exception as e:
             print(f"An error occurred while checking if CAPTCHA is solved: {e}")
             return False
+
+    def waitSolved(self, timeout, interval=0.2):
+        """Consulta isSolved até o timeout, retornando assim que o token aparecer"""
+        deadline = time.time() + timeout
+        while True:
+            if self.isSolved():
+                return True
+            if time.time() >= deadline:
+                return False
+            self._sleep(interval)
@@ -0,0 +1,24 @@
+"""
+Utilitário para localizar os diretórios de dados locais da aplicação
+"""
+
+import os
+import sys
+
+
+def get_data_directory():
+    """Get a writable directory for local caches and statistics"""
+    # Permite sobrescrever o diretório via variável de ambiente
+    if "DUA_DATA_DIR" in os.environ:
+        data_dir = os.environ["DUA_DATA_DIR"]
+    elif getattr(sys, "frozen", False):
+        # Running as executable: keep data next to the executable
+        data_dir = os.path.join(os.path.dirname(sys.executable), "dados_aplicacao")
+    else:
+        # Running in development
+        data_dir = os.path.join(
+            os.path.dirname(os.path.abspath(__file__)), "dados_aplicacao"
+        )
+
+    os.makedirs(data_dir, exist_ok=True)
+    return data_dir
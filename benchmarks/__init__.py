@@ -0,0 +1,7 @@
+"""
+Medições de desempenho da automação de DUAs
+
+Execute todas com `python -m benchmarks` (ou `python -m benchmarks --quick`).
+Os resultados são gravados em JSON em benchmarks/results/ e comparados com a
+execução anterior, para que regressões entre versões fiquem visíveis.
+"""
@@ -0,0 +1,104 @@
+"""
+Linhas por minuto do fluxo completo (formulário, CAPTCHA, geração e PDF)
+contra o portal simulado, com 1, 2 e 4 navegadores em paralelo
+
+Precisa do Chrome instalado; sem ele o caso é ignorado.
+"""
+
+import queue
+import tempfile
+import threading
+import time
+
+from benchmarks.common import BenchmarkSkipped, form_rows, isolate_state, result
+from mock_portal import HOME_PATH, MockPortal
+
+ROWS_PER_WORKER = 10
+
+# Latência típica do portal real, em escala reduzida
+PORTAL_LATENCY = 0.2
+PORTAL_JITTER = 0.1
+
+
+def run_workers(workers, rows):
+    import get_dua
+
+    row_queue = queue.Queue()
+    for row in rows:
+        row_queue.put(row)
+    outcome = {"success": 0, "failed": 0}
+    outcome_lock = threading.Lock()
+
+    def worker():
+        try:
+            # A partida do navegador entra no tempo total, como numa execução real
+            get_dua.initialize_driver()
+            while True:
+                try:
+                    dados = row_queue.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    success = get_dua.preencher_formulario(dados) and get_dua.baixar_pdf(
+                        dados["CPF_CNPJ"],
+                        dados["REFERENCIA"],
+                        dados["INFO_ADICIONAIS"],
+                        dados["VALOR"],
+                    )
+                except Exception as e:
+                    print(f"Erro na linha {dados['CPF_CNPJ']}: {e}")
+                    success = False
+                with outcome_lock:
+                    outcome["success" if success else "failed"] += 1
+        finally:
+            get_dua.close_browser()
+
+    started = time.perf_counter()
+    threads = [
+        threading.Thread(target=worker, name=f"Bench-{n + 1}") for n in range(workers)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, outcome
+
+
+def run(options):
+    import get_dua
+
+    worker_counts = [1, 2] if options.quick else [1, 2, 4]
+    portal = MockPortal(latency=PORTAL_LATENCY, jitter=PORTAL_JITTER, seed=1).start()
+    original = (get_dua.HOME_URL, get_dua.FORM_URL, get_dua.PDF_DIR)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="dua_bench_") as temp_dir:
+            get_dua.HOME_URL = portal.base_url + HOME_PATH
+            get_dua.FORM_URL = portal.form_url
+            get_dua.PDF_DIR = temp_dir
+            isolate_state(temp_dir)
+
+            # Confere se o Chrome abre antes de começar as medições
+            try:
+                get_dua.initialize_driver()
+            except Exception as e:
+                raise BenchmarkSkipped(f"Chrome indisponível ({e})")
+            finally:
+                get_dua.close_browser()
+
+            for workers in worker_counts:
+                rows = form_rows(ROWS_PER_WORKER * workers)
+                elapsed, outcome = run_workers(workers, rows)
+                results.append(
+                    result(
+                        "e2e",
+                        {"workers": workers, "rows": len(rows)},
+                        seconds_total=round(elapsed, 3),
+                        rows_per_minute=round(outcome["success"] * 60 / elapsed, 1),
+                        failed=outcome["failed"],
+                    )
+                )
+    finally:
+        get_dua.HOME_URL, get_dua.FORM_URL, get_dua.PDF_DIR = original
+        portal.stop()
+    return results
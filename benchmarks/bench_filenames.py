@@ -0,0 +1,28 @@
+"""
+Montagem do nome do arquivo do DUA (get_dua.nome_arquivo_dua)
+"""
+
+from benchmarks.common import generate_rows, measure, result
+
+ROWS = 10000
+
+
+def run(options):
+    from get_dua import nome_arquivo_dua
+
+    rows = generate_rows(ROWS)
+
+    def build_all():
+        for cpf_cnpj, _, referencia, _, valor, _, observacao in rows:
+            nome_arquivo_dua(cpf_cnpj, referencia, observacao, valor)
+
+    timing = measure(build_all)
+    per_call = {k: v / ROWS for k, v in timing.items() if k in ("min", "median", "mean")}
+    return [
+        result(
+            "filename",
+            {"rows": ROWS},
+            per_call,
+            calls_per_second=round(1 / per_call["median"]),
+        )
+    ]
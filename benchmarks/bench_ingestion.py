@@ -0,0 +1,76 @@
+"""
+Carga de planilhas: leitura, limpeza e validação, como em
+DUAAutomationUI.load_csv_data (sem a parte de interface)
+"""
+
+import os
+
+import pandas as pd
+
+from benchmarks.common import measure, result, sample_file
+from mock_portal import SERVICES
+from row_validation import apply_validation
+from service_catalog import CODE_PATTERN
+
+# Mapeamento código -> valor do portal, a partir das opções do portal simulado
+# (sem importar get_dua, que depende do Selenium)
+SERVICOS = {
+    CODE_PATTERN.search(text).group(1): value for value, text in SERVICES
+}
+
+COLUMN_MAPPING = {
+    "CPF/CNPJ": "CPF_CNPJ",
+    "SERVIÇO": "SERVICO",
+    "REFERENCIA": "REFERENCIA",
+    "VENCIMENTO": "VENCIMENTO",
+    "VALOR": "VALOR",
+    "NOTA FISCAL": "NF",
+    "INFORMAÇÕES ADICIONAIS": "INFO_ADICIONAIS",
+}
+
+
+def read_file(path):
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xls"):
+        return pd.read_excel(path, dtype=str)
+
+    with open(path, "r", errors="ignore") as f:
+        first_line = f.readline().strip()
+    skip_rows = 1 if first_line.startswith("//") else 0
+    with open(path, "r", errors="ignore") as f:
+        sample = f.read(1024)
+    delimiter = ";" if sample.count(";") > sample.count(",") else ","
+    return pd.read_csv(
+        path, dtype=str, skiprows=skip_rows, sep=delimiter, encoding="utf-8"
+    )
+
+
+def ingest(path):
+    data = read_file(path)
+    data.columns = data.columns.str.strip()
+    data = data.rename(columns=COLUMN_MAPPING)
+    data["VALOR"] = data["VALOR"].str.strip().str.replace(",", ".")
+    data["VALOR"] = data["VALOR"].str.replace(" ", "")
+    data["INFO_COMBINADA"] = (
+        "NF: " + data["NF"].fillna("") + " - " + data["INFO_ADICIONAIS"].fillna("")
+    )
+    apply_validation(data, SERVICOS)
+    return data
+
+
+def run(options):
+    sizes = [1000, 10000] if options.quick else [1000, 10000, 100000]
+    results = []
+    for extension in ("csv", "xlsx"):
+        for size in sizes:
+            path = sample_file(size, extension)
+            repeat = 1 if size >= 100000 or extension == "xlsx" else 3
+            timing = measure(lambda: ingest(path), repeat=repeat)
+            results.append(
+                result(
+                    "ingestion",
+                    {"format": extension, "rows": size},
+                    timing,
+                    rows_per_second=round(size / timing["median"]),
+                )
+            )
+    return results
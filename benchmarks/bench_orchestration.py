@@ -0,0 +1,103 @@
+"""
+Custo do lado Python por linha (preencher_formulario + baixar_pdf +
+RecaptchaSolver) com o WebDriver falso de fake_webdriver.py, sem navegador
+"""
+
+import contextlib
+import io
+import queue
+import statistics
+import tempfile
+import threading
+import time
+
+from benchmarks.common import form_rows, isolate_state, result
+
+
+def run_rows(rows, workers):
+    import get_dua
+
+    row_queue = queue.Queue()
+    for row in rows:
+        row_queue.put(row)
+    outcome = {"success": 0, "failed": 0}
+    outcome_lock = threading.Lock()
+
+    def worker():
+        try:
+            while True:
+                try:
+                    dados = row_queue.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    success = get_dua.preencher_formulario(dados) and get_dua.baixar_pdf(
+                        dados["CPF_CNPJ"],
+                        dados["REFERENCIA"],
+                        dados["INFO_ADICIONAIS"],
+                        dados["VALOR"],
+                    )
+                except Exception:
+                    success = False
+                with outcome_lock:
+                    outcome["success" if success else "failed"] += 1
+        finally:
+            get_dua.close_browser()
+
+    threads = [threading.Thread(target=worker) for _ in range(workers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started, outcome
+
+
+def run(options):
+    import get_dua
+    from fake_webdriver import FakePortal
+
+    rows_count = 500 if options.quick else 2000
+    repeat = 3 if options.quick else 5
+    original = (get_dua.driver_factory, get_dua.PDF_DIR, get_dua.GERAR_DUA_DELAY)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="dua_bench_") as temp_dir:
+            get_dua.PDF_DIR = temp_dir
+            get_dua.GERAR_DUA_DELAY = 0
+            isolate_state(temp_dir)
+
+            for workers in (1, 4):
+                # Cada rodada processa o lote inteiro num portal novo; o tempo
+                # por linha de cada rodada é uma amostra
+                per_row = []
+                rates = []
+                failed = 0
+                for _ in range(repeat):
+                    portal = FakePortal(seed=1)
+                    get_dua.set_driver_factory(portal.driver)
+                    rows = form_rows(rows_count)
+                    # As mensagens de andamento fazem parte do custo, mas não do terminal
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        elapsed, outcome = run_rows(rows, workers)
+                    per_row.append(elapsed / rows_count)
+                    rates.append(outcome["success"] / elapsed * 60)
+                    failed += outcome["failed"]
+                results.append(
+                    result(
+                        "orchestration",
+                        {"workers": workers, "rows": rows_count},
+                        {
+                            "min": min(per_row),
+                            "median": statistics.median(per_row),
+                            "mean": statistics.fmean(per_row),
+                        },
+                        rows_per_minute=round(statistics.median(rates), 1),
+                        repeat=repeat,
+                        failed=failed,
+                    )
+                )
+    finally:
+        get_dua.set_driver_factory(original[0])
+        get_dua.PDF_DIR, get_dua.GERAR_DUA_DELAY = original[1:]
+    return results
@@ -0,0 +1,152 @@
+"""
+Tempo de abertura do programa: importação do ui (python -X importtime) e tempo
+até a primeira janela, cada medição num processo Python novo (Qt offscreen)
+"""
+
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import REPO_DIR, BenchmarkSkipped, result
+
+IMPORTTIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+FIRST_WINDOW_LINE = re.compile(r"FIRST_WINDOW (\S+) ([\w,]*)")
+
+# Módulos pesados que não devem ser carregados antes da janela aparecer
+DEFERRED_MODULES = ["get_dua", "selenium", "pandas", "numpy", "requests", "aiohttp", "pydub"]
+
+# Cria a janela principal, espera o laço de eventos começar e informa o instante
+# (time.time) em que isso aconteceu. As configurações ficam num .ini temporário,
+# sem o pré-início do navegador, e os._exit evita qualquer gravação ao fechar
+FIRST_WINDOW_SCRIPT = """
+import os, sys, time
+from PyQt6.QtCore import QSettings, QTimer
+from ui import QApplication, DUAAutomationUI
+
+QSettings.setDefaultFormat(QSettings.Format.IniFormat)
+QSettings.setPath(QSettings.Format.IniFormat, QSettings.Scope.UserScope, {settings_dir!r})
+QSettings("DUA_Automation", "Settings").setValue("prestart_browser", False)
+
+app = QApplication(sys.argv)
+app.setStyle("Fusion")
+window = DUAAutomationUI()
+window.show()
+
+def shown():
+    loaded = [name for name in {deferred!r} if name in sys.modules]
+    print(f"FIRST_WINDOW {{time.time()!r}} {{','.join(loaded)}}", flush=True)
+    os._exit(0)
+
+QTimer.singleShot(0, shown)
+app.exec()
+"""
+
+
+def _environment():
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", PYTHONDONTWRITEBYTECODE="1")
+    env.pop("PYTHONPROFILEIMPORTTIME", None)
+    return env
+
+
+def _stats(samples):
+    return {
+        "min": min(samples),
+        "median": statistics.median(samples),
+        "mean": statistics.fmean(samples),
+    }
+
+
+def import_profile():
+    """(segundos para importar o ui, {módulo importado direto pelo ui: segundos})"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import ui"],
+        cwd=REPO_DIR,
+        env=_environment(),
+        capture_output=True,
+        text=True,
+        timeout=120,
+    )
+    if completed.returncode != 0:
+        raise BenchmarkSkipped(f"falha ao importar o ui: {completed.stderr.strip()[-200:]}")
+
+    total = None
+    children = {}
+    pending = {}  # o módulo aparece depois dos que ele importou
+    for line in completed.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        cumulative, depth, name = int(match.group(2)), len(match.group(3)), match.group(4)
+        if depth == 3:
+            pending[name] = cumulative / 1e6
+        elif depth == 1:
+            if name == "ui":
+                total, children = cumulative / 1e6, pending
+            pending = {}
+    return total, children
+
+
+def first_window():
+    """(segundos do início do processo até a janela aparecer, módulos pesados já carregados)"""
+    with tempfile.TemporaryDirectory(prefix="dua_bench_") as settings_dir:
+        script = FIRST_WINDOW_SCRIPT.format(
+            deferred=DEFERRED_MODULES, settings_dir=settings_dir
+        )
+        started = time.time()
+        completed = subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=REPO_DIR,
+            env=_environment(),
+            capture_output=True,
+            text=True,
+            timeout=120,
+        )
+    match = FIRST_WINDOW_LINE.search(completed.stdout)
+    if match:
+        loaded = [name for name in match.group(2).split(",") if name]
+        return float(match.group(1)) - started, loaded
+    raise BenchmarkSkipped(
+        f"a janela não abriu: {(completed.stderr or completed.stdout).strip()[-200:]}"
+    )
+
+
+def run(options):
+    repeat = 3 if options.quick else 7
+
+    import_samples = []
+    children = {}
+    for _ in range(repeat):
+        total, modules = import_profile()
+        import_samples.append(total)
+        for name, seconds in modules.items():
+            children.setdefault(name, []).append(seconds)
+    slowest = sorted(
+        ((statistics.median(samples), name) for name, samples in children.items()),
+        reverse=True,
+    )[:5]
+
+    window_samples = []
+    loaded = set()
+    for _ in range(repeat):
+        seconds, modules = first_window()
+        window_samples.append(seconds)
+        loaded.update(modules)
+
+    return [
+        result(
+            "startup",
+            {"measure": "import_ui"},
+            _stats(import_samples),
+            slowest_imports={name: round(seconds, 4) for seconds, name in slowest},
+        ),
+        result(
+            "startup",
+            {"measure": "first_window"},
+            _stats(window_samples),
+            loaded_before_window=sorted(loaded),
+        ),
+    ]
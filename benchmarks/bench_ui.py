@@ -0,0 +1,87 @@
+"""
+Custo de desenho da tabela (DataFrameModel.data) e vazão do log
+(EnhancedTextEdit.append_log), com o Qt em modo offscreen
+"""
+
+import os
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import Qt
+from PyQt6.QtWidgets import QApplication
+
+from benchmarks.bench_ingestion import ingest
+from benchmarks.common import measure, result, sample_file
+from ui import DataFrameModel, EnhancedTextEdit, LogMessage
+
+# Células lidas por rodada (uma tela cheia de tabela fica bem abaixo disso)
+CELLS_PER_ROUND = 5000
+LOG_MESSAGES = 2000
+
+
+def _application():
+    return QApplication.instance() or QApplication([])
+
+
+def bench_model(rows):
+    model = DataFrameModel(ingest(sample_file(rows, "csv")))
+    row_count = model.rowCount()
+    column_count = model.columnCount()
+    # Percorre a tabela inteira em passos regulares, como uma rolagem
+    step = max(1, row_count // CELLS_PER_ROUND)
+    indexes = [
+        model.index((i * step) % row_count, i % column_count)
+        for i in range(CELLS_PER_ROUND)
+    ]
+
+    results = []
+    for role_name, role in (
+        ("display", Qt.ItemDataRole.DisplayRole),
+        ("background", Qt.ItemDataRole.BackgroundRole),
+    ):
+        timing = measure(lambda: [model.data(index, role) for index in indexes])
+        per_call = {k: v / CELLS_PER_ROUND for k, v in timing.items() if k in ("min", "median", "mean")}
+        results.append(
+            result(
+                "table_data",
+                {"role": role_name, "rows": rows},
+                per_call,
+                calls_per_second=round(1 / per_call["median"]),
+            )
+        )
+    return results
+
+
+def bench_log():
+    levels = [LogMessage.INFO, LogMessage.SUCCESS, LogMessage.WARNING, LogMessage.ERROR]
+    messages = [
+        LogMessage(f"Linha {i + 1}: DUA gerado com sucesso", levels[i % len(levels)])
+        for i in range(LOG_MESSAGES)
+    ]
+    widget = EnhancedTextEdit()
+
+    def append_all():
+        for message in messages:
+            widget.append_log(message)
+
+    timing = measure(append_all, repeat=3, setup=widget.clear)
+    widget.deleteLater()
+    return [
+        result(
+            "append_log",
+            {"messages": LOG_MESSAGES},
+            timing,
+            messages_per_second=round(LOG_MESSAGES / timing["median"]),
+        )
+    ]
+
+
+def run(options):
+    # A referência mantém a QApplication viva durante as medições
+    app = _application()
+    sizes = [1000, 10000] if options.quick else [1000, 10000, 100000]
+    results = []
+    for rows in sizes:
+        results.extend(bench_model(rows))
+    results.extend(bench_log())
+    return results
@@ -0,0 +1,174 @@
+"""
+Utilitários compartilhados pelas medições: cronômetro, geração de planilhas
+sintéticas e formato dos resultados
+"""
+
+import csv
+import os
+import random
+import statistics
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+# Planilhas geradas ficam em cache entre execuções (mesma semente = mesmo arquivo)
+CACHE_DIR = os.path.join(BENCH_DIR, ".cache")
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+COLUMNS = [
+    "CPF/CNPJ",
+    "SERVIÇO",
+    "REFERENCIA",
+    "VENCIMENTO",
+    "VALOR",
+    "NOTA FISCAL",
+    "INFORMAÇÕES ADICIONAIS",
+]
+
+class BenchmarkSkipped(Exception):
+    """Caso que não pode ser medido neste ambiente (ex.: sem Chrome)"""
+
+
+SERVICE_CODES = ["138-4", "137-6", "386-7", "121-0", "128-7", "129-5", "125-2"]
+
+
+def _check_digit(digits, weights):
+    remainder = sum(d * w for d, w in zip(digits, weights)) % 11
+    return 0 if remainder < 2 else 11 - remainder
+
+
+def random_cpf(rng):
+    digits = [rng.randrange(10) for _ in range(9)]
+    digits.append(_check_digit(digits, range(10, 1, -1)))
+    digits.append(_check_digit(digits, range(11, 1, -1)))
+    return "".join(map(str, digits))
+
+
+def random_cnpj(rng):
+    digits = [rng.randrange(10) for _ in range(8)] + [0, 0, 0, 1]
+    digits.append(_check_digit(digits, [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]))
+    digits.append(_check_digit(digits, [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]))
+    return "".join(map(str, digits))
+
+
+def generate_rows(count, seed=42, invalid_rate=0.02):
+    """Linhas no formato da planilha modelo; uma fração sai com dados inválidos"""
+    rng = random.Random(seed)
+    rows = []
+    for i in range(count):
+        month = rng.randint(1, 12)
+        row = [
+            random_cnpj(rng) if rng.random() < 0.7 else random_cpf(rng),
+            rng.choice(SERVICE_CODES),
+            f"{month:02d}/2025",
+            f"{rng.randint(1, 28):02d}/{month:02d}/2025",
+            f"{rng.randint(1, 99999)},{rng.randint(0, 99):02d}",
+            str(rng.randint(1000, 99999999)),
+            f"Pedido {i + 1} - Cliente {rng.randint(1, 500)}",
+        ]
+        if rng.random() < invalid_rate:
+            row[rng.choice([0, 2, 4])] = "inválido"
+        rows.append(row)
+    return rows
+
+
+def form_rows(count):
+    """Linhas já no formato de dados usado por preencher_formulario"""
+    rows = []
+    for cpf_cnpj, servico, referencia, vencimento, valor, nf, info in generate_rows(
+        count, invalid_rate=0
+    ):
+        rows.append(
+            {
+                "CPF_CNPJ": cpf_cnpj,
+                "SERVICO": servico,
+                "REFERENCIA": referencia,
+                "VENCIMENTO": vencimento,
+                "VALOR": valor.replace(",", "."),
+                "NF": nf,
+                "INFO_ADICIONAIS": info,
+                "INFO_COMBINADA": f"NF: {nf} - {info}",
+            }
+        )
+    return rows
+
+
+def isolate_state(temp_dir):
+    """Catálogo de serviços e histórico de CAPTCHA em arquivos temporários
+
+    Evita que as medições alterem o cache e as estatísticas reais da máquina.
+    """
+    import captcha_stats
+    import get_dua
+    import service_catalog
+
+    service_catalog._service_catalog = service_catalog.ServiceCatalog(
+        get_dua.SERVICO_MAPPING, path=os.path.join(temp_dir, "servicos.json")
+    )
+    captcha_stats._captcha_stats = captcha_stats.CaptchaStats(
+        path=os.path.join(temp_dir, "captcha_stats.json")
+    )
+
+
+def sample_file(count, extension, seed=42):
+    """Caminho de uma planilha sintética com `count` linhas (gerada uma vez)"""
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"planilha_{count}_{seed}.{extension}")
+    if os.path.exists(path):
+        return path
+
+    rows = generate_rows(count, seed)
+    # A extensão final é mantida: o pandas escolhe o formato do Excel por ela
+    temp_path = f"{path}.tmp.{extension}"
+    if extension == "csv":
+        with open(temp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f, delimiter=";")
+            writer.writerow(COLUMNS)
+            writer.writerows(rows)
+    else:
+        import pandas as pd
+
+        pd.DataFrame(rows, columns=COLUMNS).to_excel(
+            temp_path, index=False, engine="openpyxl"
+        )
+    os.replace(temp_path, path)
+    return path
+
+
+def measure(func, repeat=5, number=1, setup=None):
+    """Executa func `number` vezes por rodada, em `repeat` rodadas
+
+    Returns:
+        dict com min/mediana/média do tempo por chamada (s)
+    """
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        timings.append((time.perf_counter() - started) / number)
+    return {
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.fmean(timings),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def result(name, params, timing=None, **metrics):
+    """Registro de resultado no formato gravado em JSON"""
+    entry = {"name": name, "params": params}
+    if timing is not None:
+        entry["seconds"] = {k: round(v, 6) for k, v in timing.items() if k in ("min", "median", "mean")}
+    entry.update(metrics)
+    return entry
+
+
+def result_key(entry):
+    """Identificador estável de um caso, usado para comparar execuções"""
+    params = ",".join(f"{k}={v}" for k, v in sorted(entry["params"].items()))
+    return f"{entry['name']}[{params}]"
@@ -0,0 +1,134 @@
+"""
+Executa as medições, grava o resultado em JSON e compara com a execução anterior
+"""
+
+import argparse
+import datetime
+import glob
+import importlib
+import json
+import os
+import platform
+import subprocess
+import sys
+
+from benchmarks.common import REPO_DIR, RESULTS_DIR, BenchmarkSkipped, result_key
+
+# Ordem de execução (o fluxo completo por último, é o mais demorado)
+SUITES = ["ingestion", "ui", "filenames", "startup", "orchestration", "e2e"]
+
+# Variação (%) a partir da qual a comparação destaca o caso
+REGRESSION_THRESHOLD = 10.0
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=REPO_DIR,
+            capture_output=True,
+            text=True,
+            timeout=10,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def previous_results(exclude=None):
+    paths = sorted(glob.glob(os.path.join(RESULTS_DIR, "bench_*.json")))
+    paths = [p for p in paths if p != exclude]
+    if not paths:
+        return None
+    try:
+        with open(paths[-1], "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _score(entry):
+    """Valor comparável de um caso e se maior é melhor"""
+    if "rows_per_minute" in entry:
+        return entry["rows_per_minute"], True
+    if "seconds" in entry:
+        return entry["seconds"]["median"], False
+    return None, False
+
+
+def compare(current, previous):
+    old = {result_key(entry): entry for entry in previous["results"]}
+    label = previous.get("revision") or previous.get("timestamp")
+    print(f"\nComparação com a execução anterior ({label}):")
+    for entry in current["results"]:
+        key = result_key(entry)
+        new_value, higher_is_better = _score(entry)
+        old_value = _score(old[key])[0] if key in old else None
+        if new_value is None or not old_value:
+            print(f"  {key}: sem referência")
+            continue
+        change = (new_value - old_value) / old_value * 100
+        worse = change < 0 if higher_is_better else change > 0
+        flag = " <-- regressão" if worse and abs(change) >= REGRESSION_THRESHOLD else ""
+        print(f"  {key}: {old_value:g} -> {new_value:g} ({change:+.1f}%){flag}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="python -m benchmarks", description="Medições de desempenho"
+    )
+    parser.add_argument(
+        "--quick", action="store_true", help="Tamanhos menores (sem 100 mil linhas)"
+    )
+    parser.add_argument(
+        "--only", action="append", choices=SUITES, help="Executa só estes grupos"
+    )
+    parser.add_argument("--output", help="Arquivo JSON de saída")
+    options = parser.parse_args(argv)
+
+    # Os módulos do projeto ficam na raiz do repositório
+    if REPO_DIR not in sys.path:
+        sys.path.insert(0, REPO_DIR)
+
+    results = []
+    skipped = {}
+    for suite in options.only or SUITES:
+        print(f"== {suite} ==")
+        try:
+            module = importlib.import_module(f"benchmarks.bench_{suite}")
+            suite_results = module.run(options)
+        except ImportError as e:
+            skipped[suite] = f"dependência ausente: {e}"
+            print(f"Ignorado ({skipped[suite]})")
+            continue
+        except BenchmarkSkipped as e:
+            skipped[suite] = str(e)
+            print(f"Ignorado ({e})")
+            continue
+        for entry in suite_results:
+            print(f"  {result_key(entry)}: {json.dumps({k: v for k, v in entry.items() if k not in ('name', 'params')})}")
+        results.extend(suite_results)
+
+    now = datetime.datetime.now()
+    report = {
+        "timestamp": now.isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "quick": options.quick,
+        "results": results,
+        "skipped": skipped,
+    }
+
+    output = options.output or os.path.join(
+        RESULTS_DIR, f"bench_{now.strftime('%Y%m%d_%H%M%S')}.json"
+    )
+    previous = previous_results(exclude=os.path.abspath(output))
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    temp_path = f"{output}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    os.replace(temp_path, output)
+    print(f"\nResultados gravados em {output}")
+
+    if previous:
+        compare(report, previous)
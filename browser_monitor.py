@@ -0,0 +1,142 @@
+"""
+Monitor de saúde do navegador
+
+Mede a memória (RSS) do chromedriver e de todos os processos do Chrome
+iniciados por ele e indica quando a sessão deve ser reciclada, seja por
+número de linhas processadas ou por uso de memória.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+
+import psutil
+
+from app_paths import get_data_directory
+from metrics_export import BROWSER_RESTARTS, BROWSER_RSS
+
+METRICS_FILENAME = "browser_memory.jsonl"
+
+# Ao passar deste tamanho o arquivo de métricas vira .1 (substituindo o anterior)
+METRICS_MAX_BYTES = 5 * 1024 * 1024
+
+# Amostras mantidas em memória por navegador (as mais recentes)
+SAMPLES_KEPT = 500
+
+# Os navegadores simultâneos gravam no mesmo arquivo
+_metrics_lock = threading.Lock()
+
+# Valores padrão para reciclagem da sessão
+DEFAULT_MAX_ROWS = 50
+DEFAULT_MAX_RSS_MB = 1500
+
+
+def driver_processes(driver):
+    """Processo do chromedriver e toda a árvore de processos do Chrome abaixo dele"""
+    service = getattr(driver, "service", None)
+    process = getattr(service, "process", None)
+    if process is None:
+        return []
+
+    try:
+        root = psutil.Process(process.pid)
+        return [root] + root.children(recursive=True)
+    except psutil.Error:
+        return []
+
+
+def sample_rss(driver):
+    """Soma do RSS (bytes) e quantidade de processos da sessão do navegador"""
+    total = 0
+    count = 0
+    for proc in driver_processes(driver):
+        try:
+            total += proc.memory_info().rss
+            count += 1
+        except psutil.Error:
+            # Processo encerrado entre a listagem e a leitura
+            continue
+    return total, count
+
+
+def kill_driver_processes(driver):
+    """Mata o chromedriver e o Chrome da sessão sem passar pelo WebDriver
+
+    Usado quando uma chamada WebDriver travou: a chamada pendente falha
+    imediatamente assim que o chromedriver deixa de existir.
+    """
+    killed = 0
+    for proc in reversed(driver_processes(driver)):
+        try:
+            proc.kill()
+            killed += 1
+        except psutil.Error:
+            continue
+    return killed
+
+
+class BrowserSupervisor:
+    """Decide quando reciclar a sessão do navegador e registra as amostras de memória"""
+
+    def __init__(
+        self, max_rows=DEFAULT_MAX_ROWS, max_rss_mb=DEFAULT_MAX_RSS_MB, metrics_path=None
+    ):
+        # 0 desativa o respectivo critério
+        self.max_rows = max_rows
+        self.max_rss_mb = max_rss_mb
+        self.metrics_path = metrics_path or os.path.join(
+            get_data_directory(), METRICS_FILENAME
+        )
+        self.rows_since_start = 0
+        self.restarts = 0
+        self.samples = deque(maxlen=SAMPLES_KEPT)
+        self.peak_rss = 0.0
+
+    def sample(self, driver):
+        """Mede a memória da sessão e grava a amostra como métrica"""
+        rss, processes = sample_rss(driver)
+        sample = {
+            "timestamp": time.time(),
+            "rss_mb": round(rss / (1024 * 1024), 1),
+            "processes": processes,
+            "rows": self.rows_since_start,
+            "restarts": self.restarts,
+        }
+        self.samples.append(sample)
+        self.peak_rss = max(self.peak_rss, sample["rss_mb"])
+        BROWSER_RSS.set(rss, worker=threading.current_thread().name)
+
+        try:
+            with _metrics_lock:
+                if (
+                    os.path.exists(self.metrics_path)
+                    and os.path.getsize(self.metrics_path) >= METRICS_MAX_BYTES
+                ):
+                    os.replace(self.metrics_path, f"{self.metrics_path}.1")
+                with open(self.metrics_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(sample) + "\n")
+        except OSError as e:
+            print(f"Não foi possível gravar a métrica de memória: {e}")
+
+        return sample
+
+    def row_finished(self, driver):
+        """Registra uma linha concluída; retorna o motivo para reciclar ou None"""
+        self.rows_since_start += 1
+        sample = self.sample(driver)
+
+        if self.max_rows and self.rows_since_start >= self.max_rows:
+            return f"{self.rows_since_start} linhas processadas"
+        if self.max_rss_mb and sample["rss_mb"] >= self.max_rss_mb:
+            return f"memória em {sample['rss_mb']:.0f} MB"
+        return None
+
+    def recycled(self):
+        self.rows_since_start = 0
+        self.restarts += 1
+        BROWSER_RESTARTS.inc()
+
+    def peak_rss_mb(self):
+        return self.peak_rss
@@ -4,11 +4,15 @@ Script para compilar o DUA Automation em um executável
 Este script utiliza PyInstaller para criar um executável autônomo do aplicativo
 """
 
+import argparse
 import os
 import sys
 import shutil
+import statistics
 import subprocess
 import platform
+import tempfile
+import time
 
 # Configurações
 APP_NAME = "DUA Automation"
@@ -20,6 +24,47 @@ LOGO_SOURCE = os.path.join("resources", "logo_new.png")
 APP_ICON = os.path.join("resources", "app_icon_exe.ico")  # Para Windows
 APP_ICNS = os.path.join("resources", "app_icon_exe.icns")  # Para macOS
 
+# "onedir" (padrão) gera uma pasta com o executável e as bibliotecas: abre bem
+# mais rápido, pois nada é extraído a cada execução. "onefile" gera um único
+# arquivo, que se extrai numa pasta temporária toda vez que é aberto.
+BUILD_MODES = ["onedir", "onefile"]
+DEFAULT_MODE = "onedir"
+
+# Módulos que o programa não usa, mas que dependências opcionais puxam
+EXCLUDED_MODULES = [
+    "tkinter",
+    "matplotlib",
+    "IPython",
+    "pytest",
+    "scipy",
+    "pyarrow",
+    "sqlalchemy",
+    "PyQt5",
+    "PySide2",
+    "PySide6",
+]
+
+# Plugins do Qt sem uso (rede, SQL, ícones SVG, impressão, multimídia...)
+QT_PLUGINS_EXCLUDED = [
+    "generic",
+    "iconengines",
+    "tls",
+    "networkinformation",
+    "sqldrivers",
+    "printsupport",
+    "multimedia",
+    "position",
+    "egldeviceintegrations",
+]
+# Formatos de imagem mantidos (o PNG já vem embutido no Qt)
+QT_IMAGE_FORMATS = ["qico"]
+# Bibliotecas do Qt usadas só pelos plugins removidos
+QT_LIBRARIES_EXCLUDED = ["Qt6Svg", "Qt6Pdf", "Qt6Network", "Qt6VirtualKeyboard"]
+
+# Aberturas medidas por modo em --compare (a primeira é a "fria")
+STARTUP_RUNS = 5
+STARTUP_TIMEOUT = 120
+
 # Adicionar a opção de criar a pasta .github se não existir
 def ensure_github_files():
     """Cria a estrutura de arquivos .github se não existir"""
@@ -147,7 +192,27 @@ def convert_icon_if_needed():
         print("Por favor, converta manualmente o arquivo PNG para ICNS.")
 
 
-def build_executable():
+def executable_path(mode, distpath="dist"):
+    """Caminho do executável gerado no modo informado"""
+    name = APP_NAME.replace(" ", "_")
+    system = platform.system()
+    if system == "Darwin":
+        return os.path.join(distpath, f"{name}.app", "Contents", "MacOS", name)
+    exe_name = f"{name}.exe" if system == "Windows" else name
+    if mode == "onedir":
+        return os.path.join(distpath, name, exe_name)
+    return os.path.join(distpath, exe_name)
+
+
+def report_executable(exe_path):
+    if os.path.exists(exe_path):
+        print(f"\nExecutável gerado em: {os.path.abspath(exe_path)}")
+    else:
+        print(f"\nExecutável esperado em: {os.path.abspath(exe_path)}")
+        print("Mas o arquivo não foi encontrado. Verifique erros no build.")
+
+
+def build_executable(mode=DEFAULT_MODE, distpath="dist"):
     """Constrói o executável usando PyInstaller"""
     print("\nIniciando build com PyInstaller...")
 
@@ -166,12 +231,16 @@ def build_executable():
         "--name",
         APP_NAME.replace(" ", "_"),
         "--windowed",  # Sem console/terminal
-        "--onefile",  # Arquivo único
+        f"--{mode}",  # Pasta (onedir) ou arquivo único (onefile)
         "--clean",  # Limpar cache
         "--add-data",
         f"resources{os.pathsep}resources",  # Incluir recursos
+        "--distpath",
+        distpath,
         "--noconfirm",  # Não confirmar sobrescrita
     ]
+    for module in EXCLUDED_MODULES:
+        pyinstaller_cmd.extend(["--exclude-module", module])
 
     # Adicionar parâmetro de ícone se disponível
     if icon_param:
@@ -186,18 +255,7 @@ def build_executable():
         print("\n✓ Build concluído com sucesso!")
 
         # Mostrar o local do executável
-        if system == "Windows":
-            exe_path = os.path.join("dist", f"{APP_NAME.replace(' ', '_')}.exe")
-        elif system == "Darwin":
-            exe_path = os.path.join("dist", f"{APP_NAME.replace(' ', '_')}.app")
-        else:  # Linux
-            exe_path = os.path.join("dist", APP_NAME.replace(" ", "_"))
-
-        if os.path.exists(exe_path):
-            print(f"\nExecutável gerado em: {os.path.abspath(exe_path)}")
-        else:
-            print(f"\nExecutável esperado em: {os.path.abspath(exe_path)}")
-            print("Mas o arquivo não foi encontrado. Verifique erros no build.")
+        report_executable(executable_path(mode, distpath))
 
     except subprocess.CalledProcessError as e:
         print(f"\n✗ Erro durante o build: {e}")
@@ -206,11 +264,72 @@ def build_executable():
     return True
 
 
-def create_spec_file():
+def create_spec_file(mode=DEFAULT_MODE):
     """Cria um arquivo .spec personalizado para PyInstaller"""
-    spec_content = f"""# -*- mode: python ; coding: utf-8 -*-
+    name = APP_NAME.replace(" ", "_")
+    icon_file = APP_ICON if platform.system() == "Windows" else APP_ICNS
+
+    if mode == "onedir":
+        # Executável pequeno; bibliotecas e dados ficam ao lado, já extraídos
+        package = f"""exe = EXE(
+    pyz,
+    a.scripts,
+    [],
+    exclude_binaries=True,
+    name='{name}',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=False,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon=icon,
+)
 
-block_cipher = None
+coll = COLLECT(
+    exe,
+    a.binaries,
+    a.datas,
+    strip=False,
+    upx=False,
+    upx_exclude=[],
+    name='{name}',
+)
+bundled = coll
+"""
+    else:
+        package = f"""exe = EXE(
+    pyz,
+    a.scripts,
+    a.binaries,
+    a.datas,
+    [],
+    name='{name}',
+    debug=False,
+    bootloader_ignore_signals=False,
+    strip=False,
+    upx=True,
+    upx_exclude=[],
+    runtime_tmpdir=None,
+    console=False,
+    disable_windowed_traceback=False,
+    argv_emulation=False,
+    target_arch=None,
+    codesign_identity=None,
+    entitlements_file=None,
+    icon=icon,
+)
+bundled = exe
+"""
+
+    spec_content = f"""# -*- mode: python ; coding: utf-8 -*-
+# Gerado por build.py (modo {mode})
+import os
+import platform
 
 # Listar todos os arquivos de recursos
 resources = [
@@ -229,43 +348,53 @@ a = Analysis(
     hookspath=[],
     hooksconfig={{}},
     runtime_hooks=[],
-    excludes=[],
-    win_no_prefer_redirects=False,
-    win_private_assemblies=False,
-    cipher=block_cipher,
+    excludes={EXCLUDED_MODULES!r},
     noarchive=False,
 )
 
-pyz = PYZ(a.pure, a.zipped_data, cipher=block_cipher)
+# Remover plugins, bibliotecas e traduções do Qt que o programa não usa
+QT_PLUGINS_EXCLUDED = {QT_PLUGINS_EXCLUDED!r}
+QT_IMAGE_FORMATS = {QT_IMAGE_FORMATS!r}
+QT_LIBRARIES_EXCLUDED = {QT_LIBRARIES_EXCLUDED!r}
+# Plugins que dependem das bibliotecas removidas (ex.: qsvg -> Qt6Svg)
+QT_LIBRARY_KEYS = [lib[len('Qt6'):].lower() for lib in QT_LIBRARIES_EXCLUDED]
+
+
+def keep_qt_file(entry):
+    dest = '/' + entry[0].replace(os.sep, '/')
+    file_name = dest.rsplit('/', 1)[-1]
+    if '/Qt6/translations/' in dest:
+        return False  # o programa não carrega traduções do Qt
+    if '/Qt6/plugins/' in dest:
+        category = dest.split('/Qt6/plugins/', 1)[1].split('/', 1)[0]
+        if category in QT_PLUGINS_EXCLUDED:
+            return False
+        if category == 'imageformats' and not any(
+            file_name.startswith(fmt) or file_name.startswith('lib' + fmt)
+            for fmt in QT_IMAGE_FORMATS
+        ):
+            return False
+        if any(key in file_name.lower() for key in QT_LIBRARY_KEYS):
+            return False
+    return not any(
+        file_name.startswith(lib) or file_name.startswith('lib' + lib)
+        for lib in QT_LIBRARIES_EXCLUDED
+    )
 
-exe = EXE(
-    pyz,
-    a.scripts,
-    a.binaries,
-    a.zipfiles,
-    a.datas,
-    [],
-    name='{APP_NAME.replace(" ", "_")}',
-    debug=False,
-    bootloader_ignore_signals=False,
-    strip=False,
-    upx=True,
-    upx_exclude=[],
-    runtime_tmpdir=None,
-    console=False,
-    disable_windowed_traceback=False,
-    argv_emulation=False,
-    target_arch=None,
-    codesign_identity=None,
-    entitlements_file=None,
-    icon=['{APP_ICON if platform.system() == "Windows" else APP_ICNS}'] if os.path.exists('{APP_ICON if platform.system() == "Windows" else APP_ICNS}') else None,
-)
 
+a.binaries = [entry for entry in a.binaries if keep_qt_file(entry)]
+a.datas = [entry for entry in a.datas if keep_qt_file(entry)]
+
+pyz = PYZ(a.pure)
+
+icon = ['{icon_file}'] if os.path.exists('{icon_file}') else None
+
+{package}
 # Para macOS, cria um .app bundle
 if platform.system() == 'Darwin':
     app = BUNDLE(
-        exe,
-        name='{APP_NAME.replace(" ", "_")}.app',
+        bundled,
+        name='{name}.app',
         icon='{APP_ICNS}',
         bundle_identifier='com.duaautomation.app',
         info_plist={{
@@ -276,14 +405,151 @@ if platform.system() == 'Darwin':
     )
 """
 
-    with open("dua_automation.spec", "w") as f:
+    spec_file = f"dua_automation_{mode}.spec"
+    with open(spec_file, "w") as f:
         f.write(spec_content)
 
-    print("Arquivo .spec personalizado criado: dua_automation.spec")
-    return "dua_automation.spec"
+    print(f"Arquivo .spec personalizado criado: {spec_file}")
+    return spec_file
+
 
+def build_mode(mode, distpath="dist"):
+    """Gera o executável no modo informado; retorna o caminho ou None"""
+    spec_file = create_spec_file(mode)
+
+    # Executar PyInstaller com o arquivo .spec
+    print(f"\nExecutando PyInstaller com arquivo .spec personalizado ({mode})...")
+    try:
+        subprocess.check_call(
+            [
+                "pyinstaller",
+                "--clean",
+                "--noconfirm",
+                "--distpath",
+                distpath,
+                "--workpath",
+                os.path.join("build", mode),
+                spec_file,
+            ]
+        )
+        print("\n✓ Build concluído com sucesso usando arquivo .spec!")
+    except subprocess.CalledProcessError as e:
+        print(f"\n✗ Erro durante o build com .spec: {e}")
+        print("Tentando método alternativo de build...")
+
+        # Tentar método alternativo
+        if not build_executable(mode, distpath):
+            return None
+
+    exe_path = executable_path(mode, distpath)
+    report_executable(exe_path)
+    return exe_path if os.path.exists(exe_path) else None
+
+
+def bundle_size_mb(mode, distpath="dist"):
+    """Tamanho em disco do que é distribuído no modo informado"""
+    exe_path = executable_path(mode, distpath)
+    if mode == "onefile" and platform.system() != "Darwin":
+        return os.path.getsize(exe_path) / 1024 / 1024
+    root = os.path.join(distpath, APP_NAME.replace(" ", "_"))
+    if platform.system() == "Darwin":
+        root += ".app"
+    total = 0
+    for folder, _, files in os.walk(root):
+        for file_name in files:
+            path = os.path.join(folder, file_name)
+            if not os.path.islink(path):  # bibliotecas com links de versão
+                total += os.path.getsize(path)
+    return total / 1024 / 1024
+
+
+def measure_startup(exe_path, runs=STARTUP_RUNS):
+    """Tempos (s) do início do processo até a janela aparecer, um por abertura
+
+    A primeira abertura após o build é a "fria" (inclui a verificação do
+    antivírus no Windows); as seguintes encontram os arquivos no cache do sistema.
+    """
+    env = dict(os.environ)
+    if platform.system() == "Linux" and not (
+        env.get("DISPLAY") or env.get("WAYLAND_DISPLAY")
+    ):
+        env["QT_QPA_PLATFORM"] = "offscreen"
+
+    samples = []
+    for _ in range(runs):
+        with tempfile.TemporaryDirectory(prefix="dua_startup_") as temp_dir:
+            probe = os.path.join(temp_dir, "startup.txt")
+            env["DUA_STARTUP_PROBE"] = probe
+            started = time.time()
+            process = subprocess.Popen(
+                [os.path.abspath(exe_path)],
+                cwd=temp_dir,
+                env=env,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            try:
+                process.wait(timeout=STARTUP_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+            if not os.path.exists(probe):
+                print(f"  ✗ A janela não abriu em {STARTUP_TIMEOUT}s: {exe_path}")
+                return samples
+            with open(probe) as f:
+                samples.append(float(f.read()) - started)
+    return samples
+
+
+def compare_modes(runs=STARTUP_RUNS):
+    """Gera os dois modos e compara o tamanho e o tempo de abertura"""
+    report = {}
+    for mode in ["onefile", "onedir"]:
+        # O onedir fica em dist/ (usado pelo instalador); o onefile em dist/onefile
+        distpath = "dist" if mode == DEFAULT_MODE else os.path.join("dist", mode)
+        exe_path = build_mode(mode, distpath)
+        if exe_path is None:
+            continue
+        print(f"\nMedindo a abertura ({mode}, {runs} vezes)...")
+        samples = measure_startup(exe_path, runs)
+        if samples:
+            report[mode] = {
+                "size_mb": bundle_size_mb(mode, distpath),
+                "cold": samples[0],
+                "warm": statistics.median(samples[1:]) if len(samples) > 1 else None,
+            }
+
+    print("\n==== Tempo até a primeira janela ====")
+    print(f"{'Modo':<10}{'Tamanho':>12}{'Fria':>10}{'Quente':>10}")
+    for mode, row in report.items():
+        warm = f"{row['warm']:.2f}s" if row["warm"] is not None else "-"
+        print(
+            f"{mode:<10}{row['size_mb']:>10.0f}MB{row['cold']:>9.2f}s{warm:>10}"
+        )
+    if "onefile" in report and "onedir" in report and report["onedir"]["warm"]:
+        gain = report["onefile"]["warm"] - report["onedir"]["warm"]
+        print(f"\nO modo onedir abre {gain:.2f}s mais rápido (aberturas quentes)")
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=f"Compila o {APP_NAME}")
+    parser.add_argument(
+        "--mode",
+        choices=BUILD_MODES,
+        default=DEFAULT_MODE,
+        help="onedir (pasta, abre mais rápido; padrão do instalador) ou onefile",
+    )
+    parser.add_argument(
+        "--compare",
+        action="store_true",
+        help="gera os dois modos e mede a abertura fria e quente de cada um",
+    )
+    parser.add_argument(
+        "--runs", type=int, default=STARTUP_RUNS, help="aberturas medidas por modo"
+    )
+    args = parser.parse_args(argv)
 
-def main():
     print(f"==== Compilando {APP_NAME} v{VERSION} ====\n")
 
     # Verificar e criar estrutura GitHub
@@ -322,9 +588,6 @@ def main():
     else:
         print(f"  ✓ Diretório do Chrome portável encontrado em: {chrome_portable_dir}")
 
-    # Criar arquivo .spec personalizado
-    spec_file = create_spec_file()
-
     # Incluir arquivos de documentação do GitHub
     print("\nVerificando arquivos de documentação para GitHub...")
     docs_files = [
@@ -343,32 +606,15 @@ def main():
         else:
             print(f"  ! Arquivo {doc_file} não encontrado")
 
-    # Executar PyInstaller com o arquivo .spec
-    print("\nExecutando PyInstaller com arquivo .spec personalizado...")
-    try:
-        subprocess.check_call(["pyinstaller", "--clean", spec_file])
-        print("\n✓ Build concluído com sucesso usando arquivo .spec!")
-
-        # Mostrar o local do executável
-        system = platform.system()
-        if system == "Windows":
-            exe_path = os.path.join("dist", f"{APP_NAME.replace(' ', '_')}.exe")
-        elif system == "Darwin":
-            exe_path = os.path.join("dist", f"{APP_NAME.replace(' ', '_')}.app")
-        else:  # Linux
-            exe_path = os.path.join("dist", APP_NAME.replace(" ", "_"))
-
-        if os.path.exists(exe_path):
-            print(f"\nExecutável gerado em: {os.path.abspath(exe_path)}")
-        else:
-            print(f"\nExecutável esperado em: {os.path.abspath(exe_path)}")
-            print("Mas o arquivo não foi encontrado. Verifique erros no build.")
-    except subprocess.CalledProcessError as e:
-        print(f"\n✗ Erro durante o build com .spec: {e}")
-        print("Tentando método alternativo de build...")
-
-        # Tentar método alternativo
-        build_executable()
+    if args.compare:
+        compare_modes(args.runs)
+    else:
+        build_mode(args.mode)
+        if args.mode == "onedir":
+            print(
+                "\nDistribua a pasta inteira (ou use o instalador); "
+                "o executável depende dos arquivos ao lado dele."
+            )
 
     print("\nProcesso de build concluído!")
 
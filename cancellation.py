@@ -0,0 +1,86 @@
+"""
+Tokens de cancelamento cooperativo
+
+Cada processamento recebe um CancellationToken. Todas as esperas (WebDriver,
+pausas, CAPTCHA, download) consultam o token em intervalos curtos, então uma
+interrupção é atendida em menos de um segundo. O modo "drenar" deixa terminar
+as linhas em andamento, mas impede o início de novas.
+"""
+
+import threading
+
+# Intervalo entre consultas ao token durante as esperas
+POLL_INTERVAL = 0.2
+
+
+class CancelledError(BaseException):
+    """O processamento foi cancelado
+
+    Deriva de BaseException (como asyncio.CancelledError) para atravessar os
+    vários `except Exception` de recuperação sem ser tratada como falha comum.
+    """
+
+
+class CancellationToken:
+    """Sinal de cancelamento compartilhado entre a interface e o processamento"""
+
+    def __init__(self):
+        self._cancelled = threading.Event()
+        self._draining = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+        self.reason = None
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    @property
+    def draining(self):
+        """Nenhuma linha nova deve começar (cancelamento também implica drenagem)"""
+        return self._draining.is_set() or self._cancelled.is_set()
+
+    def cancel(self, reason="Interrupção solicitada"):
+        with self._lock:
+            if self._cancelled.is_set():
+                return
+            self.reason = reason
+            self._cancelled.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                print(f"Erro ao notificar cancelamento: {e}")
+
+    def drain(self):
+        self._draining.set()
+
+    def on_cancel(self, callback):
+        """Registra uma função chamada (uma vez) quando o token for cancelado"""
+        with self._lock:
+            if not self._cancelled.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def raise_if_cancelled(self):
+        if self._cancelled.is_set():
+            raise CancelledError(self.reason)
+
+    def sleep(self, seconds):
+        """time.sleep interrompível; levanta CancelledError se o token for cancelado"""
+        if self._cancelled.wait(seconds):
+            raise CancelledError(self.reason)
+
+    def wait_until(self, driver, condition, timeout):
+        """WebDriverWait(driver, timeout).until(condition), consultando o token a cada 200 ms"""
+        # Importado aqui: a interface usa o token antes de o Selenium ser carregado
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        def check(d):
+            self.raise_if_cancelled()
+            return condition(d)
+
+        return WebDriverWait(driver, timeout, poll_frequency=POLL_INTERVAL).until(check)
+
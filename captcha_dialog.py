@@ -1,18 +1,20 @@
 from PyQt6.QtWidgets import (
     QDialog, QVBoxLayout, QHBoxLayout, QLabel, 
-    QPushButton, QGroupBox, QMessageBox
+    QPushButton, QGroupBox, QMessageBox, QListWidget, QListWidgetItem,
+    QAbstractItemView
 )
 from PyQt6.QtCore import Qt, QTimer
-from PyQt6.QtGui import QFont, QIcon, QPixmap
+from PyQt6.QtGui import QFont, QPixmap
 
 class CaptchaDialog(QDialog):
-    """Diálogo para resolução manual de CAPTCHA"""
+    """Diálogo não modal com a fila de CAPTCHAs aguardando resolução manual"""
     
-    def __init__(self, parent=None, captcha_solved_callback=None):
+    def __init__(self, parent=None, captcha_queue=None):
         super().__init__(parent)
-        self.captcha_solved_callback = captcha_solved_callback
+        self.captcha_queue = captcha_queue
         self.setWindowFlags(Qt.WindowType.Dialog | Qt.WindowType.WindowStaysOnTopHint)
-        self.setWindowModality(Qt.WindowModality.ApplicationModal)
+        # Não bloquear a aplicação: as demais linhas continuam sendo processadas
+        self.setWindowModality(Qt.WindowModality.NonModal)
         self.init_ui()
         
     def init_ui(self):
@@ -79,22 +81,32 @@ class CaptchaDialog(QDialog):
         instructions_layout = QVBoxLayout(instructions_group)
         
         instructions_text = QLabel(
-            "<p>O sistema não conseguiu resolver o CAPTCHA automaticamente.</p>"
+            "<p>O sistema não conseguiu resolver alguns CAPTCHAs automaticamente. "
+            "As demais linhas continuam sendo processadas enquanto isso.</p>"
             "<p><b>Por favor, siga os passos abaixo:</b></p>"
             "<ol>"
             "<li>Localize a janela do navegador Chrome aberta pelo sistema</li>"
-            "<li>Observe o formulário de DUA com o CAPTCHA sendo exibido</li>"
-            "<li>Resolva o CAPTCHA visualmente, clicando nas imagens solicitadas</li>"
-            "<li>Após resolver o CAPTCHA, retorne a este diálogo</li>"
-            "<li>Clique no botão 'CAPTCHA Resolvido' abaixo</li>"
+            "<li>Cada linha pendente está numa aba própria com o formulário de DUA</li>"
+            "<li>Resolva o CAPTCHA de cada aba, clicando nas imagens solicitadas</li>"
+            "<li>Retorne a este diálogo e marque as linhas resolvidas</li>"
             "</ol>"
-            "<p style='color: #e63946;'><b>IMPORTANTE:</b> Não feche esta janela até resolver o CAPTCHA.</p>"
+            "<p style='color: #e63946;'><b>IMPORTANTE:</b> Não feche as abas pendentes no navegador.</p>"
         )
         instructions_text.setWordWrap(True)
         instructions_layout.addWidget(instructions_text)
         
         layout.addWidget(instructions_group)
         
+        # Lista de linhas pendentes
+        pending_group = QGroupBox("Linhas aguardando CAPTCHA")
+        pending_layout = QVBoxLayout(pending_group)
+        self.pending_list = QListWidget()
+        self.pending_list.setSelectionMode(
+            QAbstractItemView.SelectionMode.ExtendedSelection
+        )
+        pending_layout.addWidget(self.pending_list)
+        layout.addWidget(pending_group)
+        
         # Timer de espera
         self.wait_label = QLabel("Aguardando resolução do CAPTCHA...")
         self.wait_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
@@ -105,12 +117,17 @@ class CaptchaDialog(QDialog):
         button_layout = QHBoxLayout()
         button_layout.addStretch()
         
-        self.solved_button = QPushButton("CAPTCHA Resolvido")
+        self.solved_button = QPushButton("Selecionados Resolvidos")
         self.solved_button.setMinimumWidth(150)
         self.solved_button.clicked.connect(self.on_captcha_solved)
         button_layout.addWidget(self.solved_button)
         
-        self.cancel_button = QPushButton("Cancelar")
+        self.solved_all_button = QPushButton("Todos Resolvidos")
+        self.solved_all_button.setMinimumWidth(150)
+        self.solved_all_button.clicked.connect(self.on_all_captchas_solved)
+        button_layout.addWidget(self.solved_all_button)
+        
+        self.cancel_button = QPushButton("Cancelar Selecionados")
         self.cancel_button.setStyleSheet("background-color: #d32f2f;")
         self.cancel_button.clicked.connect(self.on_cancel)
         button_layout.addWidget(self.cancel_button)
@@ -119,40 +136,73 @@ class CaptchaDialog(QDialog):
         
         self.setLayout(layout)
         
+    def refresh(self):
+        """Atualiza a lista com as linhas ainda pendentes na fila"""
+        pending = self.captcha_queue.pending() if self.captcha_queue else []
+        selected = {item.data(Qt.ItemDataRole.UserRole) for item in self.pending_list.selectedItems()}
+        
+        self.pending_list.clear()
+        for request in pending:
+            row_label = f"Item {request.row_index + 1}: " if request.row_index is not None else ""
+            item = QListWidgetItem(f"{row_label}{request.describe()}")
+            item.setData(Qt.ItemDataRole.UserRole, request.id)
+            self.pending_list.addItem(item)
+            item.setSelected(request.id in selected)
+        
+        if not pending and self.isVisible():
+            self.hide()
+        
+    def selected_ids(self):
+        return {item.data(Qt.ItemDataRole.UserRole) for item in self.pending_list.selectedItems()}
+        
     def on_captcha_solved(self):
-        """Callback quando o usuário clica em 'CAPTCHA Resolvido'"""
-        if self.captcha_solved_callback:
-            self.captcha_solved_callback()
-        self.accept()
+        """Callback quando o usuário marca as linhas selecionadas como resolvidas"""
+        if self.captcha_queue:
+            self.captcha_queue.resolve(self.selected_ids())
+        self.refresh()
+        
+    def on_all_captchas_solved(self):
+        """Callback quando o usuário resolveu todos os CAPTCHAs pendentes"""
+        if self.captcha_queue:
+            self.captcha_queue.resolve_all()
+        self.refresh()
         
     def on_cancel(self):
-        """Callback quando o usuário cancela a operação"""
+        """Callback quando o usuário desiste das linhas selecionadas"""
+        request_ids = self.selected_ids()
+        if not request_ids:
+            return
+        
         reply = QMessageBox.question(
             self, 
             "Confirmar cancelamento", 
-            "Cancelar a resolução do CAPTCHA interromperá o processamento atual. Deseja continuar?",
+            "As linhas selecionadas serão registradas como falha. Deseja continuar?",
             QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
             QMessageBox.StandardButton.No
         )
         
         if reply == QMessageBox.StandardButton.Yes:
-            self.reject()
+            self.captcha_queue.cancel(request_ids)
+            self.refresh()
         
     def showEvent(self, event):
         """Override para iniciar animação quando o diálogo aparecer"""
         super().showEvent(event)
         
-        # Iniciar timer para animação de aguardando
-        self.dot_count = 0
-        self.wait_timer = QTimer(self)
-        self.wait_timer.timeout.connect(self.update_waiting_text)
+        # Iniciar timer para animação de aguardando (o diálogo é reaberto a cada novo CAPTCHA)
+        if not hasattr(self, 'wait_timer'):
+            self.dot_count = 0
+            self.wait_timer = QTimer(self)
+            self.wait_timer.timeout.connect(self.update_waiting_text)
         self.wait_timer.start(500)  # Atualiza a cada meio segundo
         
     def update_waiting_text(self):
         """Atualiza o texto de aguardando com animação de pontos"""
         self.dot_count = (self.dot_count % 3) + 1
         dots = "." * self.dot_count
-        self.wait_label.setText(f"Aguardando resolução do CAPTCHA{dots}")
+        self.wait_label.setText(
+            f"Aguardando resolução de {self.pending_list.count()} CAPTCHA(s){dots}"
+        )
         
     def closeEvent(self, event):
         """Override para limpar o timer ao fechar"""
@@ -0,0 +1,259 @@
+"""
+Telemetria de resolução de CAPTCHA e seleção adaptativa de estratégia
+
+Cada chamada ao RecaptchaSolver gera um registro (checkbox aprovado, tentativas
+de áudio, reconhecedor usado, duração). O histórico fica salvo localmente por
+máquina e é usado para escolher timeouts e número de tentativas.
+"""
+
+import json
+import math
+import os
+import platform
+import threading
+import time
+
+from app_paths import get_data_directory
+from metrics_export import CAPTCHA_ATTEMPTS
+
+STATS_FILENAME = "captcha_stats.json"
+
+# Quantidade de tentativas mantidas no histórico de cada máquina
+HISTORY_LIMIT = 200
+
+# Janela usada para decidir a estratégia (tentativas mais recentes)
+STRATEGY_WINDOW = 50
+
+# Mínimo de amostras antes de abandonar o comportamento padrão
+MIN_SAMPLES = 10
+
+# Com a espera do checkbox desligada, ela ainda é feita (curta) a cada N
+# tentativas, para perceber quando o checkbox voltar a passar
+CHECKBOX_PROBE_EVERY = 10
+CHECKBOX_PROBE_WAIT = 0.5
+
+# O histórico é gravado a cada N tentativas (e no fim da execução), não a cada
+# linha: os workers registram em paralelo e cada gravação reescreve o arquivo
+SAVE_EVERY = 10
+
+
+def machine_key():
+    """Identificador da máquina usado para separar as estatísticas"""
+    return f"{platform.node()}|{platform.system()} {platform.release()}"
+
+
+def percentile(values, pct):
+    """Percentil pelo método nearest-rank (values não precisa estar ordenado)"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def default_strategy():
+    """Estratégia usada enquanto não há histórico suficiente nesta máquina
+
+    São os mesmos padrões do RecaptchaSolver, que mantém a sua cópia para não
+    depender do aplicativo.
+    """
+    # Valores herdados do comportamento antigo para Windows 10 / demais sistemas
+    is_windows_10 = platform.system() == "Windows" and platform.release().startswith(
+        "10"
+    )
+    return {
+        "skip_checkbox_wait": False,
+        "checkbox_wait": 1.0,
+        "frame_timeout": 10 if is_windows_10 else 5,
+        "audio_attempts": 3,
+        "solve_retries": 3 if is_windows_10 else 1,
+        "recognizers": ["google"],
+    }
+
+
+class CaptchaStats:
+    """Armazena as tentativas de resolução e sugere a estratégia para a máquina"""
+
+    def __init__(self, path=None):
+        self.path = path or os.path.join(get_data_directory(), STATS_FILENAME)
+        self.lock = threading.Lock()
+        # Tentativas registradas nesta execução (para o relatório final)
+        self.session_attempts = []
+        self._data = self._load()
+        # Tentativas ainda não gravadas em disco
+        self._unsaved = 0
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save(self):
+        temp_path = f"{self.path}.tmp"
+        try:
+            # json.dumps usa o codificador em C; json.dump grava pedaço a pedaço em Python
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(json.dumps(self._data))
+            os.replace(temp_path, self.path)
+            self._unsaved = 0
+        except OSError as e:
+            print(f"Não foi possível salvar estatísticas de CAPTCHA: {e}")
+
+    def start_session(self):
+        """Começa uma nova execução: o resumo passa a contar só as novas tentativas"""
+        with self.lock:
+            self.session_attempts = []
+
+    def flush(self):
+        """Grava as tentativas pendentes (chamar ao fim de cada execução)"""
+        with self.lock:
+            if self._unsaved:
+                self._save()
+
+    def history(self):
+        """Histórico de tentativas desta máquina (mais antigas primeiro)"""
+        with self.lock:
+            return list(self._data.get(machine_key(), []))
+
+    def record(self, attempt):
+        """Registra o resultado de uma chamada ao resolvedor"""
+        entry = {
+            "timestamp": time.time(),
+            "success": bool(attempt.get("success")),
+            "checkbox_passed": bool(attempt.get("checkbox_passed")),
+            "checkbox_checked": bool(attempt.get("checkbox_checked", True)),
+            "audio_attempts": int(attempt.get("audio_attempts") or 0),
+            "recognizer": attempt.get("recognizer"),
+            "duration": round(float(attempt.get("duration") or 0.0), 3),
+            "frame_wait": attempt.get("frame_wait"),
+            "error": attempt.get("error"),
+        }
+        with self.lock:
+            history = self._data.setdefault(machine_key(), [])
+            history.append(entry)
+            del history[:-HISTORY_LIMIT]
+            self.session_attempts.append(entry)
+            self._unsaved += 1
+            if self._unsaved >= SAVE_EVERY:
+                self._save()
+        if entry["checkbox_passed"]:
+            CAPTCHA_ATTEMPTS.inc(outcome="checkbox")
+        else:
+            CAPTCHA_ATTEMPTS.inc(outcome="audio" if entry["success"] else "falha")
+        return entry
+
+    def choose_strategy(self):
+        """Escolhe timeouts, tentativas e reconhecedores com base no histórico"""
+        strategy = default_strategy()
+        recent = self.history()[-STRATEGY_WINDOW:]
+        if len(recent) < MIN_SAMPLES:
+            return strategy
+
+        # Checkbox: se praticamente nunca passa neste IP/máquina, não esperar por
+        # ele, exceto numa verificação curta a cada CHECKBOX_PROBE_EVERY tentativas.
+        # A taxa só considera as tentativas em que o checkbox foi verificado
+        # (registros antigos não têm o campo e sempre verificavam)
+        checked = [a for a in recent if a.get("checkbox_checked", True)]
+        checkbox_rate = (
+            sum(a["checkbox_passed"] for a in checked) / len(checked) if checked else 0.0
+        )
+        if checkbox_rate < 0.05:
+            since_probe = 0
+            for attempt in reversed(recent):
+                if attempt.get("checkbox_checked", True):
+                    break
+                since_probe += 1
+            if since_probe < CHECKBOX_PROBE_EVERY:
+                strategy["skip_checkbox_wait"] = True
+            else:
+                strategy["checkbox_wait"] = CHECKBOX_PROBE_WAIT
+
+        # Timeout do iframe: dobro do p95 observado, limitado entre 3 e 15 segundos
+        frame_waits = [a["frame_wait"] for a in recent if a.get("frame_wait")]
+        if frame_waits:
+            strategy["frame_timeout"] = min(
+                15, max(3, math.ceil(percentile(frame_waits, 95) * 2))
+            )
+
+        # Tentativas de resolução: o mínimo para chegar a 95% de sucesso acumulado
+        success_rate = sum(a["success"] for a in recent) / len(recent)
+        if success_rate < 0.1 or success_rate >= 0.95:
+            strategy["solve_retries"] = 1
+        else:
+            retries = math.ceil(math.log(0.05) / math.log(1 - success_rate))
+            strategy["solve_retries"] = min(3, max(1, retries))
+
+        # Tentativas de áudio: a maior quantidade que já resolveu, mais uma folga
+        audio_runs = [a for a in recent if a["audio_attempts"] > 0]
+        audio_wins = [a["audio_attempts"] for a in audio_runs if a["success"]]
+        if audio_wins:
+            strategy["audio_attempts"] = min(3, max(audio_wins) + 1)
+        elif len(audio_runs) >= MIN_SAMPLES:
+            # Áudio nunca funciona aqui: falhar rápido e pedir ajuda manual
+            strategy["audio_attempts"] = 1
+
+        # Reconhecedores ordenados pela taxa de sucesso observada
+        rates = {}
+        for attempt in audio_runs:
+            name = attempt.get("recognizer")
+            if name:
+                wins, total = rates.get(name, (0, 0))
+                rates[name] = (wins + attempt["success"], total + 1)
+        if rates:
+            ranked = sorted(rates, key=lambda n: rates[n][0] / rates[n][1], reverse=True)
+            strategy["recognizers"] = ranked + [
+                n for n in strategy["recognizers"] if n not in ranked
+            ]
+
+        return strategy
+
+    def summary(self, attempts=None):
+        """Resumo das tentativas (por padrão, as desta execução)"""
+        attempts = self.session_attempts if attempts is None else attempts
+        if not attempts:
+            return None
+
+        durations = [a["duration"] for a in attempts if a["success"]]
+        return {
+            "attempts": len(attempts),
+            "solved": sum(a["success"] for a in attempts),
+            "checkbox_pass_rate": sum(a["checkbox_passed"] for a in attempts)
+            / len(attempts),
+            "audio_attempts": sum(a["audio_attempts"] for a in attempts),
+            "duration_p50": percentile(durations, 50),
+            "duration_p95": percentile(durations, 95),
+            "duration_max": max(durations) if durations else None,
+        }
+
+    def format_summary(self, attempts=None):
+        """Linhas de texto com a distribuição do tempo de resolução"""
+        summary = self.summary(attempts)
+        if summary is None:
+            return ["CAPTCHA: nenhuma tentativa registrada"]
+
+        lines = [
+            f"CAPTCHA: {summary['solved']}/{summary['attempts']} resolvido(s) automaticamente",
+            f"   Aprovação direta no checkbox: {summary['checkbox_pass_rate']:.0%}",
+            f"   Tentativas de áudio: {summary['audio_attempts']}",
+        ]
+        if summary["duration_p50"] is not None:
+            lines.append(
+                f"   Tempo de resolução: p50 {summary['duration_p50']:.1f}s, "
+                f"p95 {summary['duration_p95']:.1f}s, máx {summary['duration_max']:.1f}s"
+            )
+        return lines
+
+
+_captcha_stats = None
+_captcha_stats_lock = threading.Lock()
+
+
+def get_captcha_stats():
+    """Instância compartilhada do armazenamento de estatísticas"""
+    global _captcha_stats
+    with _captcha_stats_lock:
+        if _captcha_stats is None:
+            _captcha_stats = CaptchaStats()
+        return _captcha_stats
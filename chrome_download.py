@@ -0,0 +1,366 @@
+"""
+Download robusto do Chrome portátil
+
+- Download em segmentos paralelos via HTTP Range (quando o servidor permite)
+- Retomada de downloads interrompidos a partir do arquivo parcial
+- Verificação SHA-256 do arquivo baixado
+- Armazenamento endereçado por conteúdo, reaproveitado entre instalações
+- Extração em streaming, membro a membro, com progresso
+"""
+
+import hashlib
+import json
+import os
+import pathlib
+import shutil
+import tempfile
+import threading
+import time
+import urllib.request
+import zipfile
+import zlib
+
+CHUNK_SIZE = 1024 * 1024
+DEFAULT_SEGMENTS = 4
+MIN_SEGMENT_SIZE = 4 * 1024 * 1024
+SEGMENT_RETRIES = 3
+REQUEST_TIMEOUT = 30
+
+# Erros de leitura que indicam um zip truncado ou corrompido
+CORRUPT_ARCHIVE_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError)
+
+
+def get_store_directory():
+    """Diretório do armazenamento local de arquivos, compartilhado entre instalações"""
+    if "DUA_STORE_DIR" in os.environ:
+        store_dir = os.environ["DUA_STORE_DIR"]
+    else:
+        store_dir = os.path.join(pathlib.Path.home(), ".dua_automation", "store")
+    os.makedirs(store_dir, exist_ok=True)
+    return store_dir
+
+
+def sha256_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def check_zip(path):
+    """Lê todos os membros do zip e confere o CRC; levanta IOError se estiver corrompido"""
+    try:
+        with zipfile.ZipFile(path, "r") as zip_ref:
+            bad_member = zip_ref.testzip()
+    except CORRUPT_ARCHIVE_ERRORS as e:
+        raise IOError(f"Arquivo zip inválido: {path} ({e})")
+    if bad_member is not None:
+        raise IOError(f"Arquivo zip corrompido: {path} (membro {bad_member})")
+
+
+class ProgressReporter:
+    """Acumula bytes processados e imprime o progresso a cada 5%"""
+
+    def __init__(self, label, total, callback=None):
+        self.label = label
+        self.total = total
+        self.callback = callback
+        self.done = 0
+        self._last_step = -1
+        self._lock = threading.Lock()
+
+    def add(self, amount):
+        with self._lock:
+            self.done += amount
+            done = self.done
+        if self.callback:
+            self.callback(done, self.total)
+        if self.total:
+            step = int(done * 20 / self.total)
+            if step != self._last_step:
+                self._last_step = step
+                print(f"{self.label}: {done * 100 // self.total}%")
+
+
+def probe_url(url):
+    """Descobre o tamanho do arquivo e se o servidor aceita requisições com Range"""
+    request = urllib.request.Request(url, headers={"Range": "bytes=0-0"})
+    with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+        etag = response.headers.get("ETag")
+        if response.status == 206:
+            content_range = response.headers.get("Content-Range", "")
+            total = content_range.rsplit("/", 1)[-1]
+            if total.isdigit():
+                return int(total), True, etag
+        length = response.headers.get("Content-Length")
+        return (int(length) if length else None), False, etag
+
+
+def _load_state(state_path):
+    try:
+        with open(state_path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_state(state_path, state):
+    temp_path = f"{state_path}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(temp_path, state_path)
+
+
+def _plan_segments(size, segments):
+    count = max(1, min(segments, size // MIN_SEGMENT_SIZE))
+    step = size // count
+    plan = []
+    for i in range(count):
+        start = i * step
+        end = size - 1 if i == count - 1 else start + step - 1
+        plan.append({"start": start, "end": end, "done": 0})
+    return plan
+
+
+def _download_segment(url, part_path, segment, state, state_path, lock, progress):
+    """Baixa um segmento, retomando do ponto já gravado em caso de falha"""
+    for attempt in range(1, SEGMENT_RETRIES + 1):
+        start = segment["start"] + segment["done"]
+        if start > segment["end"]:
+            return
+        try:
+            request = urllib.request.Request(
+                url, headers={"Range": f"bytes={start}-{segment['end']}"}
+            )
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+                if response.status != 206:
+                    raise IOError("O servidor ignorou o cabeçalho Range")
+                with open(part_path, "r+b") as f:
+                    f.seek(start)
+                    while True:
+                        chunk = response.read(CHUNK_SIZE)
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        with lock:
+                            segment["done"] += len(chunk)
+                        progress.add(len(chunk))
+                    f.flush()
+            with lock:
+                _save_state(state_path, state)
+            if segment["start"] + segment["done"] > segment["end"]:
+                return
+        except Exception as e:
+            print(f"Segmento {segment['start']}-{segment['end']}: tentativa {attempt} falhou ({e})")
+            with lock:
+                _save_state(state_path, state)
+            if attempt == SEGMENT_RETRIES:
+                raise
+            time.sleep(attempt)
+
+
+def download_file(url, dest_path, segments=DEFAULT_SEGMENTS, progress_callback=None):
+    """Baixa url para dest_path, retomando um download parcial anterior se existir"""
+    part_path = f"{dest_path}.part"
+    state_path = f"{dest_path}.part.json"
+
+    size, ranges, etag = probe_url(url)
+
+    if not ranges or not size:
+        # Sem suporte a Range: download simples, sem retomada
+        print("Servidor não aceita downloads parciais; baixando em um único fluxo")
+        progress = ProgressReporter("Download", size, progress_callback)
+        with urllib.request.urlopen(url, timeout=REQUEST_TIMEOUT) as response:
+            with open(part_path, "wb") as f:
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    f.write(chunk)
+                    progress.add(len(chunk))
+        os.replace(part_path, dest_path)
+        return dest_path
+
+    state = _load_state(state_path)
+    if (
+        not state
+        or state.get("url") != url
+        or state.get("size") != size
+        or state.get("etag") != etag
+        or not os.path.exists(part_path)
+    ):
+        state = {
+            "url": url,
+            "size": size,
+            "etag": etag,
+            "segments": _plan_segments(size, segments),
+        }
+        with open(part_path, "wb") as f:
+            f.truncate(size)
+        _save_state(state_path, state)
+    else:
+        already = sum(s["done"] for s in state["segments"])
+        print(f"Retomando download: {already * 100 // size}% já baixado")
+
+    progress = ProgressReporter("Download", size, progress_callback)
+    progress.add(sum(s["done"] for s in state["segments"]))
+
+    lock = threading.Lock()
+    errors = []
+
+    def worker(segment):
+        try:
+            _download_segment(url, part_path, segment, state, state_path, lock, progress)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [
+        threading.Thread(target=worker, args=(segment,), daemon=True)
+        for segment in state["segments"]
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    if errors:
+        # O arquivo parcial e o estado ficam em disco para a próxima tentativa
+        raise errors[0]
+
+    os.replace(part_path, dest_path)
+    os.unlink(state_path)
+    return dest_path
+
+
+class ContentStore:
+    """Arquivos guardados pelo SHA-256 do conteúdo, com índice url -> hash"""
+
+    def __init__(self, root=None):
+        self.root = root or get_store_directory()
+        self.blobs_dir = os.path.join(self.root, "sha256")
+        self.partial_dir = os.path.join(self.root, "partial")
+        self.index_path = os.path.join(self.root, "index.json")
+        os.makedirs(self.blobs_dir, exist_ok=True)
+        os.makedirs(self.partial_dir, exist_ok=True)
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_index(self, index):
+        temp_path = f"{self.index_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        os.replace(temp_path, self.index_path)
+
+    def blob_path(self, digest, suffix=""):
+        return os.path.join(self.blobs_dir, f"{digest}{suffix}")
+
+    def fetch(
+        self, url, expected_sha256=None, suffix="", progress_callback=None, validate=None
+    ):
+        """Retorna o caminho local do arquivo de url, baixando-o apenas se necessário
+
+        Sem hash fixado, o hash do primeiro download é registrado e passa a ser
+        exigido; validate (ex.: check_zip) confere o conteúdo antes disso, para
+        que um download truncado não seja registrado como o arquivo correto.
+        """
+        index = self._load_index()
+        digest = expected_sha256 or index.get(url)
+        if digest:
+            path = self.blob_path(digest, suffix)
+            if os.path.exists(path):
+                if sha256_file(path) == digest:
+                    print(f"Arquivo reaproveitado do armazenamento local: {path}")
+                    return path
+                print(f"Arquivo corrompido no armazenamento local, baixando novamente: {path}")
+                os.unlink(path)
+
+        partial_name = hashlib.sha256(url.encode("utf-8")).hexdigest()[:16] + suffix
+        download_path = os.path.join(self.partial_dir, partial_name)
+        download_file(url, download_path, progress_callback=progress_callback)
+
+        actual = sha256_file(download_path)
+        expected = expected_sha256 or index.get(url)
+        if expected and actual != expected:
+            os.unlink(download_path)
+            raise IOError(
+                f"SHA-256 divergente para {url}: esperado {expected}, obtido {actual}"
+            )
+        if validate is not None:
+            try:
+                validate(download_path)
+            except Exception:
+                os.unlink(download_path)
+                raise
+        if not expected:
+            print(f"SHA-256 registrado para {url}: {actual}")
+
+        path = self.blob_path(actual, suffix)
+        os.replace(download_path, path)
+        index[url] = actual
+        self._save_index(index)
+        return path
+
+    def evict(self, url, suffix=""):
+        """Remove o arquivo de url e o hash registrado (ex.: quando a extração falhou)"""
+        index = self._load_index()
+        digest = index.pop(url, None)
+        if digest is None:
+            return
+        self._save_index(index)
+        path = self.blob_path(digest, suffix)
+        if os.path.exists(path):
+            os.unlink(path)
+        print(f"Arquivo removido do armazenamento local: {path}")
+
+
+def extract_zip(archive_path, dest_dir, progress_callback=None):
+    """Extrai o zip membro a membro, preservando permissões Unix
+
+    A extração acontece num diretório temporário ao lado do destino e só
+    então os itens são movidos, para que uma extração interrompida não deixe
+    uma instalação pela metade.
+    """
+    dest_dir = os.path.abspath(dest_dir)
+    parent_dir = os.path.dirname(dest_dir)
+    os.makedirs(dest_dir, exist_ok=True)
+    staging_dir = tempfile.mkdtemp(prefix=".extract-", dir=parent_dir)
+
+    try:
+        with zipfile.ZipFile(archive_path, "r") as zip_ref:
+            members = zip_ref.infolist()
+            progress = ProgressReporter(
+                "Extração", sum(m.file_size for m in members), progress_callback
+            )
+            for member in members:
+                target = os.path.abspath(os.path.join(staging_dir, member.filename))
+                if not target.startswith(staging_dir + os.sep):
+                    raise IOError(f"Caminho inválido no arquivo zip: {member.filename}")
+
+                if member.is_dir():
+                    os.makedirs(target, exist_ok=True)
+                    continue
+
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                with zip_ref.open(member) as source, open(target, "wb") as dest:
+                    shutil.copyfileobj(source, dest, CHUNK_SIZE)
+
+                mode = member.external_attr >> 16
+                if mode & 0o777:
+                    os.chmod(target, mode & 0o777)
+                progress.add(member.file_size)
+
+        for name in os.listdir(staging_dir):
+            final_path = os.path.join(dest_dir, name)
+            if os.path.isdir(final_path):
+                shutil.rmtree(final_path)
+            elif os.path.exists(final_path):
+                os.unlink(final_path)
+            os.replace(os.path.join(staging_dir, name), final_path)
+    finally:
+        shutil.rmtree(staging_dir, ignore_errors=True)
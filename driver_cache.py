@@ -0,0 +1,117 @@
+"""
+Cache local do ChromeDriver e do perfil pré-aquecido do Chrome
+
+A versão do ChromeDriver é resolvida uma única vez por versão do Chrome e o
+caminho do executável fica salvo em disco, evitando a consulta de versões pela
+rede a cada inicialização (e permitindo iniciar sem internet).
+"""
+
+import json
+import os
+import platform
+import shutil
+import tempfile
+import threading
+
+from app_paths import get_data_directory
+
+CACHE_FILENAME = "driver_cache.json"
+PROFILE_TEMPLATE_DIRNAME = "chrome-profile"
+# Gravado quando o perfil modelo termina de ser criado; sem ele o modelo é refeito
+PROFILE_READY_MARKER = ".dua-profile-ready"
+
+# Arquivos de bloqueio/sessão que não devem ser copiados do perfil modelo
+PROFILE_IGNORE = shutil.ignore_patterns(
+    "Singleton*", "*.lock", "lockfile", "Crashpad", "Crash Reports"
+)
+
+_cache_lock = threading.Lock()
+_profile_lock = threading.Lock()
+
+
+def _cache_path():
+    return os.path.join(get_data_directory(), CACHE_FILENAME)
+
+
+def _load_cache():
+    try:
+        with open(_cache_path(), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_cache(cache):
+    temp_path = f"{_cache_path()}.tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(cache, f, indent=2)
+    os.replace(temp_path, _cache_path())
+
+
+def cache_key(chrome_version):
+    return f"{platform.system()}-{platform.machine()}-{chrome_version}"
+
+
+def resolve_chromedriver(chrome_version, resolver):
+    """Retorna o ChromeDriver para a versão do Chrome, chamando resolver() só na primeira vez"""
+    key = cache_key(chrome_version)
+    with _cache_lock:
+        entry = _load_cache().get(key)
+    if entry and os.path.exists(entry["path"]):
+        return entry["path"], True
+
+    driver_path = resolver()
+    with _cache_lock:
+        cache = _load_cache()
+        cache[key] = {"path": driver_path, "chrome_version": chrome_version}
+        try:
+            _save_cache(cache)
+        except OSError as e:
+            print(f"Não foi possível salvar o cache do ChromeDriver: {e}")
+    return driver_path, False
+
+
+def forget_chromedriver(chrome_version):
+    """Remove a entrada do cache (ex.: executável corrompido ou incompatível)"""
+    with _cache_lock:
+        cache = _load_cache()
+        if cache.pop(cache_key(chrome_version), None) is not None:
+            _save_cache(cache)
+
+
+def get_profile_template_dir():
+    return os.path.join(get_data_directory(), PROFILE_TEMPLATE_DIRNAME)
+
+
+def prepare_profile_dir(seed):
+    """Prepara uma cópia do perfil modelo para uma nova sessão
+
+    Na primeira vez o modelo é criado por seed(diretório), que abre e fecha
+    uma sessão descartável do Chrome num diretório temporário; só depois o
+    diretório passa a ser o modelo. Nenhuma sessão usa o modelo diretamente,
+    então as cópias nunca saem de um perfil em uso (bloqueado e pela metade).
+
+    Returns:
+        str: diretório do perfil da sessão (removido por quem o usou)
+    """
+    template_dir = get_profile_template_dir()
+    with _profile_lock:
+        if not os.path.exists(os.path.join(template_dir, PROFILE_READY_MARKER)):
+            # Modelo ausente ou incompleto (ex.: interrompido durante a criação)
+            shutil.rmtree(template_dir, ignore_errors=True)
+            staging_dir = tempfile.mkdtemp(
+                prefix=".chrome-profile-", dir=os.path.dirname(template_dir)
+            )
+            try:
+                seed(staging_dir)
+                with open(os.path.join(staging_dir, PROFILE_READY_MARKER), "w"):
+                    pass
+                os.replace(staging_dir, template_dir)
+            except BaseException:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+                raise
+
+    # Cada sessão usa uma cópia, pois o Chrome bloqueia o diretório de perfil em uso
+    session_dir = tempfile.mkdtemp(prefix="dua-chrome-profile-")
+    shutil.copytree(template_dir, session_dir, dirs_exist_ok=True, ignore=PROFILE_IGNORE)
+    return session_dir
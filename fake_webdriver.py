@@ -0,0 +1,694 @@
+"""
+WebDriver falso, em processo, para exercitar a automação sem navegador
+
+Implementa o subconjunto da API do Selenium usado por preencher_formulario,
+baixar_pdf e RecaptchaSolver (elementos, iframes, janelas, alertas,
+execute_script e execute_cdp_cmd) sobre páginas montadas em Python. Com ele o
+fluxo de uma linha roda em microssegundos, o que permite medir e comparar só o
+custo do lado Python.
+
+As páginas e as respostas dos scripts vêm de um FakePortal, que imita o e-DUA
+(formulário, reCAPTCHA, "Gerar DUA" e impressão). Tudo é programável:
+`driver.scripts[texto] = função(driver, *args)` e `driver.cdp[comando] =
+função(driver, params)` trocam respostas, e subclasses de FakePortal podem
+montar outras páginas.
+
+Uso:
+    import get_dua
+    from fake_webdriver import FakePortal
+
+    portal = FakePortal(reject_rate=0.05, seed=1)
+    get_dua.set_driver_factory(portal.driver)
+"""
+
+import base64
+import functools
+import itertools
+import random
+import re
+import threading
+import time
+import uuid
+from urllib.parse import parse_qs, urlparse
+
+from selenium.common.exceptions import (
+    ElementNotInteractableException,
+    JavascriptException,
+    NoAlertPresentException,
+    NoSuchElementException,
+    NoSuchFrameException,
+    NoSuchWindowException,
+    StaleElementReferenceException,
+    UnexpectedAlertPresentException,
+)
+
+from mock_portal import (
+    CAPTCHA_MODES,
+    FORM_PATH,
+    PRINT_PATH,
+    REJECTION_MESSAGES,
+    SERVICES,
+    validate_submission,
+)
+from portal_errors import (
+    GERAR_DUA_XPATH,
+    IMPRIMIR_XPATH,
+    SUBMIT_STATE_SCRIPT,
+    VISIBLE_ERRORS_SCRIPT,
+)
+from RecaptchaBypass.RecaptchaSolver import CHALLENGE_FRAME_XPATH, SOLVED_STATE_SCRIPT
+from service_catalog import SCRAPE_OPTIONS_SCRIPT
+from token_prefetch import INJECT_TOKEN_SCRIPT, READ_TOKEN_SCRIPT
+
+# Localizadores usados pelo RecaptchaSolver para o iframe do checkbox
+ANCHOR_FRAME_XPATH = "//iframe[contains(@title, 'reCAPTCHA')]"
+
+SCROLL_SCRIPT = "window.scrollTo(0, document.body.scrollHeight);"
+WINDOW_OPEN_PATTERN = re.compile(r"^window\.open\('([^']*)', '_blank'\);?$")
+
+# Seletor CSS simples: tag[atributo operador "valor"]
+CSS_PATTERN = re.compile(
+    r"^(?P<tag>[\w-]+)?(?:\[(?P<attr>[\w-]+)\s*(?P<op>[*^$]?=)\s*[\"']?(?P<value>.*?)[\"']?\])?$"
+)
+
+# Menor PDF válido, devolvido pelo Page.printToPDF
+PDF_STUB = (
+    b"%PDF-1.4\n1 0 obj<</Type/Catalog/Pages 2 0 R>>endobj\n"
+    b"2 0 obj<</Type/Pages/Kids[]/Count 0>>endobj\n"
+    b"trailer<</Root 1 0 R>>\n%%EOF\n"
+)
+
+
+@functools.lru_cache(maxsize=None)
+def _parse_selector(selector):
+    # Os mesmos poucos seletores são testados em todos os elementos de cada busca
+    match = CSS_PATTERN.match(selector.strip())
+    if match is None:
+        return None
+    return match.group("tag"), match.group("attr"), match.group("op"), match.group("value")
+
+
+def _is_control_key(char):
+    # selenium.webdriver.common.keys.Keys usa a área de uso privado do Unicode
+    return "\ue000" <= char <= "\uf8ff"
+
+
+class FakeElement:
+    """Elemento de página com atributos, filhos e ação de clique
+
+    Args:
+        locators: pares (by, valor) extras que encontram o elemento (ex.: XPaths)
+        on_click: função(elemento) chamada no click()
+        frame: FakeDocument exibido quando o elemento é um iframe
+    """
+
+    def __init__(
+        self,
+        tag,
+        text="",
+        attributes=None,
+        locators=(),
+        children=(),
+        on_click=None,
+        frame=None,
+        displayed=True,
+        enabled=True,
+    ):
+        self.tag_name = tag
+        self.text = text
+        self.attributes = dict(attributes or {})
+        self.value = self.attributes.get("value", "")
+        self.locators = set(locators)
+        self.children = []
+        self.parent = None
+        self.on_click = on_click
+        self.frame = frame
+        self.displayed = displayed
+        self.enabled = enabled
+        self.selected = False
+        for child in children:
+            self.append(child)
+
+    def append(self, child):
+        child.parent = self
+        self.children.append(child)
+        return child
+
+    def iter(self):
+        # Percurso em pré-ordem com pilha: geradores aninhados custam um nível
+        # de yield por profundidade a cada elemento
+        stack = self.children[::-1]
+        while stack:
+            element = stack.pop()
+            yield element
+            stack.extend(element.children[::-1])
+
+    def matches(self, by, value):
+        if (by, value) in self.locators:
+            return True
+        if by == "id":
+            return self.attributes.get("id") == value
+        if by == "name":
+            return self.attributes.get("name") == value
+        if by == "tag name":
+            return self.tag_name == value
+        if by == "css selector":
+            return self._css_matches(value)
+        return False
+
+    def _css_matches(self, selector):
+        parsed = _parse_selector(selector)
+        if parsed is None:
+            return False
+        tag, attr, op, expected = parsed
+        if tag and tag != self.tag_name:
+            return False
+        if not attr:
+            return True
+        actual = self.get_attribute(attr)
+        if actual is None:
+            return False
+        if op == "*=":
+            return expected in actual
+        if op == "^=":
+            return actual.startswith(expected)
+        if op == "$=":
+            return actual.endswith(expected)
+        return actual == expected
+
+    # API do WebElement
+
+    def find_elements(self, by="id", value=None):
+        return [e for e in self.iter() if e.matches(by, value)]
+
+    def find_element(self, by="id", value=None):
+        for element in self.iter():
+            if element.matches(by, value):
+                return element
+        raise NoSuchElementException(f"{by}={value}")
+
+    def get_attribute(self, name):
+        if name == "value":
+            return self.value
+        return self.attributes.get(name)
+
+    get_dom_attribute = get_attribute
+    get_property = get_attribute
+
+    def is_displayed(self):
+        return self.displayed
+
+    def is_enabled(self):
+        self._check_attached()
+        return self.enabled
+
+    def _check_attached(self):
+        # Elementos de uma página substituída ficam "stale", como no Chrome
+        root = self
+        while root.parent is not None:
+            root = root.parent
+        if getattr(root, "detached", False):
+            raise StaleElementReferenceException(f"<{self.tag_name}> não está mais na página")
+
+    def is_selected(self):
+        return self.selected
+
+    def click(self):
+        if not (self.displayed and self.enabled):
+            raise ElementNotInteractableException(f"<{self.tag_name}> não interativo")
+        if self.tag_name == "option" and self.parent is not None:
+            for option in self.parent.children:
+                option.selected = option is self
+            self.parent.value = self.value
+        if self.on_click is not None:
+            self.on_click(self)
+
+    def send_keys(self, *values):
+        self.value += "".join(c for c in "".join(values) if not _is_control_key(c))
+
+    def clear(self):
+        self.value = ""
+
+
+class FakeDocument(FakeElement):
+    """Documento (página ou conteúdo de iframe)"""
+
+    def __init__(self, url, title="", children=()):
+        super().__init__("html", children=children)
+        self.url = url
+        self.title = title
+        self.error = None  # mensagem de erro visível na página
+        self.detached = False  # a janela já navegou para outra página
+        self.token_field = None  # textarea g-recaptcha-response, quando houver
+
+    def page_source(self):
+        parts = [f"<html><head><title>{self.title}</title></head><body>"]
+        for element in self.iter():
+            attributes = "".join(f' {k}="{v}"' for k, v in element.attributes.items())
+            parts.append(f"<{element.tag_name}{attributes}>{element.text}</{element.tag_name}>")
+        if self.error:
+            parts.append(f'<div class="alert-danger">{self.error}</div>')
+        parts.append("</body></html>")
+        return "".join(parts)
+
+
+class FakeAlert:
+    def __init__(self, driver):
+        self.driver = driver
+        self.text = driver.alert_text
+
+    def accept(self):
+        self.driver.alert_text = None
+
+    dismiss = accept
+
+
+class FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def frame(self, reference):
+        driver = self.driver
+        if isinstance(reference, FakeElement):
+            element = reference
+        else:
+            frames = driver.context.find_elements("tag name", "iframe")
+            if isinstance(reference, int):
+                element = frames[reference] if reference < len(frames) else None
+            else:
+                element = next(
+                    (
+                        f
+                        for f in frames
+                        if reference in (f.attributes.get("id"), f.attributes.get("name"))
+                    ),
+                    None,
+                )
+        if element is None or element.frame is None:
+            raise NoSuchFrameException(str(reference))
+        driver.context = element.frame
+
+    def default_content(self):
+        self.driver.context = self.driver.window["document"]
+
+    parent_frame = default_content
+
+    def window(self, handle):
+        driver = self.driver
+        if handle not in driver.windows:
+            raise NoSuchWindowException(handle)
+        driver.current_window_handle = handle
+        driver.context = driver.windows[handle]["document"]
+
+    def new_window(self, type_hint=None):
+        self.window(self.driver.open_window("about:blank"))
+
+    @property
+    def alert(self):
+        if self.driver.alert_text is None:
+            raise NoAlertPresentException()
+        return FakeAlert(self.driver)
+
+
+class FakeDriver:
+    """Sessão falsa do navegador: janelas, iframes, scripts e comandos CDP"""
+
+    def __init__(self, portal):
+        self.portal = portal
+        self.windows = {}  # handle -> {"document": FakeDocument}
+        self._handles = itertools.count(1)
+        self.current_window_handle = None
+        self.context = None  # documento atual (página ou iframe)
+        self.alert_text = None
+        self.switch_to = FakeSwitchTo(self)
+        self.service = None  # sem processos para o browser_monitor medir
+        self.quit_called = False
+        self.calls = {}  # comando -> quantidade de chamadas
+
+        # Respostas programáveis
+        self.scripts = dict(portal.scripts())
+        self.cdp = {
+            "Page.printToPDF": lambda d, p: {
+                "data": base64.b64encode(PDF_STUB).decode("ascii")
+            },
+        }
+        self.switch_to.window(self.open_window("about:blank"))
+
+    def _count(self, name):
+        self.calls[name] = self.calls.get(name, 0) + 1
+
+    @property
+    def window(self):
+        if self.current_window_handle not in self.windows:
+            raise NoSuchWindowException(str(self.current_window_handle))
+        return self.windows[self.current_window_handle]
+
+    def open_window(self, url):
+        handle = f"janela-{next(self._handles)}"
+        self.windows[handle] = {"document": FakeDocument(url)}
+        if url != "about:blank":
+            self.windows[handle]["document"] = self.portal.load(self, url)
+        return handle
+
+    def navigate(self, document):
+        """Troca o documento da janela atual (navegação ou envio de formulário)"""
+        previous = self.window.get("document")
+        if previous is not None and previous is not document:
+            previous.detached = True
+        self.window["document"] = document
+        self.context = document
+
+    # API do WebDriver
+
+    def get(self, url):
+        self._count("get")
+        self.navigate(self.portal.load(self, url))
+
+    @property
+    def current_url(self):
+        return self.window["document"].url
+
+    @property
+    def title(self):
+        return self.window["document"].title
+
+    @property
+    def page_source(self):
+        return self.context.page_source()
+
+    @property
+    def window_handles(self):
+        return list(self.windows)
+
+    def _check_alert(self):
+        # Como no Chrome: com um alerta aberto, os comandos falham
+        if self.alert_text is not None:
+            raise UnexpectedAlertPresentException(alert_text=self.alert_text)
+
+    def find_element(self, by="id", value=None):
+        self._count("find_element")
+        self._check_alert()
+        return self.context.find_element(by, value)
+
+    def find_elements(self, by="id", value=None):
+        self._count("find_elements")
+        self._check_alert()
+        return self.context.find_elements(by, value)
+
+    def execute_script(self, script, *args):
+        self._count("execute_script")
+        self._check_alert()
+        handler = self.scripts.get(script)
+        if handler is not None:
+            return handler(self, *args)
+        match = WINDOW_OPEN_PATTERN.match(script.strip())
+        if match:
+            self.open_window(match.group(1))
+            return None
+        raise JavascriptException(f"Script não simulado: {script.strip()[:80]}")
+
+    def execute_cdp_cmd(self, cmd, params):
+        self._count("execute_cdp_cmd")
+        handler = self.cdp.get(cmd)
+        return handler(self, params) if handler is not None else {}
+
+    def get_log(self, log_type):
+        return []
+
+    def save_screenshot(self, path):
+        return True
+
+    def close(self):
+        self.windows.pop(self.current_window_handle, None)
+        self.context = None
+
+    def quit(self):
+        self.quit_called = True
+        self.windows.clear()
+        self.context = None
+
+
+class FakePortal:
+    """Comportamento do portal do e-DUA para os FakeDrivers criados por driver()
+
+    Args:
+        captcha: "checkbox" (passa no clique), "audio" ou "fail" (o clique não
+            passa; o desafio de áudio não é simulado e termina em falha)
+        captcha_fail_rate: fração de cliques no checkbox que não passam
+        reject_rate: fração de envios válidos rejeitados com mensagem de erro
+        alert_rate: fração das rejeições mostradas como alerta JavaScript
+        latency: atraso (s) de cada carregamento de página
+        seed: semente dos sorteios
+    """
+
+    def __init__(
+        self,
+        captcha="checkbox",
+        captcha_fail_rate=0.0,
+        reject_rate=0.0,
+        alert_rate=0.0,
+        latency=0.0,
+        seed=None,
+    ):
+        if captcha not in CAPTCHA_MODES:
+            raise ValueError(f"Modo de CAPTCHA desconhecido: {captcha}")
+        self.captcha = captcha
+        self.captcha_fail_rate = captcha_fail_rate
+        self.reject_rate = reject_rate
+        self.alert_rate = alert_rate
+        self.latency = latency
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.duas = {}
+        self.stats = {
+            "pages": 0,
+            "submissions": 0,
+            "rejected": 0,
+            "captcha_tokens": 0,
+            "generated": 0,
+            "printed": 0,
+        }
+
+    def driver(self):
+        """Fábrica de sessões (para get_dua.set_driver_factory)"""
+        return FakeDriver(self)
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def chance(self, rate):
+        if not rate:
+            return False
+        with self.lock:
+            return self.random.random() < rate
+
+    # Scripts executados pela automação
+
+    def scripts(self):
+        return {
+            SUBMIT_STATE_SCRIPT: self._submit_state,
+            VISIBLE_ERRORS_SCRIPT: self._visible_errors,
+            READ_TOKEN_SCRIPT: lambda d: self._token_field(d).value or None,
+            SOLVED_STATE_SCRIPT: lambda d: bool(self._token_field(d).value),
+            INJECT_TOKEN_SCRIPT: self._inject_token,
+            SCRAPE_OPTIONS_SCRIPT: self._scrape_options,
+            SCROLL_SCRIPT: lambda d: None,
+        }
+
+    def _token_field(self, driver):
+        field = driver.context.token_field
+        return field if field is not None else FakeElement("textarea")
+
+    def _visible_errors(self, driver, selectors):
+        return [driver.context.error] if driver.context.error else []
+
+    def _submit_state(self, driver, xpath, selectors, ignored=()):
+        document = driver.context
+        buttons = document.find_elements("xpath", xpath)
+        if buttons and buttons[0].displayed and buttons[0].enabled:
+            return {"state": "ready", "message": None}
+        if document.error and document.error not in ignored:
+            return {"state": "error", "message": document.error}
+        return {"state": "pending", "message": None}
+
+    def _inject_token(self, driver, token):
+        field = driver.context.token_field
+        if field is None:
+            return False
+        field.value = token
+        return True
+
+    def _scrape_options(self, driver):
+        selects = driver.context.find_elements("name", "idServico")
+        if not selects:
+            return None
+        return [[o.value, o.text] for o in selects[0].children if o.value]
+
+    # Páginas
+
+    def load(self, driver, url):
+        self.count("pages")
+        if self.latency:
+            time.sleep(self.latency)
+        parsed = urlparse(url)
+        if parsed.path == FORM_PATH:
+            return self.form_page(driver, url)
+        if parsed.path == PRINT_PATH:
+            return self.print_page(url, parse_qs(parsed.query).get("id", [""])[0])
+        return FakeDocument(url, "Agência Virtual", [FakeElement("body")])
+
+    def form_page(self, driver, url):
+        token_field = FakeElement(
+            "textarea", attributes={"name": "g-recaptcha-response"}, displayed=False
+        )
+        challenge = FakeElement(
+            "iframe",
+            attributes={"title": "recaptcha challenge expires in two minutes"},
+            locators={("xpath", CHALLENGE_FRAME_XPATH)},
+            frame=self.challenge_frame(url),
+            displayed=False,
+        )
+
+        def checkbox_clicked(element):
+            if self.captcha == "checkbox" and not self.chance(self.captcha_fail_rate):
+                self.count("captcha_tokens")
+                token_field.value = f"fake-{uuid.uuid4().hex}"
+            else:
+                challenge.displayed = True
+
+        anchor = FakeDocument(
+            url + "#recaptcha",
+            children=[
+                FakeElement(
+                    "span",
+                    attributes={"id": "recaptcha-anchor", "role": "checkbox"},
+                    on_click=checkbox_clicked,
+                )
+            ],
+        )
+        fields = [
+            FakeElement("input", attributes={"name": name, "type": "text"})
+            for name in ("codCpfCnpjPessoa", "datReferencia", "datVencimento", "vlrReceita")
+        ]
+        document = FakeDocument(
+            url,
+            "e-DUA - ICMS",
+            fields
+            + [
+                FakeElement(
+                    "select",
+                    attributes={"name": "idServico"},
+                    children=[FakeElement("option", "Selecione", {"value": ""})]
+                    + [
+                        FakeElement("option", text, {"value": value})
+                        for value, text in SERVICES
+                    ],
+                ),
+                FakeElement("textarea", attributes={"name": "dscInformacao"}),
+                FakeElement(
+                    "iframe",
+                    attributes={"title": "reCAPTCHA", "src": "/mock-recaptcha/anchor"},
+                    locators={("xpath", ANCHOR_FRAME_XPATH)},
+                    frame=anchor,
+                ),
+                token_field,
+                challenge,
+                FakeElement(
+                    "button",
+                    "Enviar",
+                    {"id": "btnEnviar", "type": "button"},
+                    on_click=lambda element: self.submit(driver, document),
+                ),
+            ],
+        )
+        document.token_field = token_field
+        return document
+
+    def challenge_frame(self, url):
+        """Desafio de áudio: o áudio não é servido, então a transcrição sempre falha"""
+        return FakeDocument(
+            url + "#challenge",
+            children=[
+                FakeElement(
+                    "button",
+                    attributes={"id": "recaptcha-audio-button", "title": "audio"},
+                ),
+                FakeElement(
+                    "button",
+                    attributes={"id": "recaptcha-reload-button", "title": "Get a new challenge"},
+                ),
+                FakeElement("audio", attributes={"id": "audio-source", "src": "data:,"}),
+                FakeElement("input", attributes={"id": "audio-response"}),
+            ],
+        )
+
+    def submit(self, driver, form):
+        self.count("submissions")
+        fields = {
+            element.attributes["name"]: element.value
+            for element in form.iter()
+            if element.attributes.get("name")
+        }
+        if not fields.get("g-recaptcha-response"):
+            driver.alert_text = "Por favor, confirme que você não é um robô."
+            return
+        message = validate_submission(fields)
+        if message is None and self.chance(self.reject_rate):
+            with self.lock:
+                message = self.random.choice(REJECTION_MESSAGES)
+        if message:
+            self.count("rejected")
+            if self.chance(self.alert_rate):
+                driver.alert_text = message
+                return
+            result = FakeDocument(form.url, "e-DUA - ICMS")
+            result.error = message
+            driver.navigate(result)
+            return
+
+        dua_id = uuid.uuid4().hex
+        with self.lock:
+            self.duas[dua_id] = fields
+        print_url = form.url.replace(FORM_PATH, PRINT_PATH) + f"?id={dua_id}"
+        link = FakeElement(
+            "a",
+            "Imprimir ou Salvar PDF",
+            {"href": print_url, "target": "_blank"},
+            locators={("xpath", IMPRIMIR_XPATH)},
+            displayed=False,
+        )
+
+        def gerar_clicked(element):
+            self.count("generated")
+            element.enabled = False
+            link.displayed = True
+
+        driver.navigate(
+            FakeDocument(
+                form.url,
+                "e-DUA - ICMS",
+                [
+                    FakeElement(
+                        "button",
+                        "Gerar DUA",
+                        {"id": "btnGerar", "onclick": "gerarDua()"},
+                        locators={("xpath", GERAR_DUA_XPATH)},
+                        on_click=gerar_clicked,
+                    ),
+                    link,
+                ],
+            )
+        )
+
+    def print_page(self, url, dua_id):
+        with self.lock:
+            fields = self.duas.get(dua_id)
+        if fields is None:
+            return FakeDocument(url, "DUA não encontrado", [FakeElement("body")])
+        self.count("printed")
+        return FakeDocument(
+            url,
+            f"DUA {dua_id}",
+            [FakeElement("body", f"DUA {dua_id[:12].upper()} - {fields['codCpfCnpjPessoa']}")],
+        )
@@ -2,44 +2,91 @@ from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
-import csv
+from selenium.common.exceptions import (
+    NoAlertPresentException,
+    NoSuchElementException,
+    UnexpectedAlertPresentException,
+)
 import time
 import os
-import pandas as pd
-import requests
-from urllib.parse import urlparse
 
 # Import the RecaptchaSolver
 from RecaptchaBypass.RecaptchaSolver import RecaptchaSolver
+from browser_monitor import BrowserSupervisor, kill_driver_processes
+from cancellation import CancellationToken, CancelledError
+from captcha_stats import get_captcha_stats
+from chrome_download import (
+    CORRUPT_ARCHIVE_ERRORS,
+    ContentStore,
+    check_zip,
+    extract_zip,
+)
+from driver_cache import (
+    resolve_chromedriver,
+    forget_chromedriver,
+    prepare_profile_dir,
+)
+from manual_captcha import ManualCaptchaQueue, ManualCaptchaRequest
+from portal_errors import (
+    ERROR_SELECTORS,
+    GERAR_DUA_XPATH,
+    IMPRIMIR_XPATH,
+    SUBMIT_PAGE_WAIT,
+    SUBMIT_STATE_SCRIPT,
+    VISIBLE_ERRORS_SCRIPT,
+    PortalValidationError,
+    classify_error,
+)
+from service_catalog import get_service_catalog
+from stage_watchdog import StageTimeout, StageWatchdog
+from run_timings import RunTimings
+from session_recorder import SessionRecorder
+import metrics_export
+from throttle import TokenBucket
+from token_prefetch import (
+    TokenPool,
+    TokenPrefetcher,
+    READ_TOKEN_SCRIPT,
+    INJECT_TOKEN_SCRIPT,
+)
 from pathlib import Path
 
-# Add webdriver_manager to automatically download the correct ChromeDriver
-from webdriver_manager.chrome import ChromeDriverManager
 from selenium.webdriver.chrome.service import Service
 import sys
+import contextlib
 import platform
-import subprocess
 import traceback
-import tempfile
-import zipfile
-import urllib.request
+import threading
+import shutil
+
+
+def chrome_driver_manager():
+    """Importa o webdriver-manager só quando um ChromeDriver precisa ser resolvido
+
+    Retorna (ChromeDriverManager, ChromeType), com ChromeType substituto nas
+    versões do webdriver-manager que não o exportam.
+    """
+    try:
+        # For newer versions of webdriver-manager
+        from webdriver_manager.chrome import ChromeDriverManager, ChromeType
+    except ImportError:
+        # For older versions where ChromeType might be defined differently
+        from webdriver_manager.chrome import ChromeDriverManager
 
-# Fix ChromeType import issue - handle different webdriver-manager versions
-try:
-    # For newer versions of webdriver-manager
-    from webdriver_manager.chrome import ChromeDriverManager, ChromeType
-except ImportError:
-    # For older versions where ChromeType might be defined differently
-    from webdriver_manager.chrome import ChromeDriverManager
+        # Create a fallback ChromeType enum
+        class ChromeType:
+            GOOGLE = "google"
+            CHROMIUM = "chromium"
 
-    # Create a fallback ChromeType enum
-    class ChromeType:
-        GOOGLE = "google"
-        CHROMIUM = "chromium"
+    return ChromeDriverManager, ChromeType
 
 
 # Configurações
 CSV_PATH = "dados.csv"
+# DUA_PORTAL_URL aponta para outro servidor (ex.: o portal simulado em mock_portal.py)
+PORTAL_URL = os.environ.get("DUA_PORTAL_URL", "https://internet.sefaz.es.gov.br").rstrip("/")
+HOME_URL = f"{PORTAL_URL}/agenciavirtual/"
+FORM_URL = f"{PORTAL_URL}/agenciavirtual/area_publica/e-dua/icms.php"
 
 # Constants for Chrome portable
 CHROME_PORTABLE_VERSION = "114.0.5735.90"  # A stable Chrome version
@@ -50,6 +97,12 @@ CHROME_PORTABLE_URL = {
 }
 
 
+# SHA-256 esperado dos zips do Chrome portátil, por sistema. Quando ausente, o
+# primeiro download que passar na verificação do zip tem o hash registrado no
+# armazenamento local, que passa a ser exigido.
+CHROME_PORTABLE_SHA256 = {}
+
+
 # Determine appropriate PDF directory
 def get_pdf_directory():
     """Get an appropriate PDF directory that works for both development and executable environments"""
@@ -74,77 +127,187 @@ def get_pdf_directory():
             # Running in development
             pdf_dir = os.path.abspath("pdfs_gerados")
 
-    # Ensure directory exists
-    os.makedirs(pdf_dir, exist_ok=True)
     return pdf_dir
 
 
-# Set PDF directory
+# Set PDF directory (criado ao iniciar o primeiro navegador, não na importação)
 PDF_DIR = get_pdf_directory()
-print(f"PDFs will be saved to: {PDF_DIR}")
-
-# Configurar opções do Chrome
-options = webdriver.ChromeOptions()
-options.add_argument("--disable-dev-shm-usage")
-options.add_argument("--no-sandbox")
-options.add_argument("--log-level=3")
-options.add_argument("--no-proxy-server")
-options.add_argument("--incognito")
-# Forçar idioma inglês para compatibilidade com o solver de CAPTCHA
-options.add_argument("--lang=en-US")
-options.add_argument("--language=en-US")
-options.add_experimental_option(
-    "prefs",
-    {
-        "download.default_directory": PDF_DIR,
-        "download.prompt_for_download": False,
-        "download.directory_upgrade": True,
-        "plugins.always_open_pdf_externally": True,  # Isso faz com que PDFs sejam baixados em vez de abertos
-        "download.open_pdf_in_system_reader": False,
-        # Adicionar configurações de idioma aqui também
-        "intl.accept_languages": "en-US,en",
-        "profile.default_content_setting_values.geolocation": 2,
-    },
-)
-options.add_experimental_option(
-    "excludeSwitches", ["enable-automation", "enable-logging"]
-)
-options.add_experimental_option("useAutomationExtension", False)
 
-# Adicionar cabeçalho Accept-Language para requisições
-options.add_argument("--accept-lang=en-US,en;q=0.9")
+def build_chrome_options(profile_dir=None):
+    """Monta as opções do Chrome para uma nova sessão"""
+    chrome_options = webdriver.ChromeOptions()
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--log-level=3")
+    chrome_options.add_argument("--no-proxy-server")
+    if profile_dir:
+        # Perfil pré-aquecido (cache e primeira execução já feitos)
+        chrome_options.add_argument(f"--user-data-dir={profile_dir}")
+        chrome_options.add_argument("--no-first-run")
+        chrome_options.add_argument("--no-default-browser-check")
+    else:
+        chrome_options.add_argument("--incognito")
+    # Forçar idioma inglês para compatibilidade com o solver de CAPTCHA
+    chrome_options.add_argument("--lang=en-US")
+    chrome_options.add_argument("--language=en-US")
+    chrome_options.add_experimental_option(
+        "prefs",
+        {
+            "download.default_directory": PDF_DIR,
+            "download.prompt_for_download": False,
+            "download.directory_upgrade": True,
+            "plugins.always_open_pdf_externally": True,  # Isso faz com que PDFs sejam baixados em vez de abertos
+            "download.open_pdf_in_system_reader": False,
+            # Adicionar configurações de idioma aqui também
+            "intl.accept_languages": "en-US,en",
+            "profile.default_content_setting_values.geolocation": 2,
+        },
+    )
+    chrome_options.add_experimental_option(
+        "excludeSwitches", ["enable-automation", "enable-logging"]
+    )
+    chrome_options.add_experimental_option("useAutomationExtension", False)
+
+    # Adicionar cabeçalho Accept-Language para requisições
+    chrome_options.add_argument("--accept-lang=en-US,en;q=0.9")
+    return chrome_options
+
 
-# Variável global para o driver - inicialmente None
-driver = None
+# Usar uma cópia do perfil pré-aquecido em vez de uma janela anônima
+use_profile_template = False
 
-# Variável global para controle de interrupção
-stop_requested = False
+# Diretórios temporários de perfil de cada sessão (removidos ao fechar)
+session_profile_dirs = {}
+
+# Tempos de inicialização do navegador nesta execução (segundos)
+browser_startup_times = []
+
+
+# Sessão do navegador de cada thread de processamento (thread id -> driver)
+drivers = {}
+drivers_lock = threading.Lock()
+
+# Botão "Enviar" clicado por último em cada thread e as mensagens de erro já
+# visíveis no clique (thread id -> (elemento, mensagens)); enquanto o botão
+# estiver na página, o resultado do envio ainda não carregou
+submitted_buttons = {}
+
+# Limitadores compartilhados de navegações e envios (por minuto; 0 = sem limite)
+navigation_limiter = TokenBucket(0)
+submission_limiter = TokenBucket(0)
+
+# Navegadores pré-iniciados em segundo plano, aguardando o início do processamento
+warm_drivers = []
+warmup_threads = []
+warmup_lock = threading.Lock()
+# Incrementada ao descartar: pré-inicializações de uma geração anterior fecham o
+# próprio navegador ao terminar, em vez de entregá-lo
+warmup_generation = 0
+
+# Espera máxima pelas pré-inicializações ao descartar (fechar a janela, gravar a
+# sessão); a primeira pode estar baixando o Chrome portátil
+WARMUP_DISCARD_TIMEOUT = 2.0
+
+# Token de cancelamento do processamento atual (um novo a cada execução)
+cancel_token = CancellationToken()
 
 # Adicionar variáveis globais para comunicação com a UI
 captcha_callback = None
-manual_captcha_requested = False
+
+# Linhas aguardando resolução manual do CAPTCHA (cada uma com seu próprio Event)
+manual_captcha_queue = ManualCaptchaQueue()
+
+# Pool de tokens de CAPTCHA pré-resolvidos em segundo plano
+token_pool = None
+token_prefetcher = None
+
+# Watchdog que aplica o prazo de cada etapa da linha (None = sem prazos)
+stage_watchdog = None
+
+# Tempos por etapa da execução atual (None = sem medição)
+run_timings = None
+
+# Gravação da sessão para reprodução offline (None = sem gravação)
+session_recorder = None
+
+# Fábrica de sessões no lugar do Chrome (ex.: fake_webdriver.FakePortal().driver)
+driver_factory = None
+
+# Pausa antes de clicar em "Gerar DUA" (o portal ainda monta a página)
+GERAR_DUA_DELAY = 1.0
+
+
+def set_cancel_token(token):
+    """Define o token consultado pelas funções quando nenhum é passado explicitamente"""
+    global cancel_token
+    cancel_token = token
 
 
 def set_stop_flag():
     """Set a global stop flag to interrupt any ongoing operations"""
-    global stop_requested
-    stop_requested = True
+    cancel_token.cancel()
     print("Stop flag set in get_dua module")
 
 
 def check_stop_flag():
     """Check if stop was requested"""
-    return stop_requested
+    return cancel_token.cancelled
 
 
 def reset_stop_flag():
     """Reset the stop flag"""
-    global stop_requested
-    stop_requested = False
+    set_cancel_token(CancellationToken())
+
+
+def set_stage_watchdog(watchdog):
+    """Define o StageWatchdog usado por preencher_formulario e baixar_pdf"""
+    global stage_watchdog
+    stage_watchdog = watchdog
+
+
+def run_stage(name):
+    """Contexto com o prazo da etapa, quando há um watchdog ativo"""
+    if stage_watchdog is None:
+        return contextlib.nullcontext()
+    return stage_watchdog.stage(name)
+
+
+def set_run_timings(timings):
+    """Define o RunTimings que recebe os tempos de cada etapa"""
+    global run_timings
+    run_timings = timings
+
+
+def timed(stage):
+    """Contexto que mede a etapa, quando há uma coleta de tempos ativa"""
+    if run_timings is None:
+        return contextlib.nullcontext()
+    return run_timings.measure(stage)
+
+
+def set_driver_factory(factory):
+    """Define a função que cria as sessões do navegador (None = Chrome)"""
+    global driver_factory
+    driver_factory = factory
+
+
+def set_session_recorder(recorder):
+    """Define o SessionRecorder da execução (navegadores novos passam a ser gravados)"""
+    global session_recorder
+    session_recorder = recorder
+
+
+def record_session(driver, stage, cpf_cnpj=None):
+    """Grava o tráfego e a página atual, quando há uma gravação ativa"""
+    if session_recorder is not None:
+        session_recorder.capture(driver, stage, cpf_cnpj)
 
 
 def set_captcha_callback(callback_function):
-    """Define a callback function to be called when manual CAPTCHA solving is needed"""
+    """Define a callback function to be called when manual CAPTCHA solving is needed
+
+    The callback receives the parked ManualCaptchaRequest and must not block.
+    """
     global captcha_callback
     captcha_callback = callback_function
 
@@ -198,25 +361,28 @@ def download_portable_chrome():
         print(f"Downloading portable Chrome {CHROME_PORTABLE_VERSION}...")
         chrome_url = CHROME_PORTABLE_URL[system]
 
-        # Create a temporary file for the download
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".zip") as temp_file:
-            zip_path = temp_file.name
-
-        # Download the Chrome zip file
-        urllib.request.urlretrieve(chrome_url, zip_path)
+        # Baixar (ou reaproveitar) o zip no armazenamento local, com verificação SHA-256
+        store = ContentStore()
+        zip_path = store.fetch(
+            chrome_url,
+            expected_sha256=CHROME_PORTABLE_SHA256.get(system),
+            suffix=".zip",
+            validate=check_zip,
+        )
 
         # Extract the zip file
         print(f"Extracting portable Chrome to {base_dir}...")
-        with zipfile.ZipFile(zip_path, "r") as zip_ref:
-            zip_ref.extractall(base_dir)
+        try:
+            extract_zip(zip_path, base_dir)
+        except CORRUPT_ARCHIVE_ERRORS:
+            # Não reaproveitar um arquivo que não extrai; a próxima tentativa baixa de novo
+            store.evict(chrome_url, suffix=".zip")
+            raise
 
         # Make the Chrome binary executable on Unix systems
         if system != "Windows":
             os.chmod(chrome_path, 0o755)
 
-        # Clean up the temporary file
-        os.unlink(zip_path)
-
         print(f"Portable Chrome installed at: {chrome_path}")
         return chrome_path
 
@@ -226,82 +392,360 @@ def download_portable_chrome():
         return None
 
 
-# Função para inicializar o WebDriver quando necessário
-def initialize_driver():
-    global driver
-    if driver is None:
-        print("Inicializando o navegador Chrome...")
-        try:
-            # Always try to get/use portable Chrome for stability
-            portable_chrome_path = get_portable_chrome_path()
+def set_profile_template(enabled):
+    """Ativa ou desativa o uso do perfil pré-aquecido do Chrome"""
+    global use_profile_template
+    use_profile_template = enabled
 
-            # If portable Chrome doesn't exist, download it
-            if not os.path.exists(portable_chrome_path):
-                print("Portable Chrome not found, downloading...")
-                portable_chrome_path = download_portable_chrome()
 
-            if portable_chrome_path and os.path.exists(portable_chrome_path):
-                print(f"Using portable Chrome from: {portable_chrome_path}")
-                options.binary_location = portable_chrome_path
-            else:
-                print("Portable Chrome not available, falling back to system Chrome")
-                chrome_path = find_chrome_executable()
-                if chrome_path:
-                    options.binary_location = chrome_path
-                    print(f"Using system Chrome: {chrome_path}")
+def install_pinned_chromedriver(chrome_version):
+    """Baixa o ChromeDriver da versão exata do Chrome informado"""
+    ChromeDriverManager, _ = chrome_driver_manager()
+    try:
+        # webdriver-manager >= 4
+        return ChromeDriverManager(driver_version=chrome_version).install()
+    except TypeError:
+        # Versões antigas usam o parâmetro 'version'
+        return ChromeDriverManager(version=chrome_version).install()
 
-            # Tentar inicializar o Chrome com WebDriverManager automaticamente
-            try:
-                print("Tentando usar WebDriverManager para obter ChromeDriver...")
-                # Use Chrome for Testing driver for better compatibility
-                # Handle different webdriver-manager versions
-                try:
-                    service = Service(
-                        ChromeDriverManager(chrome_type=ChromeType.CHROMIUM).install()
-                    )
-                except (TypeError, AttributeError):
-                    # Fallback for older versions that don't support chrome_type
-                    service = Service(ChromeDriverManager().install())
-
-                driver = webdriver.Chrome(service=service, options=options)
-                print("Chrome iniciado com WebDriverManager")
-            except Exception as webdriver_error:
-                print(f"Erro com WebDriverManager: {webdriver_error}")
-                print("Tentando inicializar o Chrome diretamente...")
-                driver = webdriver.Chrome(options=options)
-                print("Chrome iniciado diretamente")
-
-            # Abrir uma página padrão inicial
-            driver.get("https://internet.sefaz.es.gov.br/agenciavirtual/")
-            print("Navegador iniciado com sucesso.")
 
-        except Exception as e:
-            error_message = f"Erro ao inicializar Chrome: {str(e)}\n"
-            error_message += traceback.format_exc()
-            print(error_message)
+def install_latest_chromedriver():
+    """Resolve o ChromeDriver mais recente (usado com o Chrome do sistema)"""
+    # Handle different webdriver-manager versions
+    ChromeDriverManager, ChromeType = chrome_driver_manager()
+    try:
+        return ChromeDriverManager(chrome_type=ChromeType.CHROMIUM).install()
+    except (TypeError, AttributeError):
+        # Fallback for older versions that don't support chrome_type
+        return ChromeDriverManager().install()
+
 
-            # Tentar com configurações alternativas
+def seed_profile_template(profile_dir):
+    """Sessão descartável que cria e aquece o perfil modelo no diretório"""
+    print(f"Criando perfil pré-aquecido do Chrome em: {profile_dir}")
+    seed_driver = create_driver(profile_dir)
+    seed_driver.quit()
+    if not os.listdir(profile_dir):
+        # A configuração alternativa de create_driver não usa o perfil
+        raise Exception("o Chrome não gravou o perfil")
+
+
+def create_driver(profile_dir=None):
+    """Cria uma nova sessão do Chrome, independente do driver global
+
+    Args:
+        profile_dir: diretório de perfil a usar; sem ele, uma cópia do perfil
+            pré-aquecido quando ativado (set_profile_template)
+    """
+    os.makedirs(PDF_DIR, exist_ok=True)
+    if driver_factory is not None:
+        new_driver = driver_factory()
+        new_driver.get(HOME_URL)
+        return new_driver
+
+    t_start = time.perf_counter()
+    session_profile_dir = None
+    try:
+        if profile_dir is None and use_profile_template:
             try:
-                print("Tentando configuração alternativa...")
-                alt_options = webdriver.ChromeOptions()
-                alt_options.add_argument("--headless=new")
-                alt_options.add_argument("--disable-gpu")
-                alt_options.add_argument("--no-sandbox")
-                alt_options.add_argument("--disable-dev-shm-usage")
-
-                service = Service(ChromeDriverManager().install())
-                driver = webdriver.Chrome(service=service, options=alt_options)
-                print("Chrome iniciado em modo alternativo")
-                driver.get("https://internet.sefaz.es.gov.br/agenciavirtual/")
-            except Exception as alt_error:
-                print(f"Erro na configuração alternativa: {alt_error}")
-                print(
-                    "Falha ao inicializar o Chrome. Verifique se o Chrome está instalado corretamente."
+                profile_dir = session_profile_dir = prepare_profile_dir(
+                    seed_profile_template
                 )
-                # Propagar o erro para ser tratado pela UI
-                raise Exception(f"Não foi possível inicializar o Chrome: {str(e)}")
+            except Exception as e:
+                print(f"Perfil pré-aquecido indisponível, usando um perfil novo: {e}")
+        session_options = build_chrome_options(profile_dir)
+        if session_recorder is not None:
+            # O log de desempenho do Chrome é a fonte do tráfego gravado
+            session_options.set_capability(
+                "goog:loggingPrefs", {"performance": "ALL"}
+            )
 
-    return driver
+        # Always try to get/use portable Chrome for stability
+        portable_chrome_path = get_portable_chrome_path()
+
+        # If portable Chrome doesn't exist, download it
+        if not os.path.exists(portable_chrome_path):
+            print("Portable Chrome not found, downloading...")
+            portable_chrome_path = download_portable_chrome()
+
+        if portable_chrome_path and os.path.exists(portable_chrome_path):
+            print(f"Using portable Chrome from: {portable_chrome_path}")
+            session_options.binary_location = portable_chrome_path
+            # O ChromeDriver é fixado na versão do Chrome portátil
+            chrome_version = CHROME_PORTABLE_VERSION
+            resolver = lambda: install_pinned_chromedriver(CHROME_PORTABLE_VERSION)
+        else:
+            print("Portable Chrome not available, falling back to system Chrome")
+            chrome_path = find_chrome_executable()
+            if chrome_path:
+                session_options.binary_location = chrome_path
+                print(f"Using system Chrome: {chrome_path}")
+            chrome_version = "system"
+            resolver = install_latest_chromedriver
+
+        # Obter o ChromeDriver do cache local (a rede só é usada na primeira vez)
+        t_driver = time.perf_counter()
+        try:
+            driver_path, cached = resolve_chromedriver(chrome_version, resolver)
+            print(
+                f"ChromeDriver {'do cache local' if cached else 'resolvido e salvo no cache'}: {driver_path}"
+            )
+            service = Service(driver_path)
+        except Exception as webdriver_error:
+            print(f"Erro com WebDriverManager: {webdriver_error}")
+            service = None
+        t_launch = time.perf_counter()
+
+        try:
+            if service is None:
+                raise Exception("ChromeDriver indisponível")
+            new_driver = webdriver.Chrome(service=service, options=session_options)
+            print("Chrome iniciado com ChromeDriver em cache")
+        except Exception as webdriver_error:
+            print(f"Erro ao iniciar com o ChromeDriver em cache: {webdriver_error}")
+            forget_chromedriver(chrome_version)
+            print("Tentando inicializar o Chrome diretamente...")
+            new_driver = webdriver.Chrome(options=session_options)
+            print("Chrome iniciado diretamente")
+        t_page = time.perf_counter()
+
+        # Abrir uma página padrão inicial
+        new_driver.get(HOME_URL)
+        t_end = time.perf_counter()
+
+        if session_profile_dir:
+            session_profile_dirs[id(new_driver)] = session_profile_dir
+
+        startup_time = t_end - t_start
+        browser_startup_times.append(startup_time)
+        print(
+            f"Navegador iniciado com sucesso em {startup_time:.2f}s "
+            f"(ChromeDriver {t_launch - t_driver:.2f}s, Chrome {t_page - t_launch:.2f}s, "
+            f"página inicial {t_end - t_page:.2f}s)"
+        )
+        return new_driver
+
+    except Exception as e:
+        error_message = f"Erro ao inicializar Chrome: {str(e)}\n"
+        error_message += traceback.format_exc()
+        print(error_message)
+
+        # Tentar com configurações alternativas
+        try:
+            print("Tentando configuração alternativa...")
+            alt_options = webdriver.ChromeOptions()
+            alt_options.add_argument("--headless=new")
+            alt_options.add_argument("--disable-gpu")
+            alt_options.add_argument("--no-sandbox")
+            alt_options.add_argument("--disable-dev-shm-usage")
+
+            ChromeDriverManager, _ = chrome_driver_manager()
+            service = Service(ChromeDriverManager().install())
+            new_driver = webdriver.Chrome(service=service, options=alt_options)
+            print("Chrome iniciado em modo alternativo")
+            new_driver.get(HOME_URL)
+            return new_driver
+        except Exception as alt_error:
+            print(f"Erro na configuração alternativa: {alt_error}")
+            print(
+                "Falha ao inicializar o Chrome. Verifique se o Chrome está instalado corretamente."
+            )
+            # Propagar o erro para ser tratado pela UI
+            raise Exception(f"Não foi possível inicializar o Chrome: {str(e)}")
+
+
+def start_browser_warmup(count=1):
+    """Inicia navegadores em segundo plano para a primeira linha começar sem espera
+
+    Returns:
+        int: quantidade de navegadores que começaram a ser iniciados agora
+    """
+    with warmup_lock:
+        warmup_threads[:] = [t for t in warmup_threads if t.is_alive()]
+        available = len(warm_drivers) + len(warmup_threads)
+        with drivers_lock:
+            available += len(drivers)
+
+        started = max(0, count - available)
+        for _ in range(started):
+            thread = threading.Thread(
+                target=_warmup_browser,
+                args=(warmup_generation,),
+                daemon=True,
+                name="BrowserWarmup",
+            )
+            warmup_threads.append(thread)
+            thread.start()
+        return started
+
+
+def _warmup_browser(generation):
+    print("Pré-iniciando o navegador em segundo plano...")
+    try:
+        new_driver = create_driver()
+    except Exception as e:
+        print(f"Falha ao pré-iniciar o navegador: {e}")
+        return
+    with warmup_lock:
+        abandoned = generation != warmup_generation
+        if not abandoned:
+            warm_drivers.append(new_driver)
+    if abandoned:
+        try:
+            quit_driver(new_driver)
+        except Exception as e:
+            print(f"Erro ao fechar navegador pré-iniciado: {e}")
+
+
+def take_warm_driver(token=None):
+    """Entrega um navegador pré-iniciado, aguardando a pré-inicialização em andamento
+
+    Raises:
+        CancelledError: o processamento foi cancelado durante a espera
+    """
+    token = token or cancel_token
+    with warmup_lock:
+        if warm_drivers:
+            return warm_drivers.pop(0)
+        pending = [t for t in warmup_threads if t.is_alive()]
+
+    for thread in pending:
+        while thread.is_alive():
+            token.raise_if_cancelled()
+            thread.join(0.2)
+        with warmup_lock:
+            if warm_drivers:
+                return warm_drivers.pop(0)
+    return None
+
+
+def discard_warm_drivers(timeout=WARMUP_DISCARD_TIMEOUT):
+    """Fecha os navegadores pré-iniciados que não chegaram a ser usados
+
+    Pré-inicializações que não terminam em timeout segundos são abandonadas e
+    fecham o navegador sozinhas quando terminarem.
+    """
+    global warmup_generation
+    with warmup_lock:
+        pending = list(warmup_threads)
+    deadline = time.monotonic() + timeout
+    for thread in pending:
+        thread.join(max(0.0, deadline - time.monotonic()))
+
+    with warmup_lock:
+        warmup_generation += 1
+        warmup_threads.clear()
+        unused = list(warm_drivers)
+        warm_drivers.clear()
+    for unused_driver in unused:
+        try:
+            quit_driver(unused_driver)
+        except Exception as e:
+            print(f"Erro ao fechar navegador pré-iniciado: {e}")
+
+
+# Função para inicializar o WebDriver quando necessário
+def initialize_driver():
+    """Sessão do navegador da thread atual, criada na primeira chamada"""
+    thread_id = threading.get_ident()
+    with drivers_lock:
+        session_driver = drivers.get(thread_id)
+    if session_driver is None:
+        with timed("driver_init"):
+            session_driver = take_warm_driver()
+            if session_driver is not None:
+                print("Usando navegador pré-iniciado")
+            else:
+                print("Inicializando o navegador Chrome...")
+                session_driver = create_driver()
+        with drivers_lock:
+            drivers[thread_id] = session_driver
+
+    return session_driver
+
+
+def current_driver():
+    """Sessão do navegador da thread atual, ou None se ela ainda não abriu uma"""
+    with drivers_lock:
+        return drivers.get(threading.get_ident())
+
+
+def set_rate_limits(navigations_per_minute, submissions_per_minute):
+    """Define o ritmo máximo de navegações e envios, somando todas as sessões"""
+    for limiter, rate in (
+        (navigation_limiter, navigations_per_minute),
+        (submission_limiter, submissions_per_minute),
+    ):
+        limiter.set_rate(rate)
+        limiter.waited = 0.0  # espera contada por execução
+
+
+def probe_portal(timeout=10):
+    """Verificação leve do portal, sem navegador, usada antes de retomar após falhas"""
+    import requests
+
+    response = requests.get(FORM_URL, timeout=timeout)
+    return response.status_code < 500
+
+
+def harvest_captcha_token(side_driver):
+    """Resolve o CAPTCHA do formulário numa sessão auxiliar e retorna o token"""
+    side_driver.get(FORM_URL)
+    WebDriverWait(side_driver, 10).until(
+        EC.presence_of_element_located((By.ID, "btnEnviar"))
+    )
+
+    captcha_stats = get_captcha_stats()
+    solver = RecaptchaSolver(side_driver, strategy=captcha_stats.choose_strategy())
+    try:
+        solver.solveCaptcha()
+    finally:
+        captcha_stats.record(solver.last_attempt)
+
+    return side_driver.execute_script(READ_TOKEN_SCRIPT)
+
+
+def start_token_prefetch(pool_size=2):
+    """Inicia a pré-resolução de CAPTCHAs numa sessão auxiliar do navegador"""
+    global token_pool, token_prefetcher
+    if token_prefetcher is not None and token_prefetcher.is_alive():
+        return token_pool
+
+    token_pool = TokenPool(size=pool_size)
+    token_prefetcher = TokenPrefetcher(
+        create_driver, harvest_captcha_token, token_pool, driver_closer=quit_driver
+    )
+    token_prefetcher.start()
+    print(f"Pré-resolução de CAPTCHA iniciada (pool de {pool_size} tokens)")
+    return token_pool
+
+
+def stop_token_prefetch():
+    """Interrompe a pré-resolução e fecha a sessão auxiliar"""
+    global token_pool, token_prefetcher
+    if token_prefetcher is not None:
+        token_prefetcher.stop()
+        token_prefetcher.join(timeout=10)
+    token_prefetcher = None
+    token_pool = None
+
+
+def use_prefetched_token(driver):
+    """Aplica um token pré-resolvido no formulário atual, se houver algum válido"""
+    if token_pool is None:
+        return False
+
+    token = token_pool.get()
+    if not token:
+        return False
+
+    try:
+        if driver.execute_script(INJECT_TOKEN_SCRIPT, token):
+            print("CAPTCHA resolvido com token pré-resolvido")
+            return True
+    except Exception as e:
+        print(f"Não foi possível aplicar o token pré-resolvido: {e}")
+    return False
 
 
 # Mapeamento dos códigos de serviço
@@ -320,97 +764,60 @@ SERVICO_MAPPING = {
 }
 
 
-def preencher_formulario(dados):
-    # Garantir que o driver está inicializado
-    driver = initialize_driver()
-
-    driver.get(
-        "https://internet.sefaz.es.gov.br/agenciavirtual/area_publica/e-dua/icms.php"
-    )
-
-    # Check stop flag
-    if stop_requested:
-        print("Interrupção solicitada durante preenchimento do formulário")
-        return False
-
-    # Preencher campos
-    driver.find_element(By.NAME, "codCpfCnpjPessoa").send_keys(dados["CPF_CNPJ"])
-
-    # Verificar interrupção a cada passo importante
-    if stop_requested:
-        return False
-
-    # Mapear o código do serviço para o valor do dropdown
-    servico_codigo = dados["SERVICO"]
-    servico_valor = SERVICO_MAPPING.get(servico_codigo, servico_codigo)
-
-    # Usar Select para o campo de serviço (dropdown)
-    servico_select = Select(driver.find_element(By.NAME, "idServico"))
-    try:
-        servico_select.select_by_value(servico_valor)
-        print(f"Selecionado serviço: código {servico_codigo} -> valor {servico_valor}")
-    except Exception as e:
-        print(f"Erro ao selecionar serviço {servico_codigo}: {str(e)}")
-        # Tentar selecionar pelo texto visível contendo o código
-        for option in servico_select.options:
-            if servico_codigo in option.text:
-                option.click()
-                print(f"Selecionado via texto: {option.text}")
-                break
-
-    if stop_requested:
-        return False
-
-    driver.find_element(By.NAME, "datReferencia").send_keys(dados["REFERENCIA"])
-    driver.find_element(By.NAME, "datVencimento").send_keys(dados["VENCIMENTO"])
-    driver.find_element(By.NAME, "vlrReceita").send_keys(dados["VALOR"])
-    driver.find_element(By.NAME, "dscInformacao").send_keys(dados["INFO_COMBINADA"])
-
-    # Melhorar a resolução do CAPTCHA com mais informações de diagnóstico
-    # e compatibilidade entre Windows 10 e 11
+def resolver_captcha(driver, token=None):
+    """Tenta resolver o CAPTCHA do formulário atual; retorna True se conseguiu"""
+    token = token or cancel_token
+    # Resolver o CAPTCHA com a estratégia escolhida pelo histórico desta máquina
+    captcha_stats = get_captcha_stats()
     try:
         print("\nTentando resolver CAPTCHA automaticamente...")
         t0 = time.time()
 
-        # Verificar a versão do Windows para ajustar comportamento
-        win_version = platform.release()
-        print(f"Sistema operacional: Windows {win_version}")
+        strategy = captcha_stats.choose_strategy()
+        print(
+            f"Estratégia de CAPTCHA: timeout {strategy['frame_timeout']}s, "
+            f"{strategy['solve_retries']} tentativa(s), "
+            f"{strategy['audio_attempts']} áudio(s)"
+            + (", sem espera do checkbox" if strategy["skip_checkbox_wait"] else "")
+        )
 
         # Certificar que a página está totalmente carregada antes de tentar resolver o CAPTCHA
-        WebDriverWait(driver, 5).until(
-            EC.presence_of_element_located((By.ID, "btnEnviar"))
+        token.wait_until(
+            driver, EC.presence_of_element_located((By.ID, "btnEnviar")), 5
         )
 
-        # Aumentar o tempo de espera para elementos do CAPTCHA no Windows 10
-        if win_version.startswith("10"):
-            print(
-                "Detectado Windows 10 - ajustando parâmetros do resolvedor de CAPTCHA"
-            )
-            # Scroll para garantir que o CAPTCHA esteja visível (problema comum no Windows 10)
-            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            time.sleep(1)  # Pequena pausa para garantir que o scroll foi concluído
+        # Garantir que o CAPTCHA esteja visível antes de interagir com ele
+        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
 
         # Inicializar o resolvedor de CAPTCHA com mais opções de debug
-        recaptchaSolver = RecaptchaSolver(driver, debug_mode=True)
-
-        # Para Windows 10, tente a resolução com retry
-        if win_version.startswith("10"):
-            captcha_solved = False
-            max_attempts = 3
-            for attempt in range(1, max_attempts + 1):
-                try:
-                    print(f"Tentativa {attempt}/{max_attempts} de resolver CAPTCHA...")
-                    recaptchaSolver.solveCaptcha()
-                    captcha_solved = True
-                    break
-                except Exception as retry_error:
-                    print(f"Falha na tentativa {attempt}: {str(retry_error)}")
-                    # Pequena pausa entre tentativas
-                    time.sleep(2)
-        else:
-            # Para Windows 11 e outros, comportamento normal
-            recaptchaSolver.solveCaptcha()
+        recaptchaSolver = RecaptchaSolver(
+            driver,
+            debug_mode=True,
+            strategy=strategy,
+            cancel_check=token.raise_if_cancelled,
+            timer=timed,
+        )
+
+        captcha_solved = False
+        max_attempts = strategy["solve_retries"]
+        for attempt in range(1, max_attempts + 1):
+            try:
+                print(f"Tentativa {attempt}/{max_attempts} de resolver CAPTCHA...")
+                recaptchaSolver.solveCaptcha()
+            except CancelledError:
+                # Interrompida pelo usuário: não diz nada sobre o CAPTCHA, fica fora do histórico
+                raise
+            except Exception as retry_error:
+                captcha_stats.record(recaptchaSolver.last_attempt)
+                print(f"Falha na tentativa {attempt}: {str(retry_error)}")
+                if attempt == max_attempts:
+                    raise
+                # Pequena pausa entre tentativas
+                token.sleep(2)
+                continue
+            captcha_stats.record(recaptchaSolver.last_attempt)
             captcha_solved = True
+            break
 
         print(f"CAPTCHA resolvido em {time.time() - t0:.2f} segundos")
     except Exception as e:
@@ -429,26 +836,90 @@ def preencher_formulario(dados):
         except:
             pass
 
+    return captcha_solved
+
+
+def preencher_formulario(dados, token=None):
+    token = token or cancel_token
+
+    # Garantir que o driver está inicializado
+    driver = initialize_driver()
+
+    navigation_limiter.acquire(token)
+    with run_stage("navigate"), timed("navigate"):
+        driver.get(FORM_URL)
+    record_session(driver, "formulario", dados["CPF_CNPJ"])
+
+    # Check stop flag
+    if token.cancelled:
+        print("Interrupção solicitada durante preenchimento do formulário")
+        return False
+
+    with run_stage("fill"), timed("fill"):
+        # Preencher campos
+        driver.find_element(By.NAME, "codCpfCnpjPessoa").send_keys(dados["CPF_CNPJ"])
+
+        # Verificar interrupção a cada passo importante
+        if token.cancelled:
+            return False
+
+        # Mapear o código do serviço para o valor do dropdown (catálogo em cache)
+        servico_codigo = dados["SERVICO"]
+        catalog = get_service_catalog(SERVICO_MAPPING)
+        catalog.refresh(driver)
+        servico_valor = catalog.resolve(servico_codigo)
+        if servico_valor is None and not catalog.options:
+            # Lista do portal indisponível: tentar o próprio código como valor
+            servico_valor = servico_codigo
+        if servico_valor is None:
+            raise PortalValidationError(
+                "SERVICO_INVALIDO",
+                f"Serviço {servico_codigo} não existe na lista do portal",
+            )
+
+        servico_select = Select(driver.find_element(By.NAME, "idServico"))
+        try:
+            servico_select.select_by_value(servico_valor)
+        except NoSuchElementException:
+            # Valor do cache não existe mais na página: a lista do portal mudou
+            catalog.refresh(driver, force=True)
+            servico_valor = catalog.resolve(servico_codigo)
+            if servico_valor is None:
+                raise PortalValidationError(
+                    "SERVICO_INVALIDO",
+                    f"Serviço {servico_codigo} não existe na lista do portal",
+                )
+            servico_select.select_by_value(servico_valor)
+        print(f"Selecionado serviço: código {servico_codigo} -> valor {servico_valor}")
+
+        if token.cancelled:
+            return False
+
+        driver.find_element(By.NAME, "datReferencia").send_keys(dados["REFERENCIA"])
+        driver.find_element(By.NAME, "datVencimento").send_keys(dados["VENCIMENTO"])
+        driver.find_element(By.NAME, "vlrReceita").send_keys(dados["VALOR"])
+        driver.find_element(By.NAME, "dscInformacao").send_keys(dados["INFO_COMBINADA"])
+
+    # Usar um token já resolvido em segundo plano ou resolver agora
+    with run_stage("captcha"):
+        captcha_solved = use_prefetched_token(driver) or resolver_captcha(driver, token)
+
     # Se a resolução automática falhar, solicitar intervenção manual
     if not captcha_solved:
-        global manual_captcha_requested
-        manual_captcha_requested = True
-
         print("\n\nFalha na resolução automática do CAPTCHA!")
         print("Será necessário resolver o CAPTCHA manualmente.")
 
         if captcha_callback:
-            # Chamar o callback para notificar a UI
-            print("Notificando interface para intervenção manual...")
-            captcha_callback()
-
-            # Esperar até que o usuário sinalize que o CAPTCHA foi resolvido manualmente
-            # ou até que o processo seja interrompido
-            while manual_captcha_requested and not stop_requested:
-                time.sleep(0.5)
+            # Estacionar a linha na aba atual e seguir com as demais numa nova aba
+            request = ManualCaptchaRequest(
+                dados, driver, driver.current_window_handle
+            )
+            driver.switch_to.new_window("tab")
+            manual_captcha_queue.park(request)
 
-            if stop_requested:
-                return False
+            print("Notificando interface para intervenção manual...")
+            captcha_callback(request)
+            return request
         else:
             # Se não há callback registrado (modo terminal), cai no modo antigo
             print("\n*********************************************")
@@ -462,24 +933,151 @@ def preencher_formulario(dados):
                 print(
                     "Nenhum terminal detectado, aguardando 30 segundos para resolução manual..."
                 )
-                time.sleep(30)
+                token.sleep(30)
 
-    if stop_requested:
+    if token.cancelled:
         return False
 
     # Submeter formulário
-    driver.find_element(By.ID, "btnEnviar").click()
+    submission_limiter.acquire(token)
+    with run_stage("submit"), timed("submit"):
+        clicar_enviar(driver)
     return True
 
 
 def captcha_solved_signal():
-    """Método para sinalizar que o CAPTCHA foi resolvido manualmente"""
-    global manual_captcha_requested
-    manual_captcha_requested = False
+    """Método para sinalizar que os CAPTCHAs pendentes foram resolvidos manualmente"""
+    manual_captcha_queue.resolve_all()
     print("Captcha foi resolvido manualmente pelo usuário")
 
 
-def baixar_pdf(cpf_cnpj, referencia, observacao=None, valor=None):
+def retomar_captcha_manual(request):
+    """Volta à aba da linha estacionada e envia o formulário já resolvido
+
+    Returns:
+        bool: True se o formulário foi enviado, False se o CAPTCHA ainda está pendente
+    """
+    driver = request.driver
+    request.return_handle = driver.current_window_handle
+    driver.switch_to.window(request.window_handle)
+
+    if not driver.execute_script(READ_TOKEN_SCRIPT):
+        print(f"CAPTCHA ainda não resolvido no navegador: {request.describe()}")
+        driver.switch_to.window(request.return_handle)
+        return False
+
+    submission_limiter.acquire(cancel_token)
+    with timed("submit"):
+        clicar_enviar(driver)
+    return True
+
+
+def fechar_aba_captcha(request):
+    """Fecha a aba da linha estacionada e volta para a aba de trabalho"""
+    driver = request.driver
+    try:
+        if driver.current_window_handle != request.window_handle:
+            driver.switch_to.window(request.window_handle)
+        driver.close()
+    except Exception as e:
+        print(f"Não foi possível fechar a aba do CAPTCHA: {e}")
+
+    try:
+        driver.switch_to.window(request.return_handle or driver.window_handles[-1])
+    except Exception as e:
+        print(f"Não foi possível voltar para a aba de trabalho: {e}")
+
+
+def clicar_enviar(driver):
+    """Envia o formulário e guarda o botão para aguardar_resultado_envio"""
+    button = driver.find_element(By.ID, "btnEnviar")
+    previous_errors = driver.execute_script(VISIBLE_ERRORS_SCRIPT, ERROR_SELECTORS)
+    button.click()
+    submitted_buttons[threading.get_ident()] = (button, previous_errors or [])
+
+
+def aguardar_resultado_envio(driver, timeout=30, interval=0.2, token=None):
+    """
+    Aguarda o resultado do envio do formulário.
+
+    Cada verificação é uma única chamada de script que procura o botão
+    "Gerar DUA" e as mensagens de erro do portal; alertas JavaScript também
+    são tratados como erro de validação. Enquanto o formulário enviado ainda
+    estiver na tela (até SUBMIT_PAGE_WAIT segundos), as mensagens que já
+    estavam visíveis antes do clique não contam como rejeição; mensagens novas
+    são reportadas na hora.
+
+    Returns:
+        WebElement do botão "Gerar DUA", ou None se a interrupção foi solicitada
+
+    Raises:
+        PortalValidationError: o portal rejeitou os dados
+        TimeoutError: nenhum resultado dentro do prazo
+    """
+    token = token or cancel_token
+    deadline = time.monotonic() + timeout
+    submitted, previous_errors = submitted_buttons.pop(
+        threading.get_ident(), (None, [])
+    )
+    page_deadline = time.monotonic() + SUBMIT_PAGE_WAIT
+    while time.monotonic() < deadline:
+        if token.cancelled:
+            return None
+
+        try:
+            if submitted is not None and (
+                time.monotonic() >= page_deadline or EC.staleness_of(submitted)(driver)
+            ):
+                submitted = None
+            result = driver.execute_script(
+                SUBMIT_STATE_SCRIPT,
+                GERAR_DUA_XPATH,
+                ERROR_SELECTORS,
+                previous_errors if submitted is not None else [],
+            )
+        except UnexpectedAlertPresentException:
+            try:
+                alert = driver.switch_to.alert
+                message = alert.text
+                alert.accept()
+            except NoAlertPresentException:
+                continue
+            raise PortalValidationError(classify_error(message), message)
+
+        if result and result["state"] == "ready":
+            return driver.find_element(By.XPATH, GERAR_DUA_XPATH)
+        if result and result["state"] == "error":
+            message = result["message"]
+            raise PortalValidationError(classify_error(message), message)
+
+        token.sleep(interval)
+
+    raise TimeoutError("Tempo esgotado esperando pelo botão 'Gerar DUA'")
+
+
+def nome_arquivo_dua(cpf_cnpj, referencia, observacao=None, valor=None, extensao="pdf"):
+    """Nome do arquivo do DUA: CPF-CNPJ_REF_VALOR_OBS.<extensao>"""
+    # Limpar caracteres inválidos do observacao
+    obs_parte = ""
+    if observacao:
+        # Limitar tamanho e remover caracteres inválidos para nome de arquivo
+        obs_limpo = "".join(c for c in observacao if c.isalnum() or c in " -_")
+        obs_limpo = obs_limpo.replace(" ", "_")[
+            :30
+        ]  # Limitar tamanho e substituir espaços
+        if obs_limpo:
+            obs_parte = f"_{obs_limpo}"
+
+    # Adicionar valor se disponível
+    valor_parte = ""
+    if valor:
+        valor_str = str(valor).replace(".", ",")
+        valor_parte = f"_{valor_str}"
+
+    return f"{cpf_cnpj}_{referencia.replace('/', '_')}{valor_parte}{obs_parte}.{extensao}"
+
+
+def baixar_pdf(cpf_cnpj, referencia, observacao=None, valor=None, token=None):
     """
     Baixa o PDF do DUA.
 
@@ -491,147 +1089,131 @@ def baixar_pdf(cpf_cnpj, referencia, observacao=None, valor=None):
 
     Returns:
         bool: True se o PDF foi baixado com sucesso, False caso contrário
+
+    Raises:
+        PortalValidationError: o portal rejeitou os dados da linha
+        CancelledError: o processamento foi cancelado durante uma espera
     """
+    token = token or cancel_token
+
     # Garantir que o driver está inicializado
     driver = initialize_driver()
 
     try:
-        # Aguardar até que o botão "Gerar DUA" esteja visível e clicável
-        print("Aguardando botão 'Gerar DUA'...")
-
-        # Modificar para usar menor tempo de espera e checar interrupção
-        total_wait = 30  # segundos
-        check_interval = 1  # verificar cada 1 segundo
-        elapsed = 0
+        with run_stage("submit"), timed("gerar_dua"):
+            # Aguardar até que o botão "Gerar DUA" esteja visível e clicável
+            print("Aguardando botão 'Gerar DUA'...")
 
-        while elapsed < total_wait:
-            if stop_requested:
+            gerar_dua_button = aguardar_resultado_envio(driver, token=token)
+            if gerar_dua_button is None:
                 print("Interrupção solicitada durante espera pelo botão Gerar DUA")
                 return False
 
-            try:
-                gerar_dua_button = WebDriverWait(driver, check_interval).until(
-                    EC.element_to_be_clickable(
-                        (
-                            By.XPATH,
-                            "//button[contains(text(), 'Gerar DUA') or contains(@onclick, 'gerarDua')]",
-                        )
-                    )
-                )
-                break  # Botão encontrado, sair do loop
-            except:
-                elapsed += check_interval
-                if elapsed >= total_wait:
-                    raise TimeoutError(
-                        "Tempo esgotado esperando pelo botão 'Gerar DUA'"
-                    )
-
-        print("Botão 'Gerar DUA' encontrado, clicando...")
-        time.sleep(1)
-        gerar_dua_button.click()
+            print("Botão 'Gerar DUA' encontrado, clicando...")
+            token.sleep(GERAR_DUA_DELAY)
+            gerar_dua_button.click()
 
-        if stop_requested:
-            print("Interrupção solicitada após clicar no botão Gerar DUA")
-            return False
+            if token.cancelled:
+                print("Interrupção solicitada após clicar no botão Gerar DUA")
+                return False
 
-        # Aguardar até que o botão "Imprimir ou Salvar PDF" esteja visível
-        print("Aguardando botão 'Imprimir ou Salvar PDF'...")
-        imprimir_button = WebDriverWait(driver, 30).until(
-            EC.element_to_be_clickable(
-                (
-                    By.XPATH,
-                    "//a[contains(text(), 'Imprimir ou Salvar PDF') or contains(@href, 'imprimir-dua.php')]",
-                )
+            # Aguardar até que o botão "Imprimir ou Salvar PDF" esteja visível
+            print("Aguardando botão 'Imprimir ou Salvar PDF'...")
+            imprimir_button = token.wait_until(
+                driver,
+                EC.element_to_be_clickable((By.XPATH, IMPRIMIR_XPATH)),
+                30,
             )
-        )
 
-        if stop_requested:
-            print(
-                "Interrupção solicitada durante espera pelo botão Imprimir ou Salvar PDF"
-            )
-            return False
+            if token.cancelled:
+                print(
+                    "Interrupção solicitada durante espera pelo botão Imprimir ou Salvar PDF"
+                )
+                return False
 
-        # Obter o link da página HTML
-        html_link = imprimir_button.get_attribute("href")
-        print(f"Link da página encontrado: {html_link}")
+            # Obter o link da página HTML
+            html_link = imprimir_button.get_attribute("href")
+            print(f"Link da página encontrado: {html_link}")
+        record_session(driver, "resultado", cpf_cnpj)
 
-        # Criar um nome para o arquivo PDF baseado nos dados
         # Formato: CPF-CNPJ_REF_VALOR_OBS.pdf
-        # Limpar caracteres inválidos do observacao
-        obs_parte = ""
-        if observacao:
-            # Limitar tamanho e remover caracteres inválidos para nome de arquivo
-            obs_limpo = "".join(c for c in observacao if c.isalnum() or c in " -_")
-            obs_limpo = obs_limpo.replace(" ", "_")[
-                :30
-            ]  # Limitar tamanho e substituir espaços
-            if obs_limpo:
-                obs_parte = f"_{obs_limpo}"
-
-        # Adicionar valor se disponível
-        valor_parte = ""
-        if valor:
-            valor_str = str(valor).replace(".", ",")
-            valor_parte = f"_{valor_str}"
-
-        # Criar nome do arquivo com todas as informações disponíveis
-        pdf_filename = (
-            f"{cpf_cnpj}_{referencia.replace('/', '_')}{valor_parte}{obs_parte}.pdf"
-        )
+        pdf_filename = nome_arquivo_dua(cpf_cnpj, referencia, observacao, valor)
         pdf_path = os.path.join(PDF_DIR, pdf_filename)
         path = Path(pdf_path)
 
-        # Abrir a página HTML em uma nova aba
-        driver.execute_script(f"window.open('{html_link}', '_blank');")
-
-        # Mudar para a nova aba
-        driver.switch_to.window(driver.window_handles[-1])
+        with run_stage("render"), timed("print_pdf"):
+            # Abrir a página HTML em uma nova aba
+            form_window = driver.current_window_handle
+            existing_windows = set(driver.window_handles)
+            driver.execute_script(f"window.open('{html_link}', '_blank');")
+
+            # Mudar para a nova aba (pode haver abas de CAPTCHA pendente abertas)
+            new_windows = [
+                h for h in driver.window_handles if h not in existing_windows
+            ]
+            driver.switch_to.window(
+                new_windows[-1] if new_windows else driver.window_handles[-1]
+            )
 
-        # Aguardar o carregamento da página
-        print("Aguardando carregamento da página HTML...")
-        WebDriverWait(driver, 30).until(
-            EC.presence_of_element_located((By.TAG_NAME, "body"))
-        )
+            # Aguardar o carregamento da página
+            print("Aguardando carregamento da página HTML...")
+            token.wait_until(
+                driver, EC.presence_of_element_located((By.TAG_NAME, "body")), 30
+            )
 
-        if stop_requested:
-            print("Interrupção solicitada durante carregamento da página HTML")
-            return False
+            if token.cancelled:
+                print("Interrupção solicitada durante carregamento da página HTML")
+                return False
+            record_session(driver, "impressao", cpf_cnpj)
 
-        # Usar o CDP (Chrome DevTools Protocol) para gerar o PDF
-        print("Convertendo página HTML em PDF...")
-        pdf_params = {
-            "printBackground": True,
-            "preferCSSPageSize": True,
-            "marginTop": 0,
-            "marginBottom": 0,
-            "marginLeft": 0,
-            "marginRight": 0,
-        }
+            # Usar o CDP (Chrome DevTools Protocol) para gerar o PDF
+            print("Convertendo página HTML em PDF...")
+            pdf_params = {
+                "printBackground": True,
+                "preferCSSPageSize": True,
+                "marginTop": 0,
+                "marginBottom": 0,
+                "marginLeft": 0,
+                "marginRight": 0,
+            }
 
-        # Executar o comando de impressão via CDP
-        pdf_data = driver.execute_cdp_cmd("Page.printToPDF", pdf_params)
+            # Executar o comando de impressão via CDP
+            pdf_data = driver.execute_cdp_cmd("Page.printToPDF", pdf_params)
 
-        # Decodificar os dados PDF de base64
-        import base64
+            # Decodificar os dados PDF de base64
+            import base64
 
-        pdf_bytes = base64.b64decode(pdf_data["data"])
+            pdf_bytes = base64.b64decode(pdf_data["data"])
 
-        # Salvar o PDF
-        path.write_bytes(pdf_bytes)
-        print(f"PDF gerado e salvo com sucesso: {pdf_path}")
+        with run_stage("write"), timed("write"):
+            # Salvar o PDF
+            path.write_bytes(pdf_bytes)
+            print(f"PDF gerado e salvo com sucesso: {pdf_path}")
 
-        # Fechar a aba atual e voltar para a anterior
-        driver.close()
-        driver.switch_to.window(driver.window_handles[0])
+            # Fechar a aba atual e voltar para a anterior
+            driver.close()
+            driver.switch_to.window(form_window)
 
         return True
 
+    except PortalValidationError as e:
+        # Erro de validação não é falha do navegador: sem screenshot, sem retentativa
+        print(f"Portal rejeitou a linha {cpf_cnpj} - Ref. {referencia}: {e}")
+        record_session(driver, "rejeicao", cpf_cnpj)
+        raise
+
+    except StageTimeout:
+        # O navegador foi encerrado pelo watchdog; quem chama recicla a sessão
+        raise
+
     except Exception as e:
         print(f"Erro ao gerar PDF: {str(e)}")
         # Salvar screenshot quando ocorrer erro
         try:
             # Usar informações completas no nome do screenshot de erro também
-            screenshot_name = f"erro_{cpf_cnpj}_{referencia.replace('/', '_')}{valor_parte}{obs_parte}.png"
+            screenshot_name = "erro_" + nome_arquivo_dua(
+                cpf_cnpj, referencia, observacao, valor, extensao="png"
+            )
             driver.save_screenshot(f"{PDF_DIR}/{screenshot_name}")
             print(f"Screenshot de erro salvo em {PDF_DIR}/{screenshot_name}")
         except:
@@ -659,20 +1241,89 @@ def wait_for_download(directory, timeout=30):
     return seconds < timeout
 
 
+def quit_driver(session_driver):
+    """Encerra uma sessão do navegador e remove seu perfil temporário"""
+    try:
+        session_driver.quit()
+    finally:
+        profile_dir = session_profile_dirs.pop(id(session_driver), None)
+        if profile_dir:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+
+
 # Função para fechar o navegador
 def close_browser():
-    global driver
-    if driver is not None:
+    """Fecha a sessão do navegador da thread atual"""
+    with drivers_lock:
+        session_driver = drivers.pop(threading.get_ident(), None)
+    if session_driver is not None:
         print("Fechando o navegador...")
-        driver.quit()
-        driver = None
+        quit_driver(session_driver)
         print("Navegador fechado com sucesso.")
 
 
+def close_all_browsers():
+    """Fecha as sessões de todas as threads de processamento"""
+    with drivers_lock:
+        sessions = list(drivers.values())
+        drivers.clear()
+    for session_driver in sessions:
+        try:
+            quit_driver(session_driver)
+        except Exception as e:
+            print(f"Erro ao fechar o navegador: {e}")
+
+
+def abort_browser(thread_id=None):
+    """Mata os processos da sessão da thread indicada (ou de todas) sem passar pelo WebDriver
+
+    Desbloqueia uma chamada WebDriver travada: ela falha assim que o
+    chromedriver deixa de existir.
+    """
+    with drivers_lock:
+        if thread_id is None:
+            sessions = list(drivers.values())
+        else:
+            sessions = [drivers[thread_id]] if thread_id in drivers else []
+    for session_driver in sessions:
+        killed = kill_driver_processes(session_driver)
+        print(f"Navegador encerrado à força ({killed} processo(s))")
+
+
+def recycle_browser():
+    """Fecha a sessão atual do navegador e abre uma nova"""
+    try:
+        close_browser()
+    except Exception as e:
+        # Sessão já encerrada à força (ex.: etapa travada)
+        print(f"Erro ao fechar o navegador: {e}")
+    return initialize_driver()
+
+
 # When directly running the script (not from UI)
 if __name__ == "__main__":
+    import pandas as pd
+
+    from row_validation import VALIDATION_COLUMN, apply_validation
+
+    print(f"PDFs will be saved to: {PDF_DIR}")
+
+    # Gravação para reprodução offline (session_replay.py), antes de abrir o navegador
+    if os.environ.get("DUA_RECORD_DIR"):
+        set_session_recorder(SessionRecorder(PORTAL_URL, os.environ["DUA_RECORD_DIR"]))
+
+    # Perfil de execução (DUA_PROFILE=1; DUA_PROFILE_MEMORY=1 inclui o tracemalloc)
+    profiler = None
+    if os.environ.get("DUA_PROFILE"):
+        from run_profiler import RunProfiler
+
+        profiler = RunProfiler(trace_memory=bool(os.environ.get("DUA_PROFILE_MEMORY")))
+        profiler.start()
+        profiler.begin_thread()
+
     # Inicializar o driver apenas quando o script é executado diretamente
     initialize_driver()
+    metrics_exporters = []
 
     # Ler o CSV ou Excel com as configurações corretas
     try:
@@ -772,6 +1423,29 @@ if __name__ == "__main__":
         print("Dados carregados do CSV:")
         print(data.head())
 
+        # Validar as linhas antes de qualquer uso do navegador
+        invalid_count = apply_validation(
+            data, get_service_catalog(SERVICO_MAPPING).mapping()
+        )
+        if invalid_count:
+            print(f"{invalid_count} linha(s) com dados inválidos serão ignoradas")
+
+        # Reciclar o navegador periodicamente para conter o uso de memória
+        supervisor = BrowserSupervisor()
+
+        # Abortar e reciclar a sessão quando uma etapa passar do prazo
+        watchdog = StageWatchdog(lambda stage, thread_id: abort_browser(thread_id))
+        watchdog.start()
+        set_stage_watchdog(watchdog)
+        set_run_timings(RunTimings())
+        get_captcha_stats().start_session()
+
+        # Métricas opcionais para monitoramento (variáveis de ambiente)
+        metrics_exporters = metrics_export.start_exporters(
+            int(os.environ.get("DUA_METRICS_PORT", "0") or 0),
+            os.environ.get("DUA_METRICS_TEXTFILE"),
+        )
+
         # Processar cada linha
         for index, row in data.iterrows():
             dados = row.to_dict()
@@ -779,27 +1453,84 @@ if __name__ == "__main__":
                 f"\nProcessando: {dados['CPF_CNPJ']} - Ref. {dados['REFERENCIA']} - Valor: {dados['VALOR']}"
             )
 
+            if dados[VALIDATION_COLUMN]:
+                print(f"Linha {index+1} ignorada: {dados[VALIDATION_COLUMN]}")
+                metrics_export.record_row(False, "DADOS_INVALIDOS")
+                continue
+
+            run_timings.begin_row(
+                index + 1, f"{dados['CPF_CNPJ']} - Ref. {dados['REFERENCIA']}"
+            )
+            success = False
             try:
                 if not preencher_formulario(dados):
                     print("Interrupção solicitada durante preenchimento do formulário")
                     break
 
-                if not baixar_pdf(
+                success = baixar_pdf(
                     dados["CPF_CNPJ"],
                     dados["REFERENCIA"],
                     dados.get("INFO_ADICIONAIS", ""),
                     dados.get("VALOR", ""),
-                ):
+                )
+                if not success:
                     print("Falha na emissão")
+            except StageTimeout as e:
+                print(f"Erro ao processar linha {index+1}: {str(e)}")
+                print("Reciclando o navegador (etapa travada)...")
+                run_timings.finish_row(index + 1, False)
+                run_timings.end_row()
+                metrics_export.record_row(False, "ETAPA_TRAVADA")
+                recycle_browser()
+                supervisor.recycled()
+                continue
+            except PortalValidationError as e:
+                print(f"Erro ao processar linha {index+1}: {str(e)}")
+                metrics_export.record_row(False, e.code)
             except Exception as e:
                 print(f"Erro ao processar linha {index+1}: {str(e)}")
+                metrics_export.record_row(False, type(e).__name__)
+            else:
+                metrics_export.record_row(success)
+            run_timings.finish_row(index + 1, success)
+            run_timings.end_row()
+
+            recycle_reason = supervisor.row_finished(initialize_driver())
+            if recycle_reason:
+                print(f"Reciclando o navegador ({recycle_reason})...")
+                recycle_browser()
+                supervisor.recycled()
 
     except Exception as e:
         print(f"Erro ao processar o arquivo CSV: {str(e)}")
         print("Detalhes do erro:")
-        import traceback
-
         traceback.print_exc()
 
+    # Resumo das tentativas de CAPTCHA desta execução
+    get_captcha_stats().flush()
+    for line in get_captcha_stats().format_summary():
+        print(line)
+
+    # Relatório de desempenho por etapa, salvo junto aos PDFs
+    if run_timings is not None:
+        for line in run_timings.format_report():
+            print(line)
+        report_path = run_timings.save(PDF_DIR)
+        if report_path:
+            print(f"Relatório de desempenho salvo em: {report_path}")
+        trace_path = run_timings.save_trace(PDF_DIR)
+        if trace_path:
+            print(f"Linha do tempo (chrome://tracing) salva em: {trace_path}")
+
     # Fechar o navegador ao finalizar
     close_browser()
+    metrics_export.stop_exporters(metrics_exporters)
+
+    if profiler is not None:
+        profiler.end_thread()
+        for line in profiler.format_summary():
+            print(line)
+        for path in profiler.save(PDF_DIR).values():
+            print(f"Perfil salvo em: {path}")
+    if session_recorder is not None:
+        session_recorder.close()
@@ -0,0 +1,129 @@
+"""
+Fila de CAPTCHAs que precisam de resolução manual
+
+Quando a resolução automática falha, a linha fica estacionada na própria aba
+do navegador com um `threading.Event` e o processamento segue com as demais
+linhas. O operador resolve os CAPTCHAs pendentes quando puder, inclusive em
+lote, e o worker conclui essas linhas assim que elas são liberadas.
+"""
+
+import itertools
+import threading
+import time
+
+
+class ManualCaptchaRequest:
+    """Linha aguardando resolução manual do CAPTCHA numa aba própria"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, dados, driver, window_handle):
+        self.id = next(self._ids)
+        self.dados = dados
+        self.driver = driver
+        self.window_handle = window_handle
+        self.return_handle = None
+        self.row_index = None
+        self.created_at = time.time()
+        self.solved = threading.Event()
+        self.cancelled = False
+
+    def describe(self):
+        return (
+            f"CPF/CNPJ: {self.dados.get('CPF_CNPJ', '')} - "
+            f"Ref: {self.dados.get('REFERENCIA', '')} - "
+            f"Valor: {self.dados.get('VALOR', '')}"
+        )
+
+    def resolve(self):
+        self.solved.set()
+
+    def cancel(self):
+        self.cancelled = True
+        self.solved.set()
+
+
+class ManualCaptchaQueue:
+    """Fila thread-safe de linhas com CAPTCHA manual pendente"""
+
+    def __init__(self):
+        self._requests = []
+        self._condition = threading.Condition()
+
+    def park(self, request):
+        with self._condition:
+            request.solved.clear()
+            if request not in self._requests:
+                self._requests.append(request)
+            self._condition.notify_all()
+
+    def pending(self):
+        """Linhas ainda aguardando o operador"""
+        with self._condition:
+            return [r for r in self._requests if not r.solved.is_set()]
+
+    def resolve(self, request_ids):
+        """Marca as linhas indicadas como resolvidas pelo operador"""
+        with self._condition:
+            for request in self._requests:
+                if request.id in request_ids:
+                    request.resolve()
+            self._condition.notify_all()
+
+    def resolve_all(self):
+        with self._condition:
+            for request in self._requests:
+                request.resolve()
+            self._condition.notify_all()
+
+    def cancel(self, request_ids):
+        with self._condition:
+            for request in self._requests:
+                if request.id in request_ids:
+                    request.cancel()
+            self._condition.notify_all()
+
+    def cancel_all(self):
+        with self._condition:
+            for request in self._requests:
+                request.cancel()
+            self._condition.notify_all()
+
+    def cancel_driver(self, driver):
+        """Cancela as linhas estacionadas numa sessão que deixou de existir"""
+        with self._condition:
+            for request in self._requests:
+                if request.driver is driver:
+                    request.cancel()
+            self._condition.notify_all()
+
+    def take_ready(self, driver=None):
+        """Remove e retorna as linhas liberadas (opcionalmente só de um driver)"""
+        with self._condition:
+            ready = [
+                r
+                for r in self._requests
+                if r.solved.is_set() and (driver is None or r.driver is driver)
+            ]
+            for request in ready:
+                self._requests.remove(request)
+            return ready
+
+    def wait_ready(self, timeout):
+        """Aguarda até alguma linha ser liberada ou o timeout expirar"""
+        with self._condition:
+            if any(r.solved.is_set() for r in self._requests):
+                return True
+            self._condition.wait(timeout)
+            return any(r.solved.is_set() for r in self._requests)
+
+    def count(self, driver=None):
+        """Linhas estacionadas (opcionalmente só de um driver)"""
+        with self._condition:
+            return sum(
+                1 for r in self._requests if driver is None or r.driver is driver
+            )
+
+    def __len__(self):
+        with self._condition:
+            return len(self._requests)
@@ -0,0 +1,295 @@
+"""
+Métricas no formato de texto do Prometheus
+
+Contadores, histogramas e medidores em memória, sem dependências externas.
+As métricas podem ser lidas num endpoint HTTP local opcional (/metrics) e/ou
+gravadas periodicamente num arquivo .prom para o textfile collector do
+node_exporter. Registrar uma amostra é só uma soma sob um lock; o texto é
+montado apenas quando alguém lê as métricas.
+"""
+
+import bisect
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Limites dos histogramas de duração de etapa (segundos)
+STAGE_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120)
+
+# Intervalo padrão de atualização do arquivo .prom
+TEXTFILE_INTERVAL = 15.0
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ]
+        with self._lock:
+            items = sorted(self._values.items())
+        if not items and not self.labelnames and self.kind != "histogram":
+            # Métrica sem rótulos aparece com zero antes da primeira amostra
+            items = [((), 0)]
+        for key, value in items:
+            lines.extend(self._render_value(key, value))
+        return lines
+
+    def _render_value(self, key, value):
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}"]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # contagens por faixa (não acumuladas), soma, total
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][bisect.bisect_left(self.buckets, value)] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _render_value(self, key, state):
+        counts, total, count = state
+        lines = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+            cumulative += bucket_count
+            labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, key)
+        lines.append(f"{self.name}_sum{labels} {_format_value(float(total))}")
+        lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Conjunto de métricas exportadas juntas"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self):
+        """Texto no formato de exposição do Prometheus (versão 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+ROWS_TOTAL = REGISTRY.counter(
+    "dua_rows_total", "Linhas concluídas, por resultado", ["result"]
+)
+ROW_FAILURES = REGISTRY.counter(
+    "dua_row_failures_total", "Linhas com falha, por motivo", ["reason"]
+)
+ROW_RETRIES = REGISTRY.counter(
+    "dua_row_retries_total", "Linhas devolvidas à fila após falha transitória"
+)
+CAPTCHA_ATTEMPTS = REGISTRY.counter(
+    "dua_captcha_attempts_total",
+    "Chamadas ao resolvedor de CAPTCHA, por resultado (checkbox, audio, falha)",
+    ["outcome"],
+)
+STAGE_SECONDS = REGISTRY.histogram(
+    "dua_stage_duration_seconds", "Duração de cada etapa do processamento", ["stage"]
+)
+BROWSER_RESTARTS = REGISTRY.counter(
+    "dua_browser_restarts_total", "Reinícios do navegador durante o processamento"
+)
+BROWSER_RSS = REGISTRY.gauge(
+    "dua_browser_rss_bytes",
+    "Memória (RSS) do chromedriver e do Chrome na última medição, por thread",
+    ["worker"],
+)
+ACTIVE_BROWSERS = REGISTRY.gauge(
+    "dua_active_browsers", "Navegadores processando linhas ao mesmo tempo"
+)
+ROWS_PER_MINUTE = REGISTRY.gauge(
+    "dua_rows_per_minute", "Linhas concluídas por minuto (último minuto)"
+)
+
+
+def record_row(success, reason=None):
+    """Conta uma linha concluída; reason identifica o motivo da falha"""
+    ROWS_TOTAL.inc(result="sucesso" if success else "falha")
+    if not success:
+        ROW_FAILURES.inc(reason=reason or "FALHA_EMISSAO")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?", 1)[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Sem log por requisição (o Prometheus consulta a cada poucos segundos)
+        pass
+
+
+class MetricsServer:
+    """Endpoint HTTP local com as métricas em /metrics"""
+
+    def __init__(self, port, host="127.0.0.1", registry=REGISTRY):
+        handler = type("MetricsHandler", (_MetricsHandler,), {"registry": registry})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="MetricsServer", daemon=True
+        )
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class TextfileExporter(threading.Thread):
+    """Grava as métricas num arquivo .prom a cada `interval` segundos"""
+
+    def __init__(self, path, interval=TEXTFILE_INTERVAL, registry=REGISTRY):
+        super().__init__(daemon=True, name="MetricsTextfile")
+        self.path = path
+        self.interval = interval
+        self.registry = registry
+        self._stop_event = threading.Event()
+
+    def write(self):
+        # Arquivo temporário + rename: o node_exporter nunca lê um arquivo pela metade
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.write(self.registry.render())
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Não foi possível gravar as métricas em {self.path}: {e}")
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.write()
+
+    def stop(self):
+        self._stop_event.set()
+        self.write()
+
+
+def start_exporters(port=0, textfile=None, interval=TEXTFILE_INTERVAL):
+    """Inicia o endpoint HTTP (porta > 0) e o arquivo .prom (caminho informado)
+
+    Returns:
+        list: exportadores iniciados (chamar stop() em cada um ao terminar)
+    """
+    exporters = []
+    if port:
+        try:
+            server = MetricsServer(port).start()
+            exporters.append(server)
+            print(f"Métricas disponíveis em http://127.0.0.1:{server.port}/metrics")
+        except OSError as e:
+            print(f"Não foi possível abrir a porta {port} para as métricas: {e}")
+    if textfile:
+        exporter = TextfileExporter(textfile, interval)
+        exporter.start()
+        exporters.append(exporter)
+        print(f"Métricas gravadas em {textfile} a cada {interval:.0f}s")
+    return exporters
+
+
+def stop_exporters(exporters):
+    for exporter in exporters:
+        try:
+            exporter.stop()
+        except Exception as e:
+            print(f"Erro ao encerrar exportador de métricas: {e}")
@@ -0,0 +1,574 @@
+"""
+Portal da SEFAZ simulado, para testes e medições sem rede
+
+Reproduz o necessário para o fluxo completo da automação:
+- icms.php com os mesmos campos do formulário e o botão btnEnviar
+- um widget de reCAPTCHA falso (checkbox e desafio de áudio configurável)
+- a etapa "Gerar DUA" e a página imprimir-dua.php
+
+Latência, erros HTTP e rejeições de dados podem ser injetados com taxas
+configuráveis e semente fixa, para medições reproduzíveis.
+
+Uso:
+    python mock_portal.py --port 8765 --latency 0.3 --error-rate 0.05
+    DUA_PORTAL_URL=http://127.0.0.1:8765 python run_ui.py
+"""
+
+import argparse
+import html
+import io
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import wave
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+FORM_PATH = "/agenciavirtual/area_publica/e-dua/icms.php"
+GERAR_PATH = "/agenciavirtual/area_publica/e-dua/gerar-dua.php"
+PRINT_PATH = "/agenciavirtual/area_publica/e-dua/imprimir-dua.php"
+HOME_PATH = "/agenciavirtual/"
+
+# Opções do campo idServico (valor, texto) como no portal
+SERVICES = [
+    ("1464", "138-4 - ICMS - Substituição Tributaria - Contribuintes sediados no ES"),
+    ("1463", "137-6 - ICMS - Substituição Tributária - Contribuintes sediados fora do ES"),
+    ("1439", "386-7 - ICMS - Diferencial de Alíquota EC 87"),
+    ("1434", "121-0 - ICMS - Comércio"),
+    ("1440", "128-7 - ICMS - Diferencial de Alíquota de Empresas Comerciais"),
+    ("1443", "129-5 - ICMS - Diferencial de Alíquota de Empresas Industriais"),
+    ("1462", "125-2 - ICMS - Serviços de Transporte - Empresas do Estado do Espírito Santo"),
+    ("1455", "122-8 - ICMS - Indústria"),
+    ("1437", "145-7 - ICMS - Demais Produtos"),
+    ("1452", "162-7 - ICMS - Fundo Estadual de Combate a Pobreza"),
+]
+
+# Mensagens usadas nas rejeições injetadas (classificadas por portal_errors)
+REJECTION_MESSAGES = [
+    "CPF/CNPJ do contribuinte inválido.",
+    "Data de vencimento inválida.",
+    "Valor da receita inválido.",
+]
+
+CAPTCHA_MODES = ("checkbox", "audio", "fail")
+
+# Validade dos tokens de CAPTCHA emitidos (como no reCAPTCHA)
+TOKEN_TTL = 120
+
+# Widget de reCAPTCHA falso (também injetado nas páginas de session_replay.py)
+RECAPTCHA_WIDGET = """<div class="g-recaptcha" data-callback="mockRecaptchaCallback">
+<iframe title="reCAPTCHA" src="/mock-recaptcha/anchor" width="304" height="78"></iframe>
+<textarea name="g-recaptcha-response" style="display:none"></textarea>
+</div>
+<iframe id="mock-challenge" title="recaptcha challenge expires in two minutes"
+  style="display:none;width:400px;height:300px;border:1px solid #ccc"></iframe>
+"""
+
+RECAPTCHA_SCRIPT = """window.grecaptcha = window.grecaptcha || {};
+window.grecaptcha.getResponse = function () {
+  return document.querySelector('textarea[name="g-recaptcha-response"]').value;
+};
+window.mockRecaptchaCallback = window.mockRecaptchaCallback || function (token) {};
+window.mockRecaptchaSolved = function (token) {
+  var field = document.querySelector('textarea[name="g-recaptcha-response"]');
+  field.value = token;
+  document.getElementById('mock-challenge').style.display = 'none';
+  window.mockRecaptchaCallback(token);
+};
+window.mockRecaptchaChallenge = function () {
+  var frame = document.getElementById('mock-challenge');
+  frame.src = '/mock-recaptcha/bframe?c=' + Math.random();
+  frame.style.display = 'block';
+};
+"""
+
+FORM_PAGE = """<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>e-DUA - ICMS</title>
+<style>
+body {{ font-family: sans-serif; margin: 2em; }}
+label {{ display: block; margin-top: .6em; }}
+</style></head>
+<body>
+<h1>Documento Único de Arrecadação - ICMS</h1>
+<form id="formDua" method="post" action="icms.php">
+<label>CPF/CNPJ <input type="text" name="codCpfCnpjPessoa"></label>
+<label>Serviço <select name="idServico"><option value="">Selecione</option>{options}</select></label>
+<label>Referência <input type="text" name="datReferencia"></label>
+<label>Vencimento <input type="text" name="datVencimento"></label>
+<label>Valor <input type="text" name="vlrReceita"></label>
+<label>Informações <textarea name="dscInformacao"></textarea></label>
+{recaptcha}<button type="button" id="btnEnviar">Enviar</button>
+</form>
+<script>
+{recaptcha_script}document.getElementById('btnEnviar').addEventListener('click', function () {{
+  if (!grecaptcha.getResponse()) {{
+    alert('Por favor, confirme que você não é um robô.');
+    return;
+  }}
+  document.getElementById('formDua').submit();
+}});
+</script>
+</body></html>
+"""
+
+ANCHOR_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"></head><body>
+<span id="recaptcha-anchor" role="checkbox" tabindex="0"
+  style="display:inline-block;width:24px;height:24px;border:2px solid #999;cursor:pointer"></span>
+<span>Não sou um robô</span>
+<script>
+document.getElementById('recaptcha-anchor').addEventListener('click', function () {
+  fetch('/mock-recaptcha/checkbox', {method: 'POST'})
+    .then(function (r) { return r.json(); })
+    .then(function (data) {
+      if (data.token) { window.parent.mockRecaptchaSolved(data.token); }
+      else { window.parent.mockRecaptchaChallenge(); }
+    });
+});
+</script>
+</body></html>
+"""
+
+CHALLENGE_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"></head><body>
+<p>Selecione todas as imagens com semáforos</p>
+<button id="recaptcha-audio-button" title="Receber um desafio de áudio">áudio</button>
+<button id="recaptcha-reload-button" title="Get a new challenge">recarregar</button>
+<div id="audio-area" style="display:none">
+<audio id="audio-source" src="/mock-recaptcha/audio.mp3?c={challenge}"></audio>
+<input type="text" id="audio-response">
+</div>
+<script>
+var challenge = '{challenge}';
+document.getElementById('recaptcha-audio-button').addEventListener('click', function () {{
+  document.getElementById('audio-area').style.display = 'block';
+}});
+document.getElementById('recaptcha-reload-button').addEventListener('click', function () {{
+  window.location.href = '/mock-recaptcha/bframe?c=' + Math.random();
+}});
+document.getElementById('audio-response').addEventListener('keydown', function (event) {{
+  if (event.key !== 'Enter') {{ return; }}
+  fetch('/mock-recaptcha/verify', {{
+    method: 'POST',
+    headers: {{'Content-Type': 'application/json'}},
+    body: JSON.stringify({{challenge: challenge, answer: this.value}})
+  }}).then(function (r) {{ return r.json(); }}).then(function (data) {{
+    if (data.token) {{ window.parent.mockRecaptchaSolved(data.token); }}
+  }});
+}});
+</script>
+</body></html>
+"""
+
+RESULT_PAGE = """<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>e-DUA - ICMS</title></head>
+<body>
+<h1>Documento Único de Arrecadação - ICMS</h1>
+<p>Contribuinte: {cpf_cnpj} &middot; Referência: {referencia} &middot; Valor: R$ {valor}</p>
+<button type="button" id="btnGerar" onclick="gerarDua()">Gerar DUA</button>
+<div id="resultado"></div>
+<script>
+function gerarDua() {{
+  document.getElementById('btnGerar').disabled = true;
+  fetch('gerar-dua.php?id={dua_id}', {{method: 'POST'}}).then(function (r) {{
+    if (!r.ok) {{
+      document.getElementById('resultado').innerHTML =
+        '<div class="alert-danger">Erro ao gerar o DUA. Tente novamente.</div>';
+      return;
+    }}
+    document.getElementById('resultado').innerHTML =
+      '<a href="imprimir-dua.php?id={dua_id}" target="_blank">Imprimir ou Salvar PDF</a>';
+  }});
+}}
+</script>
+</body></html>
+"""
+
+ERROR_PAGE = """<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>e-DUA - ICMS</title></head>
+<body>
+<h1>Documento Único de Arrecadação - ICMS</h1>
+<div class="alert-danger">{message}</div>
+<a href="icms.php">Voltar</a>
+</body></html>
+"""
+
+PRINT_PAGE = """<!DOCTYPE html>
+<html lang="pt-BR"><head><meta charset="utf-8"><title>DUA {dua_id}</title></head>
+<body>
+<h2>GOVERNO DO ESTADO DO ESPÍRITO SANTO - DUA (simulado)</h2>
+<table border="1" cellpadding="4">
+<tr><td>Número</td><td>{numero}</td></tr>
+<tr><td>CPF/CNPJ</td><td>{cpf_cnpj}</td></tr>
+<tr><td>Serviço</td><td>{servico}</td></tr>
+<tr><td>Referência</td><td>{referencia}</td></tr>
+<tr><td>Vencimento</td><td>{vencimento}</td></tr>
+<tr><td>Valor</td><td>R$ {valor}</td></tr>
+<tr><td>Informações</td><td>{informacao}</td></tr>
+</table>
+</body></html>
+"""
+
+
+def silent_wav(seconds=1.0, rate=8000):
+    """Áudio mudo usado quando nenhum arquivo de desafio foi informado"""
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(b"\x00\x00" * int(seconds * rate))
+    return buffer.getvalue()
+
+
+def validate_submission(fields):
+    """Mensagem de erro do portal para os dados enviados, ou None"""
+    digits = re.sub(r"\D", "", fields.get("codCpfCnpjPessoa", ""))
+    if len(digits) not in (11, 14):
+        return "CPF/CNPJ do contribuinte inválido."
+    if fields.get("idServico") not in {value for value, _ in SERVICES}:
+        return "Serviço não encontrado."
+    for name, fmt, label in (
+        ("datReferencia", "%m/%Y", "Data de referência"),
+        ("datVencimento", "%d/%m/%Y", "Data de vencimento"),
+    ):
+        try:
+            datetime.strptime(fields.get(name, "").strip(), fmt)
+        except ValueError:
+            return f"{label} inválida."
+    try:
+        if float(fields.get("vlrReceita", "").replace(",", ".")) <= 0:
+            raise ValueError
+    except ValueError:
+        return "Valor da receita inválido."
+    return None
+
+
+class MockPortal:
+    """Servidor HTTP local que imita o portal do e-DUA
+
+    Args:
+        latency: atraso médio (s) de cada página do portal
+        jitter: variação uniforme somada ao atraso (s)
+        error_rate: fração de páginas respondidas com HTTP 503
+        reject_rate: fração de envios válidos rejeitados com mensagem de erro
+        captcha: "checkbox" (passa no clique), "audio" (exige o desafio) ou "fail"
+        captcha_fail_rate: fração de cliques no checkbox que caem no desafio de áudio
+        audio_file: arquivo servido como áudio do desafio (padrão: áudio mudo)
+        audio_answer: resposta esperada no desafio (None aceita qualquer texto)
+        seed: semente dos sorteios, para execuções reproduzíveis
+    """
+
+    def __init__(
+        self,
+        host="127.0.0.1",
+        port=0,
+        latency=0.0,
+        jitter=0.0,
+        error_rate=0.0,
+        reject_rate=0.0,
+        captcha="checkbox",
+        captcha_fail_rate=0.0,
+        audio_file=None,
+        audio_answer=None,
+        seed=None,
+    ):
+        if captcha not in CAPTCHA_MODES:
+            raise ValueError(f"Modo de CAPTCHA desconhecido: {captcha}")
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.reject_rate = reject_rate
+        self.captcha = captcha
+        self.captcha_fail_rate = captcha_fail_rate
+        self.audio_answer = audio_answer.strip().lower() if audio_answer else None
+        if audio_file:
+            with open(audio_file, "rb") as f:
+                self.audio = f.read()
+            self.audio_type = "audio/mpeg"
+        else:
+            self.audio = silent_wav()
+            self.audio_type = "audio/wav"
+
+        self.lock = threading.Lock()
+        self.random = random.Random(seed)
+        self.tokens = {}  # token -> instante de emissão
+        self.duas = {}  # id -> campos enviados
+        self.stats = {
+            "pages": 0,
+            "errors_injected": 0,
+            "submissions": 0,
+            "rejected": 0,
+            "captcha_tokens": 0,
+            "generated": 0,
+            "printed": 0,
+        }
+
+        handler = type(
+            f"{type(self).__name__}Handler", (self.handler_class(),), {"portal": self}
+        )
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = None
+
+    def handler_class(self):
+        """Classe que atende as requisições (subclasses servem outras páginas)"""
+        return _MockPortalHandler
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def form_url(self):
+        return self.base_url + FORM_PATH
+
+    def start(self):
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, name="MockPortal", daemon=True
+        )
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def count(self, name):
+        with self.lock:
+            self.stats[name] += 1
+
+    def chance(self, rate):
+        if not rate:
+            return False
+        with self.lock:
+            return self.random.random() < rate
+
+    def delay(self):
+        """Atraso simulado do portal para esta requisição"""
+        if not self.latency and not self.jitter:
+            return
+        with self.lock:
+            extra = self.random.uniform(0, self.jitter) if self.jitter else 0.0
+        time.sleep(self.latency + extra)
+
+    def issue_token(self):
+        token = f"mock-{uuid.uuid4().hex}"
+        with self.lock:
+            self.tokens[token] = time.monotonic()
+            self.stats["captcha_tokens"] += 1
+        return token
+
+    def consume_token(self, token):
+        """Tokens valem uma vez e expiram em TOKEN_TTL segundos"""
+        with self.lock:
+            issued = self.tokens.pop(token, None)
+        return issued is not None and time.monotonic() - issued <= TOKEN_TTL
+
+
+class _MockPortalHandler(BaseHTTPRequestHandler):
+    portal = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8"):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_json(self, data, status=200):
+        self._send(status, json.dumps(data), "application/json")
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length).decode("utf-8") if length else ""
+
+    def _portal_page(self):
+        """Latência e erro injetados nas páginas do portal; True se já respondeu"""
+        portal = self.portal
+        portal.count("pages")
+        portal.delay()
+        if portal.chance(portal.error_rate):
+            portal.count("errors_injected")
+            self._send(503, "<h1>503 Service Unavailable</h1>")
+            return True
+        return False
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        portal = self.portal
+
+        if url.path == HOME_PATH:
+            if not self._portal_page():
+                self._send(200, "<h1>Agência Virtual (simulada)</h1>")
+        elif url.path == FORM_PATH:
+            if not self._portal_page():
+                options = "".join(
+                    f'<option value="{value}">{html.escape(text)}</option>'
+                    for value, text in SERVICES
+                )
+                self._send(
+                    200,
+                    FORM_PAGE.format(
+                        options=options,
+                        recaptcha=RECAPTCHA_WIDGET,
+                        recaptcha_script=RECAPTCHA_SCRIPT,
+                    ),
+                )
+        elif url.path == PRINT_PATH:
+            if self._portal_page():
+                return
+            dua_id = query.get("id", [""])[0]
+            with portal.lock:
+                fields = portal.duas.get(dua_id)
+            if fields is None:
+                self._send(404, "<h1>DUA não encontrado</h1>")
+                return
+            portal.count("printed")
+            self._send(
+                200,
+                PRINT_PAGE.format(
+                    dua_id=dua_id,
+                    numero=dua_id[:12].upper(),
+                    cpf_cnpj=html.escape(fields.get("codCpfCnpjPessoa", "")),
+                    servico=html.escape(fields.get("idServico", "")),
+                    referencia=html.escape(fields.get("datReferencia", "")),
+                    vencimento=html.escape(fields.get("datVencimento", "")),
+                    valor=html.escape(fields.get("vlrReceita", "")),
+                    informacao=html.escape(fields.get("dscInformacao", "")),
+                ),
+            )
+        elif url.path == "/mock-recaptcha/anchor":
+            self._send(200, ANCHOR_PAGE)
+        elif url.path == "/mock-recaptcha/bframe":
+            challenge = uuid.uuid4().hex[:8]
+            self._send(200, CHALLENGE_PAGE.format(challenge=challenge))
+        elif url.path == "/mock-recaptcha/audio.mp3":
+            self._send(200, portal.audio, portal.audio_type)
+        elif url.path == "/mock/stats":
+            with portal.lock:
+                self._send_json(dict(portal.stats))
+        else:
+            self._send(404, "<h1>404</h1>")
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        portal = self.portal
+        body = self._read_body()
+
+        if url.path == FORM_PATH:
+            if self._portal_page():
+                return
+            portal.count("submissions")
+            fields = {k: v[0] for k, v in parse_qs(body, keep_blank_values=True).items()}
+            if not portal.consume_token(fields.get("g-recaptcha-response", "")):
+                message = "Por favor, confirme que você não é um robô."
+            else:
+                message = validate_submission(fields)
+                if message is None and portal.chance(portal.reject_rate):
+                    with portal.lock:
+                        message = portal.random.choice(REJECTION_MESSAGES)
+            if message:
+                portal.count("rejected")
+                self._send(200, ERROR_PAGE.format(message=html.escape(message)))
+                return
+
+            dua_id = uuid.uuid4().hex
+            with portal.lock:
+                portal.duas[dua_id] = fields
+            self._send(
+                200,
+                RESULT_PAGE.format(
+                    dua_id=dua_id,
+                    cpf_cnpj=html.escape(fields["codCpfCnpjPessoa"]),
+                    referencia=html.escape(fields["datReferencia"]),
+                    valor=html.escape(fields["vlrReceita"]),
+                ),
+            )
+        elif url.path == GERAR_PATH:
+            if self._portal_page():
+                return
+            portal.count("generated")
+            self._send_json({"ok": True})
+        elif url.path == "/mock-recaptcha/checkbox":
+            if portal.captcha == "checkbox" and not portal.chance(
+                portal.captcha_fail_rate
+            ):
+                self._send_json({"token": portal.issue_token()})
+            else:
+                self._send_json({"token": None})
+        elif url.path == "/mock-recaptcha/verify":
+            try:
+                answer = json.loads(body or "{}").get("answer", "").strip().lower()
+            except ValueError:
+                answer = ""
+            accepted = (
+                portal.captcha != "fail"
+                and answer
+                and (portal.audio_answer is None or answer == portal.audio_answer)
+            )
+            self._send_json({"token": portal.issue_token() if accepted else None})
+        else:
+            self._send(404, "<h1>404</h1>")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Portal do e-DUA simulado (offline)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0, help="atraso por página (s)")
+    parser.add_argument("--jitter", type=float, default=0.0, help="variação do atraso (s)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fração de HTTP 503")
+    parser.add_argument(
+        "--reject-rate", type=float, default=0.0, help="fração de envios rejeitados"
+    )
+    parser.add_argument("--captcha", choices=CAPTCHA_MODES, default="checkbox")
+    parser.add_argument(
+        "--captcha-fail-rate",
+        type=float,
+        default=0.0,
+        help="fração de cliques no checkbox que exigem o desafio de áudio",
+    )
+    parser.add_argument("--audio-file", help="MP3 servido no desafio de áudio")
+    parser.add_argument("--audio-answer", help="resposta esperada no desafio de áudio")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    portal = MockPortal(
+        host=args.host,
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        reject_rate=args.reject_rate,
+        captcha=args.captcha,
+        captcha_fail_rate=args.captcha_fail_rate,
+        audio_file=args.audio_file,
+        audio_answer=args.audio_answer,
+        seed=args.seed,
+    )
+    print(f"Portal simulado em {portal.base_url} (formulário: {portal.form_url})")
+    print(f"Use DUA_PORTAL_URL={portal.base_url} para apontar a automação para ele")
+    try:
+        portal.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        portal.server.server_close()
+
+
+if __name__ == "__main__":
+    main()
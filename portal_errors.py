@@ -0,0 +1,110 @@
+"""
+Detecção e classificação de erros de validação do portal da SEFAZ
+
+Depois do envio do formulário, o portal mostra o botão "Gerar DUA" ou uma
+mensagem de erro. Uma única chamada de script verifica os dois casos, para
+que uma linha rejeitada falhe em milissegundos em vez de esgotar o timeout.
+"""
+
+import re
+import unicodedata
+
+GERAR_DUA_XPATH = (
+    "//button[contains(text(), 'Gerar DUA') or contains(@onclick, 'gerarDua')]"
+)
+
+IMPRIMIR_XPATH = (
+    "//a[contains(text(), 'Imprimir ou Salvar PDF') or contains(@href, 'imprimir-dua.php')]"
+)
+
+# Marcações de mensagens de erro. Só classes de erro: avisos genéricos
+# (.alert-warning, [role='alert']) aparecem também em páginas sem rejeição
+ERROR_SELECTORS = (
+    ".alert-danger, .alert-error, .msgErro, .mensagem-erro, .invalid-feedback, "
+    ".help-block.error"
+)
+
+# Enquanto a página do formulário não é substituída após o envio, as mensagens que
+# já estavam visíveis antes do clique são ignoradas, por no máximo este tempo (s);
+# mensagens novas contam na hora (validação sem recarregar a página)
+SUBMIT_PAGE_WAIT = 5
+
+# Textos das mensagens de erro visíveis (lidos antes do clique em "Enviar")
+VISIBLE_ERRORS_SCRIPT = """
+var nodes = document.querySelectorAll(arguments[0]);
+var messages = [];
+for (var i = 0; i < nodes.length; i++) {
+    var text = (nodes[i].innerText || '').trim();
+    if (text && nodes[i].offsetParent !== null) { messages.push(text); }
+}
+return messages;
+"""
+
+# Retorna {state: 'ready'|'error'|'pending', message}; ignora as mensagens de
+# arguments[2]
+SUBMIT_STATE_SCRIPT = """
+var xpath = arguments[0];
+var selectors = arguments[1];
+var ignored = arguments[2] || [];
+var button = document.evaluate(
+    xpath, document, null, XPathResult.FIRST_ORDERED_NODE_TYPE, null
+).singleNodeValue;
+if (button && button.offsetParent !== null && !button.disabled) {
+    return {state: 'ready', message: null};
+}
+var nodes = document.querySelectorAll(selectors);
+for (var i = 0; i < nodes.length; i++) {
+    var text = (nodes[i].innerText || '').trim();
+    if (text && nodes[i].offsetParent !== null && ignored.indexOf(text) < 0) {
+        return {state: 'error', message: text};
+    }
+}
+return {state: 'pending', message: null};
+"""
+
+# Código -> padrão que identifica o assunto da mensagem (comparado sem acentos).
+# Palavras inteiras; "contribuinte" e "receita" só contam quando o erro é sobre eles
+ERROR_CODES = [
+    ("CAPTCHA_INVALIDO", re.compile(r"captcha|\brobo\b")),
+    (
+        "CPF_CNPJ_INVALIDO",
+        re.compile(
+            r"\b(cpf|cnpj)\b|\bcontribuinte (nao|inexistente|invalido|desconhecido)"
+        ),
+    ),
+    (
+        "SERVICO_INVALIDO",
+        re.compile(r"\bservicos?\b|\breceita (nao|inexistente|invalida|desconhecida)"),
+    ),
+    ("DATA_INVALIDA", re.compile(r"\b(data|vencimento|referencia|periodo)\b")),
+    ("VALOR_INVALIDO", re.compile(r"\bvalor\b")),
+]
+
+
+class PortalValidationError(Exception):
+    """O portal rejeitou os dados da linha"""
+
+    def __init__(self, code, message):
+        super().__init__(f"[{code}] {message}")
+        self.code = code
+        self.message = message
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def classify_error(message):
+    """Retorna o código de erro estruturado para a mensagem do portal
+
+    Quando a mensagem cita mais de um assunto, vale o que aparece primeiro
+    ("Data de vencimento inválida para o contribuinte" -> DATA_INVALIDA).
+    """
+    normalized = _normalize(message or "")
+    found = []
+    for code, pattern in ERROR_CODES:
+        match = pattern.search(normalized)
+        if match:
+            found.append((match.start(), code))
+    return min(found, key=lambda item: item[0])[1] if found else "ERRO_PORTAL"
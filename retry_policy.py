@@ -0,0 +1,210 @@
+"""
+Política de repetição e disjuntor (circuit breaker) para o portal da SEFAZ
+
+- Falhas são classificadas como transitórias (timeout, 5xx, elemento obsoleto,
+  navegador travado) ou permanentes (dados rejeitados pelo portal).
+- Falhas transitórias voltam para a fila com espera exponencial e jitter.
+- Quando a taxa de falhas transitórias dispara, o disjuntor abre e todos os
+  processamentos esperam; depois do intervalo, uma sondagem do portal decide
+  se uma linha de teste pode passar antes de voltar ao ritmo normal.
+"""
+
+import collections
+import heapq
+import itertools
+import random
+import threading
+import time
+
+from portal_errors import PortalValidationError
+
+# Erros do portal que não mudam ao tentar de novo
+PERMANENT_PORTAL_CODES = {
+    "CPF_CNPJ_INVALIDO",
+    "DATA_INVALIDA",
+    "SERVICO_INVALIDO",
+    "VALOR_INVALIDO",
+}
+
+
+def is_transient(error):
+    """True se vale a pena tentar a linha de novo
+
+    error=None representa uma falha sem exceção (ex.: baixar_pdf retornou False).
+    """
+    if error is None:
+        return True
+    if isinstance(error, PortalValidationError):
+        return error.code not in PERMANENT_PORTAL_CODES
+
+    # Erros HTTP (requests: response.status_code; urllib: code)
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is None:
+        status = getattr(error, "code", None)
+    if isinstance(status, int):
+        return status >= 500 or status == 429
+
+    # Problemas nos dados da linha
+    if isinstance(error, (KeyError, ValueError, TypeError)):
+        return False
+    return True
+
+
+class RetryPolicy:
+    """Quantas vezes repetir e quanto esperar entre as tentativas"""
+
+    def __init__(self, max_attempts=3, base_delay=5.0, max_delay=120.0, jitter=0.5):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def should_retry(self, error, attempt):
+        return attempt < self.max_attempts and is_transient(error)
+
+    def delay(self, attempt):
+        """Espera exponencial após a tentativa `attempt`, com jitter proporcional"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        return delay * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class RetryQueue:
+    """Fila de linhas a processar, com linhas repetidas liberadas só após a espera"""
+
+    def __init__(self, indexes=()):
+        self._heap = []
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        for index in indexes:
+            self.push(index)
+
+    def push(self, index, attempt=1, delay=0.0):
+        with self._lock:
+            # A ordem original é mantida entre linhas liberadas no mesmo instante
+            ready_at = time.monotonic() + delay if delay else 0.0
+            heapq.heappush(self._heap, (ready_at, next(self._seq), index, attempt))
+
+    def pop_ready(self):
+        """(índice, tentativa) da próxima linha liberada, ou None"""
+        with self._lock:
+            if self._heap and self._heap[0][0] <= time.monotonic():
+                _, _, index, attempt = heapq.heappop(self._heap)
+                return index, attempt
+            return None
+
+    def next_ready_in(self):
+        with self._lock:
+            if not self._heap:
+                return None
+            return max(0.0, self._heap[0][0] - time.monotonic())
+
+    def __len__(self):
+        with self._lock:
+            return len(self._heap)
+
+
+class CircuitBreaker:
+    """Pausa o processamento quando a taxa de falhas transitórias dispara"""
+
+    CLOSED = "fechado"
+    OPEN = "aberto"
+    HALF_OPEN = "em teste"
+
+    def __init__(
+        self,
+        failure_rate=0.5,
+        window=20,
+        min_calls=6,
+        cooldown=30.0,
+        max_cooldown=300.0,
+        probe=None,
+    ):
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        # probe() -> bool: verificação leve do portal antes da linha de teste
+        self.probe = probe
+        self.state = self.CLOSED
+        self.trips = 0
+        self._results = collections.deque(maxlen=window)
+        self._cooldown = cooldown
+        self._opened_at = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+
+    def _open(self, cooldown):
+        self.state = self.OPEN
+        self._cooldown = min(self.max_cooldown, cooldown)
+        self._opened_at = time.monotonic()
+        self._trial_running = False
+        self.trips += 1
+
+    def record(self, success):
+        """Registra o resultado de uma linha (apenas falhas transitórias contam como falha)"""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                if success:
+                    self.state = self.CLOSED
+                    self._cooldown = self.base_cooldown
+                    self._results.clear()
+                    print("Portal respondendo normalmente; processamento retomado")
+                else:
+                    self._open(self._cooldown * 2)
+                    print(
+                        f"Linha de teste falhou; nova pausa de {self._cooldown:.0f}s"
+                    )
+                return
+
+            self._results.append(success)
+            failures = self._results.count(False)
+            if (
+                self.state == self.CLOSED
+                and len(self._results) >= self.min_calls
+                and failures / len(self._results) >= self.failure_rate
+            ):
+                self._open(self._cooldown)
+                print(
+                    f"Muitas falhas seguidas no portal ({failures}/{len(self._results)}); "
+                    f"pausando por {self._cooldown:.0f}s"
+                )
+
+    def wait(self, token=None):
+        """Bloqueia enquanto o disjuntor estiver aberto; retorna quando a linha pode seguir"""
+        while True:
+            with self._lock:
+                if self.state == self.CLOSED:
+                    return
+                if self.state == self.HALF_OPEN and not self._trial_running:
+                    # Só uma linha de teste por vez
+                    self._trial_running = True
+                    return
+                remaining = self._opened_at + self._cooldown - time.monotonic()
+                probe_now = self.state == self.OPEN and remaining <= 0
+
+            if probe_now:
+                if self._probe_ok():
+                    with self._lock:
+                        self.state = self.HALF_OPEN
+                        self._trial_running = False
+                    print("Sondagem do portal bem-sucedida; enviando uma linha de teste")
+                    continue
+                with self._lock:
+                    self._open(self._cooldown * 2)
+                print(f"Portal ainda indisponível; nova pausa de {self._cooldown:.0f}s")
+                remaining = self._cooldown
+
+            pause = min(1.0, max(0.1, remaining))
+            if token is not None:
+                token.sleep(pause)
+            else:
+                time.sleep(pause)
+
+    def _probe_ok(self):
+        if self.probe is None:
+            return True
+        try:
+            return bool(self.probe())
+        except Exception as e:
+            print(f"Sondagem do portal falhou: {e}")
+            return False
@@ -0,0 +1,120 @@
+"""
+Validação local das linhas da planilha antes de qualquer uso do navegador
+
+Todas as verificações são feitas sobre colunas inteiras (pandas/NumPy), sem
+laço por linha, para que planilhas grandes sejam validadas no carregamento.
+Linhas inválidas recebem os motivos na coluna VALIDACAO e não são enviadas
+ao portal.
+"""
+
+import numpy as np
+import pandas as pd
+
+VALIDATION_COLUMN = "VALIDACAO"
+
+CPF_WEIGHTS_1 = np.arange(10, 1, -1)
+CPF_WEIGHTS_2 = np.arange(11, 1, -1)
+CNPJ_WEIGHTS_1 = np.array([5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+CNPJ_WEIGHTS_2 = np.array([6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2])
+
+
+def _digit_matrix(values, width):
+    """Converte strings de dígitos com o mesmo tamanho numa matriz (n, width)"""
+    joined = "".join(values).encode("ascii")
+    return np.frombuffer(joined, dtype=np.uint8).reshape(-1, width).astype(np.int64) - 48
+
+
+def _cpf_valid(digits):
+    matrix = _digit_matrix(digits, 11)
+    dv1 = (matrix[:, :9] @ CPF_WEIGHTS_1) * 10 % 11 % 10
+    dv2 = (matrix[:, :10] @ CPF_WEIGHTS_2) * 10 % 11 % 10
+    repeated = (matrix == matrix[:, :1]).all(axis=1)
+    return (dv1 == matrix[:, 9]) & (dv2 == matrix[:, 10]) & ~repeated
+
+
+def _cnpj_check_digit(matrix, weights):
+    remainder = (matrix[:, : len(weights)] @ weights) % 11
+    return np.where(remainder < 2, 0, 11 - remainder)
+
+
+def _cnpj_valid(digits):
+    matrix = _digit_matrix(digits, 14)
+    dv1 = _cnpj_check_digit(matrix, CNPJ_WEIGHTS_1)
+    dv2 = _cnpj_check_digit(matrix, CNPJ_WEIGHTS_2)
+    repeated = (matrix == matrix[:, :1]).all(axis=1)
+    return (dv1 == matrix[:, 12]) & (dv2 == matrix[:, 13]) & ~repeated
+
+
+def cpf_cnpj_valid(series):
+    """Máscara booleana: CPF (11 dígitos) ou CNPJ (14 dígitos) com dígitos verificadores corretos"""
+    digits = series.fillna("").astype(str).str.replace(r"[^0-9]", "", regex=True)
+    lengths = digits.str.len()
+    valid = np.zeros(len(series), dtype=bool)
+
+    is_cpf = (lengths == 11).to_numpy()
+    if is_cpf.any():
+        valid[is_cpf] = _cpf_valid(digits[is_cpf].tolist())
+
+    is_cnpj = (lengths == 14).to_numpy()
+    if is_cnpj.any():
+        valid[is_cnpj] = _cnpj_valid(digits[is_cnpj].tolist())
+
+    return pd.Series(valid, index=series.index)
+
+
+def date_valid(series, date_format):
+    """Máscara booleana: datas que existem no formato informado (ex.: %d/%m/%Y)"""
+    values = series.fillna("").astype(str).str.strip()
+    parsed = pd.to_datetime(values, format=date_format, errors="coerce")
+    return parsed.notna()
+
+
+def valor_valid(series):
+    """Máscara booleana: valores numéricos positivos (já com ponto decimal)
+
+    No carregamento a vírgula decimal vira ponto, então "1.234,56" chega como
+    "1.234.56": só o último ponto é decimal, os anteriores separam milhares.
+    """
+    values = series.fillna("").astype(str).str.strip()
+    values = values.str.replace(r"\.(?=.*\.)", "", regex=True)
+    values = pd.to_numeric(values, errors="coerce")
+    return values.notna() & (values > 0)
+
+
+def servico_valid(series, servicos):
+    """Máscara booleana: códigos de serviço conhecidos (código da planilha ou valor do portal)"""
+    known = set(servicos) | set(servicos.values())
+    return series.fillna("").astype(str).str.strip().isin(known)
+
+
+def validate_rows(data, servicos):
+    """
+    Valida todas as linhas da planilha.
+
+    Args:
+        data: DataFrame já com as colunas renomeadas (CPF_CNPJ, SERVICO, ...)
+        servicos: mapeamento de códigos de serviço (SERVICO_MAPPING)
+
+    Returns:
+        Series com os motivos de rejeição de cada linha ("" para linhas válidas)
+    """
+    checks = [
+        (cpf_cnpj_valid(data["CPF_CNPJ"]), "CPF/CNPJ inválido"),
+        (servico_valid(data["SERVICO"], servicos), "serviço desconhecido"),
+        (date_valid(data["REFERENCIA"], "%m/%Y"), "referência inválida (MM/AAAA)"),
+        (date_valid(data["VENCIMENTO"], "%d/%m/%Y"), "vencimento inválido (DD/MM/AAAA)"),
+        (valor_valid(data["VALOR"]), "valor inválido"),
+    ]
+
+    reasons = pd.Series("", index=data.index)
+    for mask, reason in checks:
+        failed = ~mask
+        if failed.any():
+            reasons[failed] = reasons[failed] + "; " + reason
+    return reasons.str.lstrip("; ")
+
+
+def apply_validation(data, servicos):
+    """Adiciona a coluna VALIDACAO ao DataFrame e retorna a quantidade de linhas inválidas"""
+    data[VALIDATION_COLUMN] = validate_rows(data, servicos)
+    return int((data[VALIDATION_COLUMN] != "").sum())
@@ -0,0 +1,241 @@
+"""
+Perfil de execução opcional para investigar lentidão no lado Python
+
+Uma thread de amostragem lê as pilhas de todas as threads a cada
+SAMPLE_INTERVAL segundos (sys._current_frames) e acumula as pilhas no formato
+"collapsed stack" (uma linha "thread;quadro;quadro N" por pilha), aceito pelo
+flamegraph.pl, speedscope e similares. Como registra o tempo de parede,
+esperas em chamadas ao navegador também aparecem no gráfico.
+
+As threads de processamento também podem ser medidas com cProfile
+(begin_thread/end_thread); ao final os perfis são somados num único arquivo
+.pstats. No Python 3.12 ou superior o cProfile usa o sys.monitoring, que só
+aceita um perfil ativo e já mede todas as threads: o primeiro begin_thread
+liga o perfil e as demais threads ficam cobertas por ele.
+
+Opcionalmente o tracemalloc compara a memória alocada no início e no fim da
+execução, para localizar crescimento de memória.
+"""
+
+import cProfile
+import datetime
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+# Intervalo entre amostras (100 por segundo)
+SAMPLE_INTERVAL = 0.01
+
+# Quadros guardados por alocação no tracemalloc (1 = só a linha que alocou)
+MEMORY_FRAMES = 1
+
+# Linhas do relatório de memória e do resumo
+MEMORY_TOP = 30
+SUMMARY_TOP = 5
+
+# Alocações do próprio rastreamento e do sistema de importação não interessam
+MEMORY_FILTERS = [
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+]
+
+
+class RunProfiler:
+    """Amostragem de pilhas, cProfile por thread e diferença de memória de uma execução"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL, trace_memory=False):
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self.started_at = datetime.datetime.now()
+        self.stacks = Counter()
+        self.samples = 0
+        self.sampling_seconds = 0.0  # custo acumulado da amostragem
+        self.lock = threading.Lock()
+        self.profiles = []  # cProfile.Profile de cada thread medida
+        self.local = threading.local()
+        self._labels = {}  # code object -> "função (arquivo.py)"
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = None
+        self._stopped = None
+        self._memory_start = None
+        self._memory_end = None
+        self._memory_owner = False
+
+    def start(self):
+        self._started = time.monotonic()
+        if self.trace_memory:
+            # Não interrompe um rastreamento que já estava ativo (ex.: python -X tracemalloc)
+            self._memory_owner = not tracemalloc.is_tracing()
+            if self._memory_owner:
+                tracemalloc.start(MEMORY_FRAMES)
+            self._memory_start = tracemalloc.take_snapshot().filter_traces(MEMORY_FILTERS)
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._sample_loop, name="RunProfiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Encerra a amostragem e o rastreamento de memória (pode ser chamado mais de uma vez)"""
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+            self._stopped = time.monotonic()
+        if self._memory_start is not None and self._memory_end is None:
+            self._memory_end = tracemalloc.take_snapshot().filter_traces(MEMORY_FILTERS)
+            if self._memory_owner:
+                tracemalloc.stop()
+
+    def begin_thread(self):
+        """Ativa o cProfile na thread atual (retorna False se outro perfil já está ativo)"""
+        if getattr(self.local, "profile", None) is not None:
+            return True
+        profile = cProfile.Profile()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+: um único perfil por processo (o nosso ou outra
+            # ferramenta); a amostragem continua cobrindo esta thread
+            return False
+        self.local.profile = profile
+        return True
+
+    def end_thread(self):
+        """Desativa o cProfile da thread atual e guarda o resultado"""
+        profile = getattr(self.local, "profile", None)
+        if profile is None:
+            return
+        profile.disable()
+        self.local.profile = None
+        with self.lock:
+            self.profiles.append(profile)
+
+    @property
+    def elapsed(self):
+        if self._started is None:
+            return 0.0
+        return (self._stopped or time.monotonic()) - self._started
+
+    def _label(self, code):
+        label = self._labels.get(code)
+        if label is None:
+            label = f"{code.co_name} ({os.path.basename(code.co_filename)})"
+            self._labels[code] = label
+        return label
+
+    def _sample_loop(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            started = time.perf_counter()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            frames = sys._current_frames()
+            collected = []
+            for thread_id, frame in frames.items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                collected.append(";".join(reversed(stack)))
+            del frames
+            with self.lock:
+                self.stacks.update(collected)
+                self.samples += 1
+                self.sampling_seconds += time.perf_counter() - started
+
+    def hottest(self, top=SUMMARY_TOP):
+        """Quadros que mais aparecem no topo das pilhas (tempo próprio), em % das amostras"""
+        with self.lock:
+            own = Counter()
+            for stack, count in self.stacks.items():
+                own[stack.rsplit(";", 1)[-1]] += count
+            total = sum(self.stacks.values())
+        if not total:
+            return []
+        return [(label, count / total * 100) for label, count in own.most_common(top)]
+
+    def _path(self, directory, prefix, extension):
+        return os.path.join(
+            directory, f"{prefix}_{self.started_at.strftime('%Y%m%d_%H%M%S')}.{extension}"
+        )
+
+    def save(self, directory):
+        """Grava os arquivos do perfil no diretório; retorna {tipo: caminho} dos gravados"""
+        self.stop()
+        paths = {}
+        try:
+            path = self._path(directory, "perfil", "folded")
+            temp_path = f"{path}.tmp"
+            with self.lock:
+                lines = [f"{stack} {count}\n" for stack, count in self.stacks.items()]
+            with open(temp_path, "w", encoding="utf-8") as f:
+                f.writelines(sorted(lines))
+            os.replace(temp_path, path)
+            paths["flamegraph"] = path
+
+            with self.lock:
+                profiles = list(self.profiles)
+            if profiles:
+                path = self._path(directory, "perfil", "pstats")
+                stats = pstats.Stats(profiles[0])
+                for profile in profiles[1:]:
+                    stats.add(profile)
+                temp_path = f"{path}.tmp"
+                stats.dump_stats(temp_path)
+                os.replace(temp_path, path)
+                paths["pstats"] = path
+
+            if self._memory_end is not None:
+                path = self._path(directory, "memoria", "txt")
+                temp_path = f"{path}.tmp"
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    f.writelines(line + "\n" for line in self.memory_report())
+                os.replace(temp_path, path)
+                paths["memory"] = path
+        except OSError as e:
+            print(f"Não foi possível salvar o perfil de execução: {e}")
+        return paths
+
+    def memory_report(self, top=MEMORY_TOP):
+        """Linhas com o maior crescimento de memória entre o início e o fim"""
+        if self._memory_end is None:
+            return []
+        differences = self._memory_end.compare_to(self._memory_start, "lineno")
+        growth = sum(stat.size_diff for stat in differences)
+        lines = [
+            f"Memória rastreada: {sum(s.size for s in differences) / 1024 / 1024:.1f} MB "
+            f"ao final ({growth / 1024 / 1024:+.1f} MB desde o início)",
+            "",
+            f"{'Diferença':>12} {'Total':>12} {'Blocos':>8}  Origem",
+        ]
+        for stat in differences[:top]:
+            frame = stat.traceback[0]
+            lines.append(
+                f"{stat.size_diff / 1024:>+10.1f}KB {stat.size / 1024:>10.1f}KB "
+                f"{stat.count_diff:>+8}  {frame.filename}:{frame.lineno}"
+            )
+        return lines
+
+    def format_summary(self):
+        """Resumo em texto para o log ao final da execução"""
+        if not self.samples:
+            return []
+        elapsed = self.elapsed
+        overhead = self.sampling_seconds / elapsed * 100 if elapsed else 0
+        lines = [
+            f"Perfil: {self.samples} amostra(s) em {elapsed:.0f}s "
+            f"(custo da amostragem: {overhead:.1f}% do tempo)"
+        ]
+        for label, share in self.hottest():
+            lines.append(f"  {share:5.1f}%  {label}")
+        return lines
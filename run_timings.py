@@ -0,0 +1,279 @@
+"""
+Tempos por etapa do processamento e relatório de desempenho da execução
+
+Cada etapa (início do navegador, navegação, preenchimento, CAPTCHA, envio,
+espera do "Gerar DUA", impressão em PDF e gravação do arquivo) é medida com
+relógio monotônico e atribuída à linha em processamento na thread atual.
+Ao final, o relatório traz p50/p95/p99 por etapa, itens por minuto e as
+linhas mais lentas, e é salvo em JSON junto aos PDFs.
+
+As mesmas medições formam uma linha do tempo no formato Chrome Trace Event
+(abre em chrome://tracing ou no Perfetto), com uma trilha por thread de
+processamento e intervalos para cada linha e cada etapa.
+"""
+
+import contextlib
+import datetime
+import json
+import os
+import threading
+import time
+
+from captcha_stats import percentile
+from metrics_export import STAGE_SECONDS
+
+# Etapas medidas, na ordem em que acontecem
+TIMING_STAGES = [
+    "driver_init",
+    "navigate",
+    "fill",
+    "captcha_checkbox",
+    "captcha_audio",
+    "submit",
+    "gerar_dua",
+    "print_pdf",
+    "write",
+]
+
+TIMING_LABELS = {
+    "driver_init": "Início do navegador",
+    "navigate": "Abertura do formulário",
+    "fill": "Preenchimento",
+    "captcha_checkbox": "CAPTCHA (checkbox)",
+    "captcha_audio": "CAPTCHA (áudio)",
+    "submit": "Envio",
+    "gerar_dua": "Espera do Gerar DUA",
+    "print_pdf": "Impressão em PDF",
+    "write": "Gravação do arquivo",
+}
+
+# Quantidade de linhas mais lentas listadas no relatório
+SLOWEST_ROWS = 10
+
+# Limite de eventos da linha do tempo (protege a memória em lotes enormes)
+MAX_TRACE_EVENTS = 200000
+
+
+class RunTimings:
+    """Coleta os tempos de uma execução (thread-safe)"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.started_at = datetime.datetime.now()
+        self.samples = {stage: [] for stage in TIMING_STAGES}
+        self.rows = {}  # linha -> {"label", "stages", "success"}
+        self.trace_events = []
+        self.dropped_events = 0
+        self._thread_names = {}
+        self._local = threading.local()
+
+    def _trace(self, name, category, started, duration, args):
+        """Acrescenta um evento completo ("X") à linha do tempo; chamar com o lock"""
+        if len(self.trace_events) >= MAX_TRACE_EVENTS:
+            self.dropped_events += 1
+            return
+        tid = threading.get_ident()
+        if tid not in self._thread_names:
+            self._thread_names[tid] = threading.current_thread().name
+        self.trace_events.append(
+            {
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round((started - self.started) * 1e6),
+                "dur": round(duration * 1e6),
+                "tid": tid,
+                "args": args,
+            }
+        )
+
+    def begin_row(self, row, label=""):
+        """Atribui as próximas medições desta thread à linha informada"""
+        self._local.row = row
+        self._local.row_started = time.monotonic()
+        with self.lock:
+            self.rows.setdefault(row, {"label": label, "stages": {}, "success": None})
+
+    def end_row(self):
+        row = getattr(self._local, "row", None)
+        if row is None:
+            return
+        self._local.row = None
+        finished = time.monotonic()
+        started = self._local.row_started
+        with self.lock:
+            info = self.rows.get(row, {})
+            self._trace(
+                f"Item {row}",
+                "row",
+                started,
+                finished - started,
+                {"label": info.get("label", "")},
+            )
+
+    def record(self, stage, seconds):
+        """Registra a duração de uma etapa na linha atual da thread"""
+        if seconds is None:
+            return
+        row = getattr(self._local, "row", None)
+        finished = time.monotonic()
+        with self.lock:
+            self._trace(
+                TIMING_LABELS.get(stage, stage),
+                stage,
+                finished - seconds,
+                seconds,
+                {"row": row},
+            )
+            self.samples.setdefault(stage, []).append(seconds)
+            STAGE_SECONDS.observe(seconds, stage=stage)
+            if row is not None and row in self.rows:
+                stages = self.rows[row]["stages"]
+                stages[stage] = stages.get(stage, 0.0) + seconds
+
+    @contextlib.contextmanager
+    def measure(self, stage):
+        """Mede o bloco como uma etapa (também quando ele termina com erro)"""
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.record(stage, time.monotonic() - started)
+
+    def finish_row(self, row, success):
+        with self.lock:
+            if row in self.rows:
+                self.rows[row]["success"] = bool(success)
+
+    def report(self):
+        """Dicionário com a distribuição por etapa, itens/min e linhas mais lentas"""
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            finished = [r for r in self.rows.values() if r["success"] is not None]
+
+            stages = {}
+            for stage, values in self.samples.items():
+                if not values:
+                    continue
+                stages[stage] = {
+                    "count": len(values),
+                    "total": round(sum(values), 3),
+                    "p50": round(percentile(values, 50), 3),
+                    "p95": round(percentile(values, 95), 3),
+                    "p99": round(percentile(values, 99), 3),
+                    "max": round(max(values), 3),
+                }
+
+            slowest = sorted(
+                self.rows.items(),
+                key=lambda item: sum(item[1]["stages"].values()),
+                reverse=True,
+            )[:SLOWEST_ROWS]
+
+            return {
+                "started_at": self.started_at.isoformat(timespec="seconds"),
+                "duration": round(elapsed, 1),
+                "rows_finished": len(finished),
+                "rows_succeeded": sum(1 for r in finished if r["success"]),
+                "rows_per_minute": round(len(finished) * 60.0 / elapsed, 2)
+                if elapsed > 0
+                else 0.0,
+                "stages": stages,
+                "slowest_rows": [
+                    {
+                        "row": row,
+                        "label": info["label"],
+                        "total": round(sum(info["stages"].values()), 3),
+                        "success": info["success"],
+                        "stages": {k: round(v, 3) for k, v in info["stages"].items()},
+                    }
+                    for row, info in slowest
+                    if info["stages"]
+                ],
+            }
+
+    def save(self, directory):
+        """Grava o relatório em JSON no diretório informado; retorna o caminho ou None"""
+        report = self.report()
+        filename = f"desempenho_{self.started_at.strftime('%Y%m%d_%H%M%S')}.json"
+        path = os.path.join(directory, filename)
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Não foi possível salvar o relatório de desempenho: {e}")
+            return None
+        return path
+
+    def save_trace(self, directory):
+        """Grava a linha do tempo (Chrome Trace Event Format); retorna o caminho ou None"""
+        pid = os.getpid()
+        with self.lock:
+            events = [
+                {
+                    "name": "process_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "args": {"name": "Emissão de DUAs"},
+                }
+            ]
+            events.extend(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"name": name},
+                }
+                for tid, name in self._thread_names.items()
+            )
+            events.extend(dict(event, pid=pid) for event in self.trace_events)
+            dropped = self.dropped_events
+
+        filename = f"trace_{self.started_at.strftime('%Y%m%d_%H%M%S')}.json"
+        path = os.path.join(directory, filename)
+        temp_path = f"{path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "traceEvents": events,
+                        "displayTimeUnit": "ms",
+                        "otherData": {
+                            "started_at": self.started_at.isoformat(timespec="seconds"),
+                            "dropped_events": dropped,
+                        },
+                    },
+                    f,
+                    ensure_ascii=False,
+                )
+            os.replace(temp_path, path)
+        except OSError as e:
+            print(f"Não foi possível salvar a linha do tempo: {e}")
+            return None
+        return path
+
+    def format_report(self, report=None, slowest=3):
+        """Linhas de texto com o resumo do relatório"""
+        report = report or self.report()
+        lines = [
+            f"Desempenho: {report['rows_finished']} item(ns) em "
+            f"{report['duration'] / 60:.1f} min ({report['rows_per_minute']:.1f} itens/min)"
+        ]
+        for stage in TIMING_STAGES:
+            stats = report["stages"].get(stage)
+            if stats:
+                lines.append(
+                    f"   {TIMING_LABELS[stage]}: p50 {stats['p50']:.1f}s, "
+                    f"p95 {stats['p95']:.1f}s, p99 {stats['p99']:.1f}s ({stats['count']}x)"
+                )
+        for row in report["slowest_rows"][:slowest]:
+            worst = max(row["stages"], key=row["stages"].get)
+            lines.append(
+                f"   Item lento {row['row']}: {row['total']:.1f}s "
+                f"({TIMING_LABELS.get(worst, worst)} {row['stages'][worst]:.1f}s)"
+            )
+        return lines
@@ -99,8 +99,9 @@ if __name__ == "__main__":
     # Try to ensure xcb plugin is available by setting paths
     os.environ["QT_DEBUG_PLUGINS"] = "1"  # Enable plugin debugging
 
-    # Verificar instalação do Chrome
-    if not check_chrome_installed():
+    # Verificar instalação do Chrome (a medição de abertura do build.py pula
+    # esta etapa, que pode abrir um diálogo)
+    if not os.environ.get("DUA_STARTUP_PROBE") and not check_chrome_installed():
         print("Aplicação terminada: Chrome não encontrado.")
         sys.exit(1)
 
@@ -128,6 +129,20 @@ if __name__ == "__main__":
         window.show()
         print("Application started successfully")
 
+        # Medição de abertura (build.py --compare): registra quando a janela
+        # apareceu e encerra sem gravar configurações
+        startup_probe = os.environ.get("DUA_STARTUP_PROBE")
+        if startup_probe:
+            import time
+            from PyQt6.QtCore import QTimer
+
+            def report_startup():
+                with open(startup_probe, "w") as f:
+                    f.write(repr(time.time()))
+                os._exit(0)
+
+            QTimer.singleShot(0, report_startup)
+
         # Add a startup message to the log
         window.log_text.append_log(LogMessage("Aplicação iniciada com sucesso.", 1))
 
@@ -0,0 +1,166 @@
+"""
+Catálogo de serviços do formulário de DUA
+
+A lista do campo `idServico` é lida do portal com uma única chamada de script,
+uma vez por execução, e guardada em disco com validade (TTL) para ser usada
+antes de o navegador abrir. As consultas por código, valor ou texto são feitas
+em dicionários, sem percorrer as opções pelo WebDriver.
+Quando um valor do cache não existe mais na página, a lista é lida de novo.
+O mapeamento fixo só vale para valores que o portal ainda oferece (ou enquanto
+não há lista): um serviço que saiu da lista não é resolvido.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import unicodedata
+
+from app_paths import get_data_directory
+
+CATALOG_FILENAME = "service_catalog.json"
+
+# Validade da lista salva em disco
+CATALOG_TTL = 24 * 60 * 60
+
+# Lê todas as opções do campo de serviço de uma vez: [[valor, texto], ...]
+SCRAPE_OPTIONS_SCRIPT = """
+var select = document.querySelector('select[name="idServico"]');
+if (!select) { return null; }
+var options = [];
+for (var i = 0; i < select.options.length; i++) {
+    var option = select.options[i];
+    if (option.value) { options.push([option.value, option.text.trim()]); }
+}
+return options;
+"""
+
+# Código da receita no texto da opção (ex.: "138-4 - ICMS ...")
+CODE_PATTERN = re.compile(r"\b(\d{3}-\d)\b")
+
+
+def _normalize(text):
+    text = unicodedata.normalize("NFKD", str(text).strip().lower())
+    return " ".join("".join(c for c in text if not unicodedata.combining(c)).split())
+
+
+class ServiceCatalog:
+    """Mapeamento código/texto -> valor do dropdown, persistido com TTL"""
+
+    def __init__(self, fallback=None, path=None, ttl=CATALOG_TTL):
+        self.fallback = dict(fallback or {})
+        self.path = path or os.path.join(get_data_directory(), CATALOG_FILENAME)
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.options = []
+        self.fingerprint = None
+        self.fetched_at = 0
+        # A lista é conferida no portal uma vez por execução do programa
+        self.checked_this_run = False
+        self._by_value = {}
+        self._by_code = {}
+        self._by_text = {}
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                stored = json.load(f)
+            self._index(stored["options"], stored["fetched_at"])
+        except (OSError, ValueError, KeyError):
+            self._index([], 0)
+
+    def _save(self):
+        temp_path = f"{self.path}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "fetched_at": self.fetched_at,
+                        "fingerprint": self.fingerprint,
+                        "options": self.options,
+                    },
+                    f,
+                    ensure_ascii=False,
+                    indent=2,
+                )
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Não foi possível salvar o catálogo de serviços: {e}")
+
+    def _index(self, options, fetched_at):
+        self.options = [list(option) for option in options]
+        self.fetched_at = fetched_at
+        self.fingerprint = hashlib.sha256(
+            json.dumps(self.options, ensure_ascii=False).encode("utf-8")
+        ).hexdigest()
+        self._by_value = {value: value for value, _ in self.options}
+        self._by_text = {_normalize(text): value for value, text in self.options}
+        self._by_code = {}
+        for value, text in self.options:
+            match = CODE_PATTERN.search(text)
+            if match:
+                self._by_code.setdefault(match.group(1), value)
+
+    def is_stale(self):
+        return not self.options or time.time() - self.fetched_at > self.ttl
+
+    def refresh(self, driver, force=False):
+        """Lê a lista do portal na primeira vez da execução, se o cache venceu ou se force=True"""
+        with self.lock:
+            if not force and self.checked_this_run and not self.is_stale():
+                return False
+
+            options = driver.execute_script(SCRAPE_OPTIONS_SCRIPT)
+            if not options:
+                print("Campo de serviço não encontrado; mantendo o catálogo atual")
+                return False
+
+            self.checked_this_run = True
+            previous = self.fingerprint if self.options else None
+            self._index(options, time.time())
+            if previous and previous != self.fingerprint:
+                print("A lista de serviços do portal mudou; catálogo atualizado")
+            print(f"Catálogo de serviços carregado do portal: {len(options)} opção(ões)")
+            self._save()
+            return True
+
+    def resolve(self, servico):
+        """Valor do dropdown para o código, valor ou texto informado, ou None"""
+        servico = str(servico).strip()
+        with self.lock:
+            if servico in self._by_value:
+                return servico
+            if servico in self._by_code:
+                return self._by_code[servico]
+            value = self.fallback.get(servico)
+            if value is not None and (not self.options or value in self._by_value):
+                return value
+            return self._by_text.get(_normalize(servico))
+
+    def mapping(self):
+        """Código -> valor, combinando o mapeamento fixo com o catálogo do portal"""
+        with self.lock:
+            combined = {
+                code: value
+                for code, value in self.fallback.items()
+                if not self.options or value in self._by_value
+            }
+            combined.update(self._by_code)
+            combined.update(self._by_value)
+            return combined
+
+
+_service_catalog = None
+_service_catalog_lock = threading.Lock()
+
+
+def get_service_catalog(fallback=None):
+    """Instância compartilhada do catálogo de serviços"""
+    global _service_catalog
+    with _service_catalog_lock:
+        if _service_catalog is None:
+            _service_catalog = ServiceCatalog(fallback)
+        return _service_catalog
@@ -0,0 +1,320 @@
+"""
+Gravação de sessões do navegador para reprodução offline
+
+Durante uma execução real, grava as trocas HTTP com o portal (lidas do log de
+desempenho do Chrome) e o DOM de cada etapa num arquivo .zip. CPF/CNPJ são
+trocados por pseudônimos válidos e consistentes dentro do arquivo; cookies
+não são gravados. O arquivo é servido depois por session_replay.py.
+
+Formato do arquivo:
+    manifest.json      versão, origem do portal, início e contagens
+    exchanges.jsonl    uma troca HTTP por linha (tempo, método, URL, status...)
+    snapshots.jsonl    um DOM por linha (etapa, URL, arquivo)
+    bodies/NNNNNN      corpo das respostas
+    snapshots/NNNNNN.html
+"""
+
+import base64
+import hashlib
+import hmac
+import json
+import os
+import re
+import secrets
+import threading
+import time
+import zipfile
+from datetime import datetime
+from urllib.parse import urlparse
+
+from app_paths import get_data_directory
+
+ARCHIVE_VERSION = 1
+
+# Recursos que não influenciam o fluxo (não são gravados)
+SKIPPED_TYPES = {"Image", "Media", "Font", "Ping", "CSPViolationReport", "Manifest"}
+
+# Cabeçalhos de resposta preservados (cookies e afins ficam de fora)
+KEPT_HEADERS = {"content-type", "location", "content-disposition"}
+
+# CNPJ/CPF formatados (sempre anonimizados) ou só dígitos (se forem válidos)
+DOCUMENT_PATTERN = re.compile(
+    r"(?<!\d)(?:\d{2}\.\d{3}\.\d{3}(?:/|%2F)\d{4}-\d{2}|\d{3}\.\d{3}\.\d{3}-\d{2}|\d{14}|\d{11})(?!\d)",
+    re.IGNORECASE,
+)
+
+
+def get_recordings_directory():
+    return os.path.join(get_data_directory(), "gravacoes")
+
+
+def _check_digit(digits, weights):
+    remainder = sum(d * w for d, w in zip(digits, weights)) % 11
+    return 0 if remainder < 2 else 11 - remainder
+
+
+CPF_WEIGHTS = (range(10, 1, -1), range(11, 1, -1))
+CNPJ_WEIGHTS = (
+    (5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2),
+    (6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2),
+)
+
+
+def document_valid(digits):
+    """CPF (11 dígitos) ou CNPJ (14 dígitos) com dígitos verificadores corretos"""
+    weights = CPF_WEIGHTS if len(digits) == 11 else CNPJ_WEIGHTS
+    if len(digits) not in (11, 14) or len(set(digits)) == 1:
+        return False
+    numbers = [int(c) for c in digits]
+    base = len(digits) - 2
+    return numbers[base] == _check_digit(numbers[:base], weights[0]) and numbers[
+        base + 1
+    ] == _check_digit(numbers[: base + 1], weights[1])
+
+
+class Anonymizer:
+    """Troca CPF/CNPJ por pseudônimos válidos, estáveis dentro de uma gravação
+
+    A chave é aleatória e não é gravada: não dá para voltar ao documento original.
+    """
+
+    def __init__(self, key=None):
+        self.key = key or secrets.token_bytes(32)
+        self.known = set()
+        self.pseudonyms = {}
+        self.lock = threading.Lock()
+
+    def add(self, document):
+        """Documento da linha atual: anonimizado mesmo se os dígitos forem inválidos"""
+        digits = re.sub(r"\D", "", str(document or ""))
+        if len(digits) in (11, 14):
+            with self.lock:
+                self.known.add(digits)
+
+    def pseudonym(self, digits):
+        with self.lock:
+            cached = self.pseudonyms.get(digits)
+        if cached:
+            return cached
+        digest = hmac.new(self.key, digits.encode(), hashlib.sha256).digest()
+        base = len(digits) - 2
+        numbers = [b % 10 for b in digest[:base]]
+        if len(digits) == 14:
+            numbers[8:12] = [0, 0, 0, 1]  # matriz, como a maioria dos CNPJs
+            weights = CNPJ_WEIGHTS
+        else:
+            weights = CPF_WEIGHTS
+        numbers.append(_check_digit(numbers, weights[0]))
+        numbers.append(_check_digit(numbers, weights[1]))
+        result = "".join(map(str, numbers))
+        with self.lock:
+            self.pseudonyms[digits] = result
+        return result
+
+    def _replace(self, match):
+        original = match.group(0)
+        # Barra codificada em URLs (%2F) não conta como dígito
+        text = re.sub("%2F", "/", original, flags=re.IGNORECASE)
+        digits = re.sub(r"\D", "", text)
+        formatted = len(digits) != len(text)
+        with self.lock:
+            known = digits in self.known
+        if not (formatted or known or document_valid(digits)):
+            return original
+        replacement = iter(self.pseudonym(digits))
+        # Mantém a formatação original (pontos, barra, hífen)
+        result = "".join(next(replacement) if c.isdigit() else c for c in text)
+        return result.replace("/", "%2F") if text != original else result
+
+    def text(self, value):
+        if not value:
+            return value
+        return DOCUMENT_PATTERN.sub(self._replace, value)
+
+    def content(self, value):
+        # Dígitos são ASCII em qualquer codificação usada pelo portal
+        if not value:
+            return value
+        return self.text(value.decode("latin-1")).encode("latin-1")
+
+
+class SessionRecorder:
+    """Grava trocas HTTP e DOM das sessões de todas as threads num único .zip
+
+    Args:
+        directory: pasta de destino (padrão: dados_aplicacao/gravacoes)
+        portal_url: origem do portal; só requisições para ela são gravadas
+    """
+
+    def __init__(self, portal_url, directory=None):
+        directory = directory or get_recordings_directory()
+        os.makedirs(directory, exist_ok=True)
+        self.path = os.path.join(
+            directory, f"gravacao_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        )
+        portal = urlparse(portal_url)
+        self.origin = f"{portal.scheme}://{portal.netloc}"
+        self.anonymizer = Anonymizer()
+        self.started = time.time()
+        self.lock = threading.Lock()
+        self.archive = zipfile.ZipFile(self.path, "w", zipfile.ZIP_DEFLATED)
+        self.exchanges = []
+        self.snapshots = []
+        self.pending = {}  # (driver, requestId) -> requisição em andamento
+        self.sequence = 0
+
+    def _next(self):
+        self.sequence += 1
+        return self.sequence
+
+    def capture(self, driver, stage, cpf_cnpj=None):
+        """Grava o tráfego desde a última captura e o DOM atual do navegador"""
+        self.anonymizer.add(cpf_cnpj)
+        try:
+            self._collect_network(driver)
+        except Exception as e:
+            print(f"Gravação: não foi possível ler o tráfego do navegador: {e}")
+        try:
+            self._snapshot(driver, stage)
+        except Exception as e:
+            print(f"Gravação: não foi possível gravar a página ({stage}): {e}")
+
+    def _relative_url(self, url):
+        """Caminho + query da URL, ou None se não for do portal"""
+        if not url.startswith(self.origin + "/") and url != self.origin:
+            return None
+        return self.anonymizer.text(url[len(self.origin) :] or "/")
+
+    def _collect_network(self, driver):
+        entries = driver.get_log("performance")
+        thread = threading.current_thread().name
+        for entry in entries:
+            message = json.loads(entry["message"])["message"]
+            method = message.get("method", "")
+            params = message.get("params", {})
+            key = (id(driver), params.get("requestId"))
+
+            if method == "Network.requestWillBeSent":
+                if "redirectResponse" in params and key in self.pending:
+                    # Redirecionamento: a requisição anterior termina aqui
+                    previous = self.pending.pop(key)
+                    previous["response"] = params["redirectResponse"]
+                    self._store(driver, previous, params["timestamp"], thread, body=False)
+                url = self._relative_url(params["request"]["url"])
+                if url is None or params.get("type") in SKIPPED_TYPES:
+                    continue
+                self.pending[key] = {
+                    "requestId": params["requestId"],
+                    "url": url,
+                    "method": params["request"]["method"],
+                    "post_data": self.anonymizer.text(params["request"].get("postData")),
+                    "type": params.get("type"),
+                    "wall_time": params.get("wallTime", time.time()),
+                    "timestamp": params["timestamp"],
+                }
+            elif method == "Network.responseReceived" and key in self.pending:
+                self.pending[key]["response"] = params["response"]
+            elif method == "Network.loadingFinished" and key in self.pending:
+                self._store(driver, self.pending.pop(key), params["timestamp"], thread)
+            elif method == "Network.loadingFailed":
+                self.pending.pop(key, None)
+
+    def _store(self, driver, request, finished, thread, body=True):
+        response = request.get("response", {})
+        headers = {
+            name.lower(): self.anonymizer.text(value)
+            for name, value in (response.get("headers") or {}).items()
+            if name.lower() in KEPT_HEADERS
+        }
+        if "location" in headers and headers["location"].startswith(self.origin):
+            headers["location"] = headers["location"][len(self.origin) :]
+
+        content = None
+        if body:
+            try:
+                result = driver.execute_cdp_cmd(
+                    "Network.getResponseBody", {"requestId": request["requestId"]}
+                )
+                if result.get("base64Encoded"):
+                    content = base64.b64decode(result["body"])
+                else:
+                    content = result["body"].encode("utf-8")
+            except Exception:
+                content = None  # corpo já descartado pelo Chrome
+
+        with self.lock:
+            sequence = self._next()
+            body_file = None
+            if content is not None:
+                body_file = f"bodies/{sequence:06d}"
+                self.archive.writestr(body_file, self.anonymizer.content(content))
+            self.exchanges.append(
+                {
+                    "seq": sequence,
+                    "offset": round(request["wall_time"] - self.started, 3),
+                    "duration": round(max(0.0, finished - request["timestamp"]), 3),
+                    "method": request["method"],
+                    "url": request["url"],
+                    "type": request["type"],
+                    "status": response.get("status", 200),
+                    "headers": headers,
+                    "post_data": request["post_data"],
+                    "body": body_file,
+                    "thread": thread,
+                }
+            )
+
+    def _snapshot(self, driver, stage):
+        url = self._relative_url(driver.current_url) or driver.current_url
+        html = self.anonymizer.text(driver.page_source)
+        with self.lock:
+            sequence = self._next()
+            snapshot_file = f"snapshots/{sequence:06d}.html"
+            self.archive.writestr(snapshot_file, html.encode("utf-8"))
+            self.snapshots.append(
+                {
+                    "seq": sequence,
+                    "offset": round(time.time() - self.started, 3),
+                    "stage": stage,
+                    "url": url,
+                    "title": self.anonymizer.text(driver.title),
+                    "file": snapshot_file,
+                    "thread": threading.current_thread().name,
+                }
+            )
+
+    def close(self):
+        """Fecha o arquivo (grava índice e manifesto)
+
+        Returns:
+            str: caminho do arquivo gravado
+        """
+        with self.lock:
+            if self.archive is None:
+                return self.path
+            self.archive.writestr(
+                "exchanges.jsonl",
+                "".join(json.dumps(e, ensure_ascii=False) + "\n" for e in self.exchanges),
+            )
+            self.archive.writestr(
+                "snapshots.jsonl",
+                "".join(json.dumps(s, ensure_ascii=False) + "\n" for s in self.snapshots),
+            )
+            manifest = {
+                "version": ARCHIVE_VERSION,
+                "origin": self.origin,
+                "started": datetime.fromtimestamp(self.started).isoformat(
+                    timespec="seconds"
+                ),
+                "duration": round(time.time() - self.started, 3),
+                "exchanges": len(self.exchanges),
+                "snapshots": len(self.snapshots),
+            }
+            self.archive.writestr("manifest.json", json.dumps(manifest, indent=2))
+            self.archive.close()
+            self.archive = None
+        print(
+            f"Sessão gravada em {self.path} ({manifest['exchanges']} requisições, "
+            f"{manifest['snapshots']} páginas)"
+        )
+        return self.path
@@ -0,0 +1,281 @@
+"""
+Reprodução offline de sessões gravadas por session_recorder.py
+
+Serve as respostas gravadas do portal num servidor local, com o tempo de
+resposta original (--speed 1), acelerado (--speed 4 = 4x mais rápido) ou
+sem espera (--speed 0). Requisições repetidas (várias linhas) recebem as
+respostas gravadas em sequência, em rodízio. O reCAPTCHA real é trocado pelo
+widget do portal simulado (mock_portal.py), que resolve sem rede.
+
+Uso:
+    python session_replay.py dados_aplicacao/gravacoes/gravacao_X.zip --speed 4
+    DUA_PORTAL_URL=http://127.0.0.1:8765 python run_ui.py
+"""
+
+import argparse
+import json
+import re
+import time
+import zipfile
+from collections import defaultdict
+from urllib.parse import urlparse
+
+from mock_portal import (
+    CAPTCHA_MODES,
+    RECAPTCHA_SCRIPT,
+    RECAPTCHA_WIDGET,
+    MockPortal,
+    _MockPortalHandler,
+)
+from session_recorder import ARCHIVE_VERSION
+
+RECAPTCHA_DIV = re.compile(
+    rb"<div[^>]*class=[\"'][^\"']*g-recaptcha[^\"']*[\"'][^>]*>.*?</div>",
+    re.IGNORECASE | re.DOTALL,
+)
+RECAPTCHA_API = re.compile(
+    rb"<script[^>]*(?:google\.com|recaptcha\.net)/recaptcha/[^>]*>\s*</script>",
+    re.IGNORECASE,
+)
+CALLBACK_ATTRIBUTE = re.compile(rb"data-callback=[\"']([A-Za-z_$][\w$]*)")
+HEAD_TAG = re.compile(rb"<head[^>]*>", re.IGNORECASE)
+
+# Funções do reCAPTCHA que páginas reais costumam chamar
+GRECAPTCHA_STUBS = """window.grecaptcha = window.grecaptcha || {};
+['reset', 'render', 'execute', 'ready'].forEach(function (name) {
+  window.grecaptcha[name] = window.grecaptcha[name] || function (callback) {
+    if (name === 'ready' && typeof callback === 'function') { callback(); }
+  };
+});
+"""
+
+
+def _read_jsonl(archive, name):
+    return [json.loads(line) for line in archive.read(name).decode("utf-8").splitlines() if line]
+
+
+class SessionArchive:
+    """Conteúdo de um arquivo de gravação, carregado em memória"""
+
+    def __init__(self, path):
+        self.path = path
+        with zipfile.ZipFile(path) as archive:
+            self.manifest = json.loads(archive.read("manifest.json"))
+            if self.manifest.get("version", 0) > ARCHIVE_VERSION:
+                raise ValueError(
+                    f"Gravação em formato mais novo ({self.manifest['version']}) que o suportado"
+                )
+            self.exchanges = _read_jsonl(archive, "exchanges.jsonl")
+            self.snapshots = _read_jsonl(archive, "snapshots.jsonl")
+            names = [e["body"] for e in self.exchanges if e.get("body")]
+            names += [s["file"] for s in self.snapshots]
+            self.files = {name: archive.read(name) for name in names}
+
+    @property
+    def origin(self):
+        return self.manifest["origin"]
+
+    def content(self, name):
+        return self.files.get(name) if name else None
+
+
+class ReplayPortal(MockPortal):
+    """Servidor local que responde com uma sessão gravada
+
+    Args:
+        archive: caminho do .zip ou SessionArchive já carregado
+        speed: divisor dos tempos de resposta gravados (0 = sem espera)
+        captcha, captcha_fail_rate, seed: comportamento do reCAPTCHA simulado
+    """
+
+    def __init__(
+        self,
+        archive,
+        speed=1.0,
+        host="127.0.0.1",
+        port=0,
+        captcha="checkbox",
+        captcha_fail_rate=0.0,
+        seed=None,
+    ):
+        if not isinstance(archive, SessionArchive):
+            archive = SessionArchive(archive)
+        self.archive = archive
+        self.speed = speed
+        super().__init__(
+            host=host,
+            port=port,
+            captcha=captcha,
+            captcha_fail_rate=captcha_fail_rate,
+            seed=seed,
+        )
+        self.stats.update({"replayed": 0, "snapshots_served": 0, "missing": 0})
+
+        # Índices por URL completa e só pelo caminho (query diferente da gravada)
+        self.by_url = defaultdict(list)
+        self.by_path = defaultdict(list)
+        for exchange in archive.exchanges:
+            url = exchange["url"]
+            self.by_url[(exchange["method"], url)].append(exchange)
+            self.by_path[(exchange["method"], url.split("?", 1)[0])].append(exchange)
+        self.snapshots_by_url = {}
+        for snapshot in archive.snapshots:
+            self.snapshots_by_url.setdefault(snapshot["url"], snapshot)
+            self.snapshots_by_url.setdefault(snapshot["url"].split("?", 1)[0], snapshot)
+        self.cursors = {}
+
+    def handler_class(self):
+        return _ReplayHandler
+
+    def next_exchange(self, method, url):
+        """Próxima resposta gravada para a requisição (rodízio), ou None"""
+        for key, index in (
+            ((method, url), self.by_url),
+            ((method, url.split("?", 1)[0]), self.by_path),
+        ):
+            candidates = index.get(key)
+            if candidates:
+                with self.lock:
+                    position = self.cursors.get(key, 0)
+                    self.cursors[key] = position + 1
+                return candidates[position % len(candidates)]
+        return None
+
+    def snapshot_for(self, url):
+        return self.snapshots_by_url.get(url) or self.snapshots_by_url.get(
+            url.split("?", 1)[0]
+        )
+
+    def wait(self, exchange):
+        if self.speed > 0 and exchange.get("duration"):
+            time.sleep(exchange["duration"] / self.speed)
+
+    def patch_page(self, body):
+        """Aponta links para este servidor e troca o reCAPTCHA pelo simulado"""
+        body = body.replace(self.archive.origin.encode(), self.base_url.encode())
+        match = RECAPTCHA_DIV.search(body)
+        if match is None:
+            return body
+
+        script = GRECAPTCHA_STUBS + RECAPTCHA_SCRIPT
+        callback = CALLBACK_ATTRIBUTE.search(match.group(0))
+        if callback:
+            # Encaminha o token para o callback original da página
+            name = callback.group(1).decode()
+            script += (
+                "window.mockRecaptchaCallback = function (token) {\n"
+                f"  if (typeof window['{name}'] === 'function') {{ window['{name}'](token); }}\n"
+                "};\n"
+            )
+        body = body[: match.start()] + RECAPTCHA_WIDGET.encode() + body[match.end() :]
+        body = RECAPTCHA_API.sub(b"", body)
+
+        # Definido antes dos scripts da página, que podem usar grecaptcha ao carregar
+        script_tag = f"<script>\n{script}</script>".encode()
+        head = HEAD_TAG.search(body)
+        if head:
+            return body[: head.end()] + script_tag + body[head.end() :]
+        return script_tag + body
+
+
+class _ReplayHandler(_MockPortalHandler):
+    def do_GET(self):
+        if self._is_mock_route():
+            super().do_GET()
+        else:
+            self._replay("GET")
+
+    def do_POST(self):
+        if self._is_mock_route():
+            super().do_POST()
+        else:
+            self._read_body()
+            self._replay("POST")
+
+    def _is_mock_route(self):
+        path = urlparse(self.path).path
+        return path.startswith("/mock-recaptcha/") or path == "/mock/stats"
+
+    def _send_recorded(self, status, body, headers):
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _replay(self, method):
+        portal = self.portal
+        exchange = portal.next_exchange(method, self.path)
+        snapshot = portal.snapshot_for(self.path) if method == "GET" else None
+
+        if exchange is None:
+            if snapshot is None:
+                portal.count("missing")
+                self._send(404, "<h1>Não gravado</h1>")
+                return
+            portal.count("snapshots_served")
+            body = portal.archive.content(snapshot["file"])
+            self._send(200, portal.patch_page(body))
+            return
+
+        portal.count("replayed")
+        portal.wait(exchange)
+        headers = dict(exchange.get("headers") or {})
+        body = portal.archive.content(exchange.get("body"))
+        if body is None and snapshot is not None and exchange["type"] == "Document":
+            # Corpo não capturado: usa o DOM gravado da mesma página
+            body = portal.archive.content(snapshot["file"])
+            headers["content-type"] = "text/html; charset=utf-8"
+        body = body or b""
+        if "html" in headers.get("content-type", ""):
+            body = portal.patch_page(body)
+        location = headers.get("location", "")
+        if location.startswith(portal.archive.origin):
+            headers["location"] = location[len(portal.archive.origin) :]
+        self._send_recorded(exchange.get("status") or 200, body, headers)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprodução offline de uma sessão gravada")
+    parser.add_argument("archive", help="arquivo .zip gravado (dados_aplicacao/gravacoes)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument(
+        "--speed",
+        type=float,
+        default=1.0,
+        help="1 = tempo gravado, 4 = 4x mais rápido, 0 = sem espera",
+    )
+    parser.add_argument("--captcha", choices=CAPTCHA_MODES, default="checkbox")
+    parser.add_argument("--captcha-fail-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    portal = ReplayPortal(
+        args.archive,
+        speed=args.speed,
+        host=args.host,
+        port=args.port,
+        captcha=args.captcha,
+        captcha_fail_rate=args.captcha_fail_rate,
+        seed=args.seed,
+    )
+    manifest = portal.archive.manifest
+    print(
+        f"Reproduzindo {args.archive}: {manifest['exchanges']} requisições e "
+        f"{manifest['snapshots']} páginas gravadas em {manifest['started']}"
+    )
+    print(f"Use DUA_PORTAL_URL={portal.base_url} para apontar a automação para ele")
+    try:
+        portal.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        portal.server.server_close()
+        print(f"Estatísticas: {json.dumps(portal.stats)}")
+
+
+if __name__ == "__main__":
+    main()
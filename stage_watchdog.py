@@ -0,0 +1,149 @@
+"""
+Watchdog de etapas travadas
+
+Cada linha passa pelas etapas navigate, fill, captcha, submit, render e write.
+Uma thread de supervisão confere o prazo da etapa em andamento; quando ele
+estoura, o navegador da sessão é encerrado à força (a chamada WebDriver
+pendente falha na hora), a ocorrência é registrada e a etapa termina com
+StageTimeout para que a linha seja contada como falha e a sessão reciclada.
+
+Encerrar o navegador só interrompe chamadas WebDriver. As chamadas de rede da
+etapa captcha feitas fora do navegador (download do áudio e transcrição) têm
+prazos próprios no RecaptchaSolver; o limite da etapa é o prazo configurado
+somado ao dessas chamadas em andamento.
+"""
+
+import contextlib
+import json
+import os
+import threading
+import time
+
+from app_paths import get_data_directory
+
+OVERRUNS_FILENAME = "stage_overruns.jsonl"
+
+STAGES = ("navigate", "fill", "captcha", "submit", "render", "write")
+
+# Prazos padrão por etapa, em segundos
+DEFAULT_DEADLINES = {
+    "navigate": 60,
+    "fill": 30,
+    "captcha": 180,
+    "submit": 60,
+    "render": 60,
+    "write": 30,
+}
+
+STAGE_LABELS = {
+    "navigate": "Abrir formulário",
+    "fill": "Preencher campos",
+    "captcha": "Resolver CAPTCHA",
+    "submit": "Enviar e gerar DUA",
+    "render": "Gerar PDF",
+    "write": "Salvar PDF",
+}
+
+
+class StageTimeout(Exception):
+    """Uma etapa passou do prazo e foi abortada pelo watchdog"""
+
+    def __init__(self, stage, limit, elapsed):
+        super().__init__(
+            f"Etapa '{stage}' excedeu o prazo de {limit:g}s ({elapsed:.1f}s)"
+        )
+        self.stage = stage
+        self.limit = limit
+        self.elapsed = elapsed
+
+
+class StageWatchdog(threading.Thread):
+    """Supervisiona o prazo da etapa em andamento de cada thread de processamento"""
+
+    def __init__(self, on_overrun, deadlines=None, check_interval=0.5, log_path=None):
+        super().__init__(daemon=True, name="StageWatchdog")
+        # on_overrun(stage, thread_id) deve desbloquear a thread presa (ex.: matar o navegador)
+        self.on_overrun = on_overrun
+        self.deadlines = dict(DEFAULT_DEADLINES)
+        self.deadlines.update(deadlines or {})
+        self.check_interval = check_interval
+        self.log_path = log_path or os.path.join(get_data_directory(), OVERRUNS_FILENAME)
+        self.overruns = []
+        self._active = {}  # thread id -> etapa em andamento
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Executa o bloco sob o prazo da etapa; levanta StageTimeout se ele estourar"""
+        limit = self.deadlines.get(name)
+        if not limit:
+            yield
+            return
+
+        thread_id = threading.get_ident()
+        entry = {
+            "thread_id": thread_id,
+            "stage": name,
+            "started": time.monotonic(),
+            "limit": limit,
+            "fired": False,
+        }
+        with self._lock:
+            self._active[thread_id] = entry
+        try:
+            yield
+        except Exception as e:
+            if entry["fired"]:
+                # A falha é consequência do navegador encerrado pelo watchdog
+                raise StageTimeout(
+                    name, limit, time.monotonic() - entry["started"]
+                ) from e
+            raise
+        finally:
+            with self._lock:
+                self._active.pop(thread_id, None)
+
+        if entry["fired"]:
+            raise StageTimeout(name, limit, time.monotonic() - entry["started"])
+
+    def run(self):
+        while not self._stop_event.wait(self.check_interval):
+            now = time.monotonic()
+            with self._lock:
+                overdue = [
+                    entry
+                    for entry in self._active.values()
+                    if not entry["fired"] and now - entry["started"] > entry["limit"]
+                ]
+                for entry in overdue:
+                    entry["fired"] = True
+
+            for entry in overdue:
+                self._fire(entry, now - entry["started"])
+
+    def _fire(self, entry, elapsed):
+        print(
+            f"Watchdog: etapa '{entry['stage']}' travada há {elapsed:.1f}s "
+            f"(prazo {entry['limit']}s); encerrando o navegador"
+        )
+        record = {
+            "timestamp": time.time(),
+            "stage": entry["stage"],
+            "limit": entry["limit"],
+            "elapsed": round(elapsed, 1),
+        }
+        self.overruns.append(record)
+        try:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+        except OSError as e:
+            print(f"Não foi possível registrar a etapa travada: {e}")
+
+        try:
+            self.on_overrun(entry["stage"], entry["thread_id"])
+        except Exception as e:
+            print(f"Watchdog: falha ao abortar a etapa travada: {e}")
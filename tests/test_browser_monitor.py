@@ -0,0 +1,21 @@
+import os
+
+import browser_monitor
+from browser_monitor import BrowserSupervisor
+
+
+def test_samples_and_metrics_file_are_bounded(tmp_path, monkeypatch):
+    monkeypatch.setattr(browser_monitor, "METRICS_MAX_BYTES", 2000)
+    monkeypatch.setattr(browser_monitor, "SAMPLES_KEPT", 10)
+    monkeypatch.setattr(browser_monitor, "sample_rss", lambda driver: (driver, 3))
+    path = str(tmp_path / "browser_memory.jsonl")
+    supervisor = BrowserSupervisor(metrics_path=path)
+
+    for rss_mb in [900] + [100] * 99:
+        supervisor.row_finished(rss_mb * 1024 * 1024)
+
+    assert len(supervisor.samples) == 10
+    assert supervisor.peak_rss_mb() == 900
+    assert os.path.getsize(path) < 2200
+    assert os.path.exists(f"{path}.1")
+    assert sorted(os.listdir(tmp_path)) == ["browser_memory.jsonl", "browser_memory.jsonl.1"]
@@ -0,0 +1,49 @@
+import threading
+import time
+
+import pytest
+
+import get_dua
+from cancellation import CancellationToken, CancelledError
+from fake_webdriver import FakePortal
+
+
+@pytest.fixture
+def slow_browsers():
+    """Fábrica de navegadores que demora (como o primeiro download do Chrome)"""
+    portal = FakePortal()
+    created = []
+
+    def factory():
+        time.sleep(1.0)
+        driver = portal.driver()
+        created.append(driver)
+        return driver
+
+    original = get_dua.driver_factory
+    get_dua.set_driver_factory(factory)
+    yield created
+    get_dua.discard_warm_drivers(timeout=2)
+    get_dua.set_driver_factory(original)
+
+
+def test_discard_does_not_wait_for_slow_warmup(slow_browsers):
+    get_dua.start_browser_warmup()
+    started = time.monotonic()
+    get_dua.discard_warm_drivers(timeout=0.2)
+    assert time.monotonic() - started < 0.5
+
+    # A pré-inicialização abandonada fecha o próprio navegador ao terminar
+    time.sleep(1.5)
+    assert len(slow_browsers) == 1 and slow_browsers[0].quit_called
+    assert get_dua.warm_drivers == []
+
+
+def test_take_warm_driver_stops_on_cancel(slow_browsers):
+    get_dua.start_browser_warmup()
+    token = CancellationToken()
+    threading.Timer(0.2, token.cancel).start()
+    started = time.monotonic()
+    with pytest.raises(CancelledError):
+        get_dua.take_warm_driver(token)
+    assert time.monotonic() - started < 0.8
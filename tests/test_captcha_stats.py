@@ -0,0 +1,82 @@
+import platform
+
+from captcha_stats import (
+    CHECKBOX_PROBE_EVERY,
+    CHECKBOX_PROBE_WAIT,
+    SAVE_EVERY,
+    CaptchaStats,
+    default_strategy,
+)
+from RecaptchaBypass import RecaptchaSolver
+
+
+def solve(stats, checkbox_passes):
+    """Simula uma chamada ao resolvedor com a estratégia sugerida"""
+    strategy = stats.choose_strategy()
+    checked = not strategy["skip_checkbox_wait"]
+    passed = checked and checkbox_passes
+    stats.record(
+        {
+            "success": True,
+            "checkbox_passed": passed,
+            "checkbox_checked": checked,
+            "audio_attempts": 0 if passed else 1,
+            "recognizer": None if passed else "google",
+        }
+    )
+    return strategy
+
+
+def test_checkbox_wait_is_skipped_but_probed(tmp_path):
+    stats = CaptchaStats(str(tmp_path / "stats.json"))
+    strategies = [solve(stats, checkbox_passes=False) for _ in range(40)]
+
+    skipped = [s["skip_checkbox_wait"] for s in strategies[10:]]
+    assert skipped.count(False) == len(skipped) // (CHECKBOX_PROBE_EVERY + 1)
+    probes = [s for s in strategies[10:] if not s["skip_checkbox_wait"]]
+    assert all(s["checkbox_wait"] == CHECKBOX_PROBE_WAIT for s in probes)
+
+
+def test_checkbox_rate_recovers_after_probe(tmp_path):
+    stats = CaptchaStats(str(tmp_path / "stats.json"))
+    for _ in range(30):
+        solve(stats, checkbox_passes=False)
+    assert stats.choose_strategy()["skip_checkbox_wait"]
+
+    # O checkbox volta a passar: a próxima verificação detecta e a espera volta ao normal
+    for _ in range(CHECKBOX_PROBE_EVERY + 1):
+        solve(stats, checkbox_passes=True)
+    strategy = stats.choose_strategy()
+    assert not strategy["skip_checkbox_wait"]
+    assert strategy["checkbox_wait"] != CHECKBOX_PROBE_WAIT
+
+
+def test_solver_defaults_match_app_defaults():
+    # O pacote do resolvedor mantém a própria cópia dos padrões
+    is_windows_10 = platform.system() == "Windows" and platform.release().startswith(
+        "10"
+    )
+    assert RecaptchaSolver.default_strategy(is_windows_10) == default_strategy()
+
+
+def test_history_is_saved_in_batches(tmp_path):
+    path = tmp_path / "stats.json"
+    stats = CaptchaStats(str(path))
+    for _ in range(SAVE_EVERY - 1):
+        solve(stats, checkbox_passes=True)
+    assert not path.exists()
+
+    solve(stats, checkbox_passes=True)
+    assert len(CaptchaStats(str(path)).history()) == SAVE_EVERY
+
+    solve(stats, checkbox_passes=True)
+    stats.flush()
+    assert len(CaptchaStats(str(path)).history()) == SAVE_EVERY + 1
+
+
+def test_start_session_resets_summary(tmp_path):
+    stats = CaptchaStats(str(tmp_path / "stats.json"))
+    solve(stats, checkbox_passes=True)
+    stats.start_session()
+    assert stats.summary() is None
+    assert len(stats.history()) == 1
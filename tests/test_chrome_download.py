@@ -0,0 +1,178 @@
+"""
+Download do Chrome portátil contra um servidor HTTP local (http.server)
+"""
+
+import hashlib
+import http.server
+import io
+import json
+import os
+import random
+import threading
+import zipfile
+
+import pytest
+
+import chrome_download
+from chrome_download import ContentStore, check_zip, extract_zip
+
+
+def make_zip(files):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zip_ref:
+        for name, content in files.items():
+            zip_ref.writestr(name, content)
+    return buffer.getvalue()
+
+
+class ArchiveServer:
+    """Serve um único arquivo em /chrome.zip, com ou sem suporte a Range"""
+
+    def __init__(self, content, ranges=True):
+        self.content = content
+        self.ranges = ranges
+        self.requests = []
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.requests.append(self.headers.get("Range"))
+                body = server.content
+                range_header = self.headers.get("Range")
+                if server.ranges and range_header:
+                    start, end = range_header.split("=", 1)[1].split("-")
+                    start, end = int(start), min(int(end), len(body) - 1)
+                    self.send_response(206)
+                    self.send_header(
+                        "Content-Range", f"bytes {start}-{end}/{len(body)}"
+                    )
+                    body = body[start : end + 1]
+                else:
+                    self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", '"v1"')
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/chrome.zip"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def archive():
+    # Conteúdo pouco compressível, para o zip ter vários segmentos
+    rng = random.Random(7)
+    files = {
+        "chrome-linux64/chrome": bytes(rng.getrandbits(8) for _ in range(96 * 1024)),
+        "chrome-linux64/locales/pt-BR.pak": b"pt-BR" * 1000,
+    }
+    return files, make_zip(files)
+
+
+@pytest.fixture(autouse=True)
+def small_segments(monkeypatch):
+    monkeypatch.setattr(chrome_download, "MIN_SEGMENT_SIZE", 16 * 1024)
+
+
+def read_index(store):
+    with open(store.index_path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_ranged_download_is_recorded_and_reused(tmp_path, archive):
+    files, content = archive
+    store = ContentStore(str(tmp_path / "store"))
+    with ArchiveServer(content) as server:
+        path = store.fetch(server.url, suffix=".zip", validate=check_zip)
+        downloaded = len(server.requests)
+        again = store.fetch(server.url, suffix=".zip", validate=check_zip)
+
+    digest = hashlib.sha256(content).hexdigest()
+    assert path == again == store.blob_path(digest, ".zip")
+    with open(path, "rb") as f:
+        assert f.read() == content
+    assert read_index(store) == {server.url: digest}
+    # Sondagem + um pedido por segmento; a segunda chamada não vai à rede
+    assert downloaded == 1 + chrome_download.DEFAULT_SEGMENTS
+    assert len(server.requests) == downloaded
+
+    extract_zip(path, str(tmp_path / "chrome"))
+    for name, data in files.items():
+        with open(tmp_path / "chrome" / name, "rb") as f:
+            assert f.read() == data
+
+
+def test_download_without_range_support(tmp_path, archive):
+    _, content = archive
+    store = ContentStore(str(tmp_path / "store"))
+    with ArchiveServer(content, ranges=False) as server:
+        path = store.fetch(server.url, suffix=".zip", validate=check_zip)
+
+    with open(path, "rb") as f:
+        assert f.read() == content
+
+
+def test_truncated_first_download_is_not_recorded(tmp_path, archive):
+    _, content = archive
+    store = ContentStore(str(tmp_path / "store"))
+    with ArchiveServer(content[: len(content) // 2]) as server:
+        with pytest.raises(IOError):
+            store.fetch(server.url, suffix=".zip", validate=check_zip)
+
+        assert server.url not in store._load_index()
+        assert os.listdir(store.blobs_dir) == []
+
+        # Com o arquivo correto no servidor, a próxima tentativa se recupera
+        server.content = content
+        path = store.fetch(server.url, suffix=".zip", validate=check_zip)
+
+    assert read_index(store)[server.url] == hashlib.sha256(content).hexdigest()
+    check_zip(path)
+
+
+def test_corrupted_member_is_rejected(tmp_path, archive):
+    _, content = archive
+    corrupted = bytearray(content)
+    corrupted[200] ^= 0xFF  # dentro dos dados do primeiro membro
+    path = tmp_path / "corrupted.zip"
+    path.write_bytes(bytes(corrupted))
+
+    with pytest.raises(IOError):
+        check_zip(str(path))
+
+
+def test_pinned_digest_mismatch(tmp_path, archive):
+    _, content = archive
+    store = ContentStore(str(tmp_path / "store"))
+    with ArchiveServer(content) as server:
+        with pytest.raises(IOError, match="SHA-256 divergente"):
+            store.fetch(server.url, expected_sha256="0" * 64, suffix=".zip")
+
+    assert os.listdir(store.blobs_dir) == []
+
+
+def test_evict_forgets_recorded_digest(tmp_path, archive):
+    _, content = archive
+    store = ContentStore(str(tmp_path / "store"))
+    with ArchiveServer(content) as server:
+        path = store.fetch(server.url, suffix=".zip")
+        store.evict(server.url, suffix=".zip")
+
+        assert not os.path.exists(path)
+        assert server.url not in store._load_index()
+
+        requests_before = len(server.requests)
+        store.fetch(server.url, suffix=".zip")
+        assert len(server.requests) > requests_before
@@ -0,0 +1,86 @@
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+import driver_cache
+
+
+@pytest.fixture
+def template_dir(tmp_path, monkeypatch):
+    path = str(tmp_path / "chrome-profile")
+    monkeypatch.setattr(driver_cache, "get_profile_template_dir", lambda: path)
+    session_dirs = []
+    original = driver_cache.prepare_profile_dir
+
+    def prepare(seed):
+        session_dirs.append(original(seed))
+        return session_dirs[-1]
+
+    monkeypatch.setattr(driver_cache, "prepare_profile_dir", prepare)
+    yield path
+    for session_dir in session_dirs:
+        shutil.rmtree(session_dir, ignore_errors=True)
+
+
+def slow_seed(calls):
+    def seed(profile_dir):
+        calls.append(profile_dir)
+        with open(os.path.join(profile_dir, "Preferences"), "w") as f:
+            f.write("{}")
+        time.sleep(0.3)  # o Chrome ainda está gravando o perfil
+
+    return seed
+
+
+def test_template_is_seeded_once_and_only_copies_are_handed_out(template_dir):
+    calls = []
+    results = []
+    threads = [
+        threading.Thread(
+            target=lambda: results.append(driver_cache.prepare_profile_dir(slow_seed(calls)))
+        )
+        for _ in range(4)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1 and calls[0] != template_dir
+    assert len(set(results)) == 4 and template_dir not in results
+    for session_dir in results:
+        assert os.path.exists(os.path.join(session_dir, "Preferences"))
+    assert os.path.exists(os.path.join(template_dir, driver_cache.PROFILE_READY_MARKER))
+
+
+def test_incomplete_template_is_seeded_again(template_dir):
+    os.makedirs(template_dir)
+    with open(os.path.join(template_dir, "SingletonLock"), "w"):
+        pass
+
+    calls = []
+    session_dir = driver_cache.prepare_profile_dir(slow_seed(calls))
+
+    assert len(calls) == 1
+    assert sorted(os.listdir(session_dir)) == [
+        driver_cache.PROFILE_READY_MARKER,
+        "Preferences",
+    ]
+
+
+def test_failed_seed_leaves_no_template(template_dir):
+    def broken_seed(profile_dir):
+        raise RuntimeError("Chrome não iniciou")
+
+    with pytest.raises(RuntimeError):
+        driver_cache.prepare_profile_dir(broken_seed)
+
+    assert not os.path.exists(template_dir)
+    assert [
+        name
+        for name in os.listdir(os.path.dirname(template_dir))
+        if name.startswith(".chrome-profile-")
+    ] == []
@@ -0,0 +1,62 @@
+import threading
+import time
+
+from manual_captcha import ManualCaptchaQueue, ManualCaptchaRequest
+
+
+def park(queue, driver, cpf):
+    request = ManualCaptchaRequest({"CPF_CNPJ": cpf}, driver, f"aba-{cpf}")
+    queue.park(request)
+    return request
+
+
+def test_operator_resolution_wakes_the_worker():
+    queue = ManualCaptchaQueue()
+    first = park(queue, "driver", "111")
+    second = park(queue, "driver", "222")
+    assert queue.pending() == [first, second]
+    assert not queue.wait_ready(0.05)
+
+    # O worker espera na fila enquanto o operador resolve pela janela
+    threading.Timer(0.1, queue.resolve, [{second.id}]).start()
+    started = time.monotonic()
+    assert queue.wait_ready(5)
+    assert time.monotonic() - started < 2
+
+    assert queue.take_ready() == [second]
+    assert second.solved.is_set() and not second.cancelled
+    assert queue.pending() == [first]
+    assert len(queue) == 1
+
+
+def test_take_ready_is_per_driver():
+    queue = ManualCaptchaQueue()
+    mine = park(queue, "driver 1", "111")
+    other = park(queue, "driver 2", "222")
+    queue.resolve_all()
+
+    assert queue.take_ready("driver 1") == [mine]
+    assert queue.count() == 1
+    assert queue.take_ready() == [other]
+
+
+def test_lost_session_cancels_its_rows():
+    queue = ManualCaptchaQueue()
+    lost = park(queue, "driver 1", "111")
+    kept = park(queue, "driver 2", "222")
+
+    queue.cancel_driver("driver 1")
+    assert lost.cancelled and lost.solved.is_set()
+    assert not kept.solved.is_set()
+    assert queue.take_ready() == [lost]
+
+
+def test_parking_again_waits_for_a_new_resolution():
+    queue = ManualCaptchaQueue()
+    request = park(queue, "driver", "111")
+    queue.resolve({request.id})
+
+    # CAPTCHA resolvido não aceito pelo portal: a linha volta para o operador
+    queue.park(request)
+    assert queue.pending() == [request]
+    assert len(queue) == 1
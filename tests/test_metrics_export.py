@@ -0,0 +1,59 @@
+import urllib.request
+
+from metrics_export import MetricsRegistry, MetricsServer, TextfileExporter
+
+
+def test_counter_and_gauge_text_format():
+    registry = MetricsRegistry()
+    rows = registry.counter("dua_rows_total", "Linhas", ["result"])
+    restarts = registry.counter("dua_restarts_total", "Reinícios")
+    rss = registry.gauge("dua_rss_bytes", "Memória", ["worker"])
+    rows.inc(result="sucesso")
+    rows.inc(2, result="falha")
+    rss.set(1.5, worker='a"b\\c\nd')
+
+    assert registry.render() == (
+        "# HELP dua_rows_total Linhas\n"
+        "# TYPE dua_rows_total counter\n"
+        'dua_rows_total{result="falha"} 2\n'
+        'dua_rows_total{result="sucesso"} 1\n'
+        "# HELP dua_restarts_total Reinícios\n"
+        "# TYPE dua_restarts_total counter\n"
+        "dua_restarts_total 0\n"
+        "# HELP dua_rss_bytes Memória\n"
+        "# TYPE dua_rss_bytes gauge\n"
+        'dua_rss_bytes{worker="a\\"b\\\\c\\nd"} 1.5\n'
+    )
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    stage = registry.histogram("dua_stage_seconds", "Etapas", ["stage"], buckets=(1, 5))
+    for value in (0.5, 1, 3, 10):
+        stage.observe(value, stage="fill")
+
+    assert registry.render().splitlines()[2:] == [
+        'dua_stage_seconds_bucket{stage="fill",le="1"} 2',
+        'dua_stage_seconds_bucket{stage="fill",le="5"} 3',
+        'dua_stage_seconds_bucket{stage="fill",le="+Inf"} 4',
+        'dua_stage_seconds_sum{stage="fill"} 14.5',
+        'dua_stage_seconds_count{stage="fill"} 4',
+    ]
+
+
+def test_server_and_textfile_export_the_same_text(tmp_path):
+    registry = MetricsRegistry()
+    registry.counter("dua_rows_total", "Linhas").inc()
+
+    server = MetricsServer(0, registry=registry).start()
+    try:
+        url = f"http://127.0.0.1:{server.port}/metrics"
+        with urllib.request.urlopen(url, timeout=5) as response:
+            assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+            served = response.read().decode("utf-8")
+    finally:
+        server.stop()
+
+    path = tmp_path / "dua.prom"
+    TextfileExporter(str(path), registry=registry).write()
+    assert served == path.read_text(encoding="utf-8") == registry.render()
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+from selenium.webdriver.common.by import By
+
+import get_dua
+from fake_webdriver import FakeDocument, FakePortal
+from portal_errors import PortalValidationError, classify_error
+
+
+@pytest.mark.parametrize(
+    "message, code",
+    [
+        ("CPF/CNPJ do contribuinte inválido.", "CPF_CNPJ_INVALIDO"),
+        ("Contribuinte não cadastrado.", "CPF_CNPJ_INVALIDO"),
+        ("Data de vencimento inválida para o contribuinte.", "DATA_INVALIDA"),
+        ("Data de referência inválida.", "DATA_INVALIDA"),
+        ("Valor da receita inválido.", "VALOR_INVALIDO"),
+        ("Serviço não encontrado.", "SERVICO_INVALIDO"),
+        ("Receita não disponível para o período.", "SERVICO_INVALIDO"),
+        ("Por favor, confirme que você não é um robô.", "CAPTCHA_INVALIDO"),
+        ("Atualizando dados cadastrais", "ERRO_PORTAL"),
+        ("", "ERRO_PORTAL"),
+    ],
+)
+def test_classify_error(message, code):
+    assert classify_error(message) == code
+
+
+@pytest.fixture
+def form_page():
+    driver = FakePortal(seed=1).driver()
+    driver.get(get_dua.FORM_URL)
+    yield driver
+    get_dua.submitted_buttons.pop(threading.get_ident(), None)
+
+
+def submit(driver, previous_errors):
+    """Simula o clique em "Enviar" com as mensagens já visíveis na página"""
+    get_dua.submitted_buttons[threading.get_ident()] = (
+        driver.find_element(By.ID, "btnEnviar"),
+        previous_errors,
+    )
+
+
+def test_message_on_old_form_is_ignored_until_page_changes(form_page, monkeypatch):
+    monkeypatch.setattr(get_dua, "SUBMIT_PAGE_WAIT", 5)
+    form_page.window["document"].error = "Aviso: sistema em manutenção às 22h"
+    submit(form_page, ["Aviso: sistema em manutenção às 22h"])
+
+    def show_result():
+        time.sleep(0.3)
+        result = FakeDocument(get_dua.FORM_URL, "e-DUA - ICMS")
+        result.error = "Data de vencimento inválida."
+        form_page.navigate(result)
+
+    threading.Thread(target=show_result).start()
+    started = time.monotonic()
+    with pytest.raises(PortalValidationError) as raised:
+        get_dua.aguardar_resultado_envio(form_page, timeout=10, interval=0.05)
+
+    assert raised.value.code == "DATA_INVALIDA"
+    assert 0.3 <= time.monotonic() - started < 2
+
+
+def test_new_message_on_same_page_counts_immediately(form_page, monkeypatch):
+    # Portal que valida sem recarregar: a mensagem nova vale na hora
+    monkeypatch.setattr(get_dua, "SUBMIT_PAGE_WAIT", 5)
+    form_page.window["document"].error = "Aviso: sistema em manutenção às 22h"
+    submit(form_page, ["Aviso: sistema em manutenção às 22h"])
+    form_page.window["document"].error = "Valor da receita inválido."
+
+    started = time.monotonic()
+    with pytest.raises(PortalValidationError) as raised:
+        get_dua.aguardar_resultado_envio(form_page, timeout=10, interval=0.05)
+
+    assert raised.value.code == "VALOR_INVALIDO"
+    assert time.monotonic() - started < 0.5
+
+
+def test_repeated_message_on_same_page_counts_after_grace(form_page, monkeypatch):
+    # A mesma mensagem de antes do clique só vale depois da espera
+    monkeypatch.setattr(get_dua, "SUBMIT_PAGE_WAIT", 0.3)
+    form_page.window["document"].error = "Valor da receita inválido."
+    submit(form_page, ["Valor da receita inválido."])
+
+    started = time.monotonic()
+    with pytest.raises(PortalValidationError) as raised:
+        get_dua.aguardar_resultado_envio(form_page, timeout=10, interval=0.05)
+
+    assert raised.value.code == "VALOR_INVALIDO"
+    assert time.monotonic() - started >= 0.3
@@ -0,0 +1,84 @@
+import time
+
+import pytest
+
+from portal_errors import PortalValidationError
+from retry_policy import CircuitBreaker, RetryPolicy, RetryQueue, is_transient
+
+
+@pytest.mark.parametrize(
+    "error, transient",
+    [
+        (None, True),
+        (TimeoutError("sem resposta"), True),
+        (PortalValidationError("CAPTCHA_INVALIDO", "captcha"), True),
+        (PortalValidationError("VALOR_INVALIDO", "valor"), False),
+        (ValueError("data"), False),
+    ],
+)
+def test_is_transient(error, transient):
+    assert is_transient(error) == transient
+
+
+def test_delay_grows_exponentially_up_to_the_limit():
+    policy = RetryPolicy(base_delay=2, max_delay=10, jitter=0)
+    assert [policy.delay(attempt) for attempt in range(1, 6)] == [2, 4, 8, 10, 10]
+
+    policy = RetryPolicy(base_delay=2, max_delay=10, jitter=0.5)
+    assert all(1 <= policy.delay(1) <= 3 for _ in range(100))
+
+
+def test_should_retry_stops_at_max_attempts():
+    policy = RetryPolicy(max_attempts=3)
+    assert policy.should_retry(None, 2)
+    assert not policy.should_retry(None, 3)
+    assert not policy.should_retry(ValueError("dados"), 1)
+
+
+def test_retried_rows_wait_for_their_delay():
+    queue = RetryQueue([0, 1])
+    queue.push(2, attempt=2, delay=0.2)
+    assert queue.pop_ready() == (0, 1)
+    assert queue.pop_ready() == (1, 1)
+    assert queue.pop_ready() is None
+    assert 0 < queue.next_ready_in() <= 0.2
+
+    time.sleep(0.25)
+    assert queue.pop_ready() == (2, 2)
+    assert len(queue) == 0
+
+
+def test_breaker_opens_then_closes_after_trial_row():
+    breaker = CircuitBreaker(failure_rate=0.5, window=4, min_calls=4, cooldown=0.1)
+    for success in (True, False, False, True):
+        breaker.record(success)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker.trips == 1
+
+    started = time.monotonic()
+    breaker.wait()
+    assert time.monotonic() - started >= 0.1
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record(True)
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_failed_trial_reopens_with_doubled_cooldown():
+    breaker = CircuitBreaker(min_calls=2, cooldown=0.05, max_cooldown=0.15)
+    breaker.record(False)
+    breaker.record(False)
+    breaker.wait()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    breaker.record(False)
+    assert breaker.state == CircuitBreaker.OPEN
+    assert breaker._cooldown == pytest.approx(0.1)
+
+    # Sondagem falha: a pausa dobra de novo, limitada a max_cooldown
+    probes = iter([False, True])
+    breaker.probe = lambda: next(probes)
+    breaker.wait()
+    assert breaker.trips == 3
+    assert breaker._cooldown == pytest.approx(0.15)
+    assert breaker.state == CircuitBreaker.HALF_OPEN
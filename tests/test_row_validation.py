@@ -0,0 +1,115 @@
+import pandas as pd
+
+from row_validation import (
+    apply_validation,
+    cpf_cnpj_valid,
+    date_valid,
+    servico_valid,
+    valor_valid,
+)
+
+SERVICOS = {"138-4": "1464", "121-0": "1434"}
+
+
+def test_cpf_cnpj_check_digits():
+    values = pd.Series(
+        [
+            "529.982.247-25",  # CPF válido, formatado
+            "52998224725",
+            "52998224724",  # segundo dígito errado
+            "52998224715",  # primeiro dígito errado
+            "11.222.333/0001-81",  # CNPJ válido, formatado
+            "11222333000181",
+            "11222333000182",
+            "11222333000191",
+            "111.111.111-11",  # dígitos repetidos passam na conta, mas não valem
+            "00000000000000",
+            "5299822472",  # tamanho errado
+            "",
+            None,
+        ]
+    )
+    assert cpf_cnpj_valid(values).tolist() == [
+        True,
+        True,
+        False,
+        False,
+        True,
+        True,
+        False,
+        False,
+        False,
+        False,
+        False,
+        False,
+        False,
+    ]
+
+
+def test_cpf_cnpj_mask_keeps_the_index():
+    values = pd.Series(["52998224725", "123"], index=[10, 20])
+    assert cpf_cnpj_valid(values).to_dict() == {10: True, 20: False}
+
+
+def test_date_valid_checks_format_and_calendar():
+    referencias = pd.Series(["01/2024", "12/2025", "13/2024", "1/2024x", "2024-01", ""])
+    assert date_valid(referencias, "%m/%Y").tolist() == [
+        True,
+        True,
+        False,
+        False,
+        False,
+        False,
+    ]
+
+    vencimentos = pd.Series(
+        [" 10/01/2024 ", "29/02/2024", "29/02/2023", "31/04/2024", None]
+    )
+    assert date_valid(vencimentos, "%d/%m/%Y").tolist() == [
+        True,
+        True,
+        False,
+        False,
+        False,
+    ]
+
+
+def test_servico_valid_accepts_code_or_portal_value():
+    values = pd.Series(["138-4", " 121-0 ", "1464", "999-9", "", None])
+    assert servico_valid(values, SERVICOS).tolist() == [
+        True,
+        True,
+        True,
+        False,
+        False,
+        False,
+    ]
+
+
+def test_apply_validation_lists_every_reason():
+    data = pd.DataFrame(
+        {
+            "CPF_CNPJ": ["52998224725", "52998224724"],
+            "SERVICO": ["138-4", "999-9"],
+            "REFERENCIA": ["01/2024", "01/2024"],
+            "VENCIMENTO": ["10/01/2024", "32/01/2024"],
+            "VALOR": ["1.234.56", "0"],
+        }
+    )
+    assert apply_validation(data, SERVICOS) == 1
+    assert data["VALIDACAO"].tolist() == [
+        "",
+        "CPF/CNPJ inválido; serviço desconhecido; "
+        "vencimento inválido (DD/MM/AAAA); valor inválido",
+    ]
+
+
+def test_valor_valid_accepts_decimal_and_thousands_separators():
+    # Valores como ficam após o carregamento (vírgula decimal -> ponto)
+    values = pd.Series(["1.00", "1.234.56", "1.234.567.89", "10", " 25.5 "])
+    assert valor_valid(values).tolist() == [True, True, True, True, True]
+
+
+def test_valor_valid_rejects_empty_zero_and_text():
+    values = pd.Series(["", None, "0.00", "-5.00", "abc", "1.2a.00"])
+    assert valor_valid(values).tolist() == [False] * 6
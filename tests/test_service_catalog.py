@@ -0,0 +1,63 @@
+import time
+
+import pytest
+
+from service_catalog import SCRAPE_OPTIONS_SCRIPT, ServiceCatalog
+
+FALLBACK = {"138-4": "1464", "121-0": "1434"}
+
+
+class PortalPage:
+    """Página com o campo de serviço; conta as leituras da lista"""
+
+    def __init__(self, options):
+        self.options = options
+        self.reads = 0
+
+    def execute_script(self, script):
+        assert script == SCRAPE_OPTIONS_SCRIPT
+        self.reads += 1
+        return self.options
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "service_catalog.json")
+
+
+def test_cached_list_is_used_until_ttl_expires(path):
+    page = PortalPage([["1464", "138-4 - ICMS ST"]])
+    assert ServiceCatalog(FALLBACK, path, ttl=60).refresh(page)
+
+    # Nova execução do programa: a lista é conferida uma vez no portal
+    catalog = ServiceCatalog(FALLBACK, path, ttl=60)
+    assert not catalog.is_stale()
+    assert catalog.refresh(page)
+    assert not catalog.refresh(page)
+    assert page.reads == 2
+
+    # Com o cache vencido, a lista é lida de novo na mesma execução
+    catalog.fetched_at = time.time() - 61
+    assert catalog.is_stale()
+    assert catalog.refresh(page)
+    assert page.reads == 3
+
+
+def test_expired_cache_on_disk_is_stale(path):
+    ServiceCatalog(FALLBACK, path).refresh(PortalPage([["1464", "138-4 - ICMS ST"]]))
+    assert ServiceCatalog(FALLBACK, path, ttl=0).is_stale()
+    assert not ServiceCatalog(FALLBACK, path, ttl=60).is_stale()
+
+
+def test_resolve_follows_the_portal_list(path):
+    catalog = ServiceCatalog(FALLBACK, path)
+    # Sem lista do portal vale o mapeamento fixo
+    assert catalog.resolve("121-0") == "1434"
+
+    catalog.refresh(PortalPage([["1464", "ICMS ST"], ["9999", "999-9 - Outro"]]))
+    assert catalog.resolve("138-4") == "1464"
+    assert catalog.resolve("999-9") == "9999"
+    assert catalog.resolve("999-9 - OUTRO") == "9999"
+    # O portal deixou de oferecer o serviço
+    assert catalog.resolve("121-0") is None
+    assert "121-0" not in catalog.mapping()
@@ -0,0 +1,159 @@
+import http.client
+import json
+import zipfile
+
+import pytest
+
+from mock_portal import RECAPTCHA_WIDGET
+from session_recorder import SessionRecorder, document_valid
+from session_replay import ReplayPortal
+
+ORIGIN = "https://portal.test"
+CPF = "529.982.247-25"
+FORM_PAGE = (
+    f"<html><head></head><body><p>Contribuinte {CPF}</p>"
+    '<div class="g-recaptcha" data-callback="onOk"></div></body></html>'
+)
+
+
+def event(method, **params):
+    return {"message": json.dumps({"message": {"method": method, "params": params}})}
+
+
+def response(request_id, status, headers):
+    return event(
+        "Network.responseReceived",
+        requestId=request_id,
+        response={"status": status, "headers": headers},
+    )
+
+
+def request(request_id, url, method="GET", timestamp=0.0, **extra):
+    return event(
+        "Network.requestWillBeSent",
+        requestId=request_id,
+        request={"url": url, "method": method, **extra.pop("request", {})},
+        timestamp=timestamp,
+        wallTime=1000.0 + timestamp,
+        **extra,
+    )
+
+
+class RecordedBrowser:
+    """Navegador com o log de desempenho e os corpos de resposta do Chrome"""
+
+    current_url = f"{ORIGIN}/app/impressao.php"
+    title = "Impressão"
+    page_source = f"<html><body>DUA de {CPF}</body></html>"
+
+    def __init__(self):
+        self.bodies = {
+            "1": {"body": FORM_PAGE, "base64Encoded": False},
+            "2": {"body": "<html><body>DUA 7</body></html>", "base64Encoded": False},
+        }
+
+    def get_log(self, name):
+        assert name == "performance"
+        html = {"Content-Type": "text/html", "Set-Cookie": "PHPSESSID=segredo"}
+        return [
+            request("1", f"{ORIGIN}/app/form.php?cpf={CPF}", type="Document"),
+            response("1", 200, html),
+            event("Network.loadingFinished", requestId="1", timestamp=0.2),
+            request("9", f"{ORIGIN}/img/logo.png", type="Image"),
+            request("8", "https://www.google.com/recaptcha/api.js", type="Script"),
+            request(
+                "2",
+                f"{ORIGIN}/app/gerar.php",
+                "POST",
+                timestamp=1.0,
+                type="Document",
+                request={"postData": "cpf=52998224725&valor=1"},
+            ),
+            request(
+                "2",
+                f"{ORIGIN}/app/dua.php?id=7",
+                timestamp=1.3,
+                type="Document",
+                redirectResponse={
+                    "status": 302,
+                    "headers": {"Location": f"{ORIGIN}/app/dua.php?id=7"},
+                },
+            ),
+            response("2", 200, html),
+            event("Network.loadingFinished", requestId="2", timestamp=1.5),
+        ]
+
+    def execute_cdp_cmd(self, cmd, params):
+        assert cmd == "Network.getResponseBody"
+        return self.bodies[params["requestId"]]
+
+
+@pytest.fixture
+def recording(tmp_path):
+    recorder = SessionRecorder(f"{ORIGIN}/app/form.php", directory=str(tmp_path))
+    recorder.capture(RecordedBrowser(), "write", cpf_cnpj=CPF)
+    return recorder.close()
+
+
+@pytest.fixture
+def replay(recording):
+    portal = ReplayPortal(recording, speed=0).start()
+    host, port = portal.server.server_address[:2]
+    connection = http.client.HTTPConnection(host, port, timeout=5)
+    yield portal, connection
+    connection.close()
+    portal.stop()
+
+
+def fetch(connection, method, path, body=None):
+    connection.request(method, path, body=body)
+    response = connection.getresponse()
+    return response.status, response.headers, response.read().decode("utf-8")
+
+
+def test_recording_is_anonymized(recording):
+    with zipfile.ZipFile(recording) as archive:
+        lines = archive.read("exchanges.jsonl").splitlines()
+        exchanges = [json.loads(line) for line in lines]
+        text = "".join(archive.read(n).decode("utf-8") for n in archive.namelist())
+
+    assert [(e["method"], e["url"].split("?")[0], e["status"]) for e in exchanges] == [
+        ("GET", "/app/form.php", 200),
+        ("POST", "/app/gerar.php", 302),
+        ("GET", "/app/dua.php", 200),
+    ]
+    assert CPF not in text and "52998224725" not in text
+    assert "PHPSESSID" not in text
+    # O mesmo pseudônimo válido na URL formatada e no formulário só com dígitos
+    pseudonym = exchanges[0]["url"].split("cpf=")[1]
+    digits = pseudonym.replace(".", "").replace("-", "")
+    assert pseudonym != CPF and document_valid(digits)
+    assert f"cpf={digits}&" in exchanges[1]["post_data"]
+
+
+def test_replay_serves_the_recorded_flow(replay):
+    portal, connection = replay
+
+    status, _, body = fetch(connection, "GET", f"/app/form.php?cpf={CPF}")
+    assert status == 200
+    assert CPF not in body and "Contribuinte" in body
+    # O reCAPTCHA real é trocado pelo widget do portal simulado
+    assert RECAPTCHA_WIDGET in body and 'data-callback="onOk"' not in body
+    assert "window['onOk'](token)" in body
+
+    status, headers, _ = fetch(connection, "POST", "/app/gerar.php", body="cpf=1")
+    assert status == 302
+    assert headers["Location"] == "/app/dua.php?id=7"
+
+    status, _, body = fetch(connection, "GET", "/app/dua.php?id=7")
+    assert (status, body) == (200, "<html><body>DUA 7</body></html>")
+
+    # Página só gravada como DOM (sem troca HTTP)
+    status, _, body = fetch(connection, "GET", "/app/impressao.php")
+    assert status == 200 and "DUA de" in body and CPF not in body
+
+    status, _, _ = fetch(connection, "GET", "/app/nao_gravada.php")
+    assert status == 404
+    assert portal.stats["replayed"] == 3
+    assert portal.stats["snapshots_served"] == 1
+    assert portal.stats["missing"] == 1
@@ -0,0 +1,58 @@
+import threading
+import time
+
+import pytest
+
+from stage_watchdog import StageTimeout, StageWatchdog
+
+
+@pytest.fixture
+def watchdog(tmp_path):
+    aborted = threading.Event()
+    calls = []
+
+    def on_overrun(stage, thread_id):
+        calls.append((stage, thread_id))
+        aborted.set()
+
+    watchdog = StageWatchdog(
+        on_overrun,
+        deadlines={"fill": 0.2, "write": 0},
+        check_interval=0.05,
+        log_path=str(tmp_path / "stage_overruns.jsonl"),
+    )
+    watchdog.aborted = aborted
+    watchdog.calls = calls
+    watchdog.start()
+    yield watchdog
+    watchdog.stop()
+    watchdog.join(1)
+
+
+def test_stuck_stage_is_aborted_after_deadline(watchdog, tmp_path):
+    started = time.monotonic()
+    with pytest.raises(StageTimeout) as raised:
+        with watchdog.stage("fill"):
+            # Chamada WebDriver presa: só volta quando o navegador é encerrado
+            watchdog.aborted.wait(5)
+            raise ConnectionError("navegador encerrado")
+
+    assert 0.2 <= time.monotonic() - started < 1
+    assert raised.value.stage == "fill"
+    assert isinstance(raised.value.__cause__, ConnectionError)
+    assert watchdog.calls == [("fill", threading.get_ident())]
+    assert [r["stage"] for r in watchdog.overruns] == ["fill"]
+    assert (tmp_path / "stage_overruns.jsonl").read_text().count("\n") == 1
+
+
+def test_stage_within_deadline_is_not_aborted(watchdog):
+    with watchdog.stage("fill"):
+        time.sleep(0.05)
+    time.sleep(0.3)
+    assert watchdog.calls == []
+
+
+def test_stage_without_deadline_is_not_watched(watchdog):
+    with watchdog.stage("write"):
+        time.sleep(0.3)
+    assert watchdog.calls == []
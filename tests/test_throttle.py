@@ -0,0 +1,51 @@
+import time
+
+from throttle import AimdController, TokenBucket
+
+
+def controller(tmp_path, **kwargs):
+    kwargs.setdefault("window", 2)
+    return AimdController(metrics_path=str(tmp_path / "concurrency.jsonl"), **kwargs)
+
+
+def feed(aimd, latency, success=True):
+    for _ in range(aimd.window):
+        limit = aimd.record(latency, success)
+    return limit
+
+
+def test_limit_grows_by_one_while_healthy(tmp_path):
+    aimd = controller(tmp_path, max_workers=3)
+    assert [feed(aimd, 1.0) for _ in range(4)] == [2, 3, 3, 3]
+
+
+def test_limit_halves_on_errors_or_latency(tmp_path):
+    aimd = controller(tmp_path, max_workers=8, initial=8)
+    assert feed(aimd, 1.0) == 8
+    assert feed(aimd, 1.0, success=False) == 4
+    # Mediana acima de 1,5x a melhor já observada também conta como degradação
+    assert feed(aimd, 2.0) == 2
+    assert feed(aimd, 2.0) == 1
+    assert feed(aimd, 2.0) == 1
+    assert [a["limit"] for a in aimd.adjustments] == [4, 2, 1]
+    assert len((tmp_path / "concurrency.jsonl").read_text().splitlines()) == 3
+
+
+def test_bucket_allows_burst_then_refills_at_rate():
+    bucket = TokenBucket(rate_per_minute=600, capacity=2)  # 10 por segundo
+    assert bucket.acquire() < 0.01
+    assert bucket.acquire() < 0.01
+
+    waited = bucket.acquire()
+    assert 0.05 <= waited <= 0.2
+
+    time.sleep(0.3)
+    # A espera repõe no máximo `capacity` fichas
+    assert bucket.acquire() < 0.01
+    assert bucket.acquire() < 0.01
+    assert bucket.acquire() > 0.05
+
+
+def test_bucket_without_rate_never_waits():
+    bucket = TokenBucket(rate_per_minute=0)
+    assert all(bucket.acquire() == 0.0 for _ in range(100))
@@ -0,0 +1,54 @@
+import threading
+import time
+
+from token_prefetch import TokenPool, TokenPrefetcher
+
+
+def test_expired_tokens_are_evicted():
+    pool = TokenPool(size=3, ttl=60)
+    now = time.time()
+    pool.put("antigo", harvested_at=now - 61)
+    pool.put("recente", harvested_at=now - 30)
+    pool.put("novo")
+
+    assert len(pool) == 2
+    assert pool.missing() == 1
+    assert pool.get() == "recente"
+    assert pool.get() == "novo"
+    assert pool.get() is None
+
+
+def test_token_expires_while_waiting_in_pool():
+    pool = TokenPool(size=1, ttl=0.1)
+    pool.put("token")
+    time.sleep(0.15)
+    assert pool.get() is None
+    assert pool.missing() == 1
+
+
+def test_failed_harvest_starts_a_new_session():
+    pool = TokenPool(size=1)
+    created, closed = [], []
+    harvested = threading.Event()
+
+    def driver_factory():
+        created.append(f"sessão {len(created) + 1}")
+        return created[-1]
+
+    def harvest(driver):
+        if driver == "sessão 1":
+            raise TimeoutError("iframe do CAPTCHA não carregou")
+        harvested.set()
+        return f"token de {driver}"
+
+    prefetcher = TokenPrefetcher(
+        driver_factory, harvest, pool, retry_delay=0.01, driver_closer=closed.append
+    )
+    prefetcher.start()
+    assert harvested.wait(5)
+    prefetcher.stop()
+    prefetcher.join(5)
+
+    assert created == ["sessão 1", "sessão 2"]
+    assert closed == ["sessão 1", "sessão 2"]
+    assert pool.get() == "token de sessão 2"
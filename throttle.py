@@ -0,0 +1,153 @@
+"""
+Controle de ritmo e de concorrência contra o portal da SEFAZ
+
+- TokenBucket: limitador compartilhado para navegações e envios de formulário,
+  para não disparar bloqueios nem mais desafios de CAPTCHA.
+- AimdController: decide quantos navegadores processam linhas ao mesmo tempo.
+  Cresce de um em um enquanto latência e taxa de erro estão saudáveis e cai
+  pela metade quando degradam (aumento aditivo, redução multiplicativa).
+"""
+
+import collections
+import json
+import os
+import statistics
+import threading
+import time
+
+from app_paths import get_data_directory
+
+METRICS_FILENAME = "concurrency.jsonl"
+
+
+class TokenBucket:
+    """Limitador por balde de fichas: `rate` por minuto, com rajadas até `capacity`"""
+
+    def __init__(self, rate_per_minute, capacity=1):
+        self.capacity = max(1, capacity)
+        self.set_rate(rate_per_minute)
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+        self.waited = 0.0  # tempo total de espera imposto (s)
+
+    def set_rate(self, rate_per_minute):
+        # 0 desativa o limite
+        self.rate_per_minute = rate_per_minute
+        self._per_second = rate_per_minute / 60.0
+
+    def _refill(self, now):
+        self._tokens = min(
+            self.capacity, self._tokens + (now - self._updated) * self._per_second
+        )
+        self._updated = now
+
+    def acquire(self, token=None):
+        """Consome uma ficha, esperando o necessário (a espera respeita o cancelamento)"""
+        if not self._per_second:
+            return 0.0
+        started = time.monotonic()
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    waited = now - started
+                    self.waited += waited
+                    return waited
+                wait = (1 - self._tokens) / self._per_second
+            wait = min(wait, 0.5)
+            if token is not None:
+                token.sleep(wait)
+            else:
+                time.sleep(wait)
+
+
+class AimdController:
+    """Número de navegadores ativos ajustado por aumento aditivo / redução multiplicativa"""
+
+    def __init__(
+        self,
+        max_workers,
+        min_workers=1,
+        initial=1,
+        window=5,
+        error_threshold=0.2,
+        latency_factor=1.5,
+        metrics_path=None,
+    ):
+        self.max_workers = max(1, max_workers)
+        self.min_workers = max(1, min(min_workers, self.max_workers))
+        self.limit = max(self.min_workers, min(initial, self.max_workers))
+        self.window = window
+        self.error_threshold = error_threshold
+        # Latência "degradada" = mediana da janela acima deste fator da melhor mediana
+        self.latency_factor = latency_factor
+        self.metrics_path = metrics_path or os.path.join(
+            get_data_directory(), METRICS_FILENAME
+        )
+        self.baseline = None
+        self.adjustments = []
+        self._samples = collections.deque()
+        self._completed = collections.deque()  # instantes de conclusão (para linhas/min)
+        self._lock = threading.Lock()
+
+    def record(self, latency, success):
+        """Registra uma linha concluída; a cada `window` amostras reavalia o limite"""
+        with self._lock:
+            now = time.monotonic()
+            self._completed.append(now)
+            self._samples.append((latency, success))
+            if len(self._samples) < self.window:
+                return self.limit
+
+            latencies = [sample[0] for sample in self._samples]
+            errors = sum(1 for sample in self._samples if not sample[1])
+            self._samples.clear()
+
+            median = statistics.median(latencies)
+            if self.baseline is None or median < self.baseline:
+                self.baseline = median
+            error_rate = errors / len(latencies)
+            degraded = (
+                error_rate > self.error_threshold
+                or median > self.baseline * self.latency_factor
+            )
+
+            previous = self.limit
+            if degraded:
+                self.limit = max(self.min_workers, self.limit // 2)
+            elif self.limit < self.max_workers:
+                self.limit += 1
+            if self.limit != previous:
+                self._log_adjustment(previous, median, error_rate)
+            return self.limit
+
+    def _log_adjustment(self, previous, median, error_rate):
+        sample = {
+            "timestamp": time.time(),
+            "limit": self.limit,
+            "previous": previous,
+            "latency_p50": round(median, 2),
+            "baseline": round(self.baseline, 2),
+            "error_rate": round(error_rate, 3),
+        }
+        self.adjustments.append(sample)
+        print(
+            f"Concorrência ajustada: {previous} -> {self.limit} navegador(es) "
+            f"(latência {median:.1f}s, erros {error_rate:.0%})"
+        )
+        try:
+            with open(self.metrics_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(sample) + "\n")
+        except OSError as e:
+            print(f"Não foi possível gravar a métrica de concorrência: {e}")
+
+    def rows_per_minute(self, horizon=60.0):
+        """Linhas concluídas por minuto no último `horizon` segundos"""
+        with self._lock:
+            cutoff = time.monotonic() - horizon
+            while self._completed and self._completed[0] < cutoff:
+                self._completed.popleft()
+            return len(self._completed) * 60.0 / horizon
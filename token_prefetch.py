@@ -0,0 +1,129 @@
+"""
+Pré-resolução de tokens reCAPTCHA em segundo plano
+
+Uma sessão auxiliar do navegador resolve o CAPTCHA do formulário antes de ele
+ser necessário e guarda o valor de `g-recaptcha-response` num pool. O token
+vale cerca de dois minutos, então o pool descarta tokens antigos pelo TTL.
+"""
+
+import collections
+import threading
+import time
+
+# Tokens reCAPTCHA expiram em 120 s; descartar com folga para o envio
+TOKEN_TTL = 110
+
+# Script para ler o token resolvido no documento principal
+READ_TOKEN_SCRIPT = """
+var field = document.querySelector('textarea[name="g-recaptcha-response"]');
+return field ? field.value : null;
+"""
+
+# Script para aplicar um token pré-resolvido no formulário atual
+INJECT_TOKEN_SCRIPT = """
+var token = arguments[0];
+var fields = document.querySelectorAll('textarea[name="g-recaptcha-response"]');
+if (!fields.length) { return false; }
+for (var i = 0; i < fields.length; i++) {
+    fields[i].value = token;
+    fields[i].innerHTML = token;
+}
+var widget = document.querySelector('.g-recaptcha[data-callback]');
+if (widget) {
+    var callback = window[widget.getAttribute('data-callback')];
+    if (typeof callback === 'function') { callback(token); }
+}
+return true;
+"""
+
+
+class TokenPool:
+    """Pool thread-safe de tokens resolvidos com expiração por TTL"""
+
+    def __init__(self, size=2, ttl=TOKEN_TTL):
+        self.size = size
+        self.ttl = ttl
+        self._tokens = collections.deque()
+        self._lock = threading.Lock()
+
+    def _discard_expired(self):
+        now = time.time()
+        while self._tokens and now - self._tokens[0][1] > self.ttl:
+            self._tokens.popleft()
+
+    def put(self, token, harvested_at=None):
+        with self._lock:
+            self._tokens.append((token, harvested_at or time.time()))
+            self._discard_expired()
+
+    def get(self):
+        """Retorna o token válido mais antigo, ou None se o pool estiver vazio"""
+        with self._lock:
+            self._discard_expired()
+            if not self._tokens:
+                return None
+            return self._tokens.popleft()[0]
+
+    def missing(self):
+        """Quantos tokens faltam para completar o pool"""
+        with self._lock:
+            self._discard_expired()
+            return max(0, self.size - len(self._tokens))
+
+    def __len__(self):
+        with self._lock:
+            self._discard_expired()
+            return len(self._tokens)
+
+
+class TokenPrefetcher(threading.Thread):
+    """Mantém o pool cheio resolvendo CAPTCHAs numa sessão própria do navegador"""
+
+    def __init__(self, driver_factory, harvest, pool, retry_delay=5, driver_closer=None):
+        super().__init__(daemon=True, name="TokenPrefetcher")
+        self.driver_factory = driver_factory
+        self.driver_closer = driver_closer or (lambda d: d.quit())
+        self.harvest = harvest
+        self.pool = pool
+        self.retry_delay = retry_delay
+        self.driver = None
+        self._stop_event = threading.Event()
+
+    def stop(self):
+        self._stop_event.set()
+
+    def run(self):
+        failures = 0
+        try:
+            while not self._stop_event.is_set():
+                if not self.pool.missing():
+                    self._stop_event.wait(1)
+                    continue
+
+                try:
+                    if self.driver is None:
+                        self.driver = self.driver_factory()
+                    token = self.harvest(self.driver)
+                    if not token:
+                        raise Exception("CAPTCHA resolvido sem token no formulário")
+                    self.pool.put(token)
+                    failures = 0
+                    print(f"Token de CAPTCHA pré-resolvido ({len(self.pool)} no pool)")
+                except Exception as e:
+                    failures += 1
+                    print(f"Falha ao pré-resolver CAPTCHA: {e}")
+                    # A sessão pode ter ficado num estado inválido: a próxima
+                    # tentativa começa num navegador novo
+                    self._close_driver()
+                    # Espera crescente para não insistir quando o portal falha
+                    self._stop_event.wait(min(60, self.retry_delay * failures))
+        finally:
+            self._close_driver()
+
+    def _close_driver(self):
+        if self.driver is not None:
+            try:
+                self.driver_closer(self.driver)
+            except Exception:
+                pass
+            self.driver = None
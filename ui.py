@@ -1,6 +1,5 @@
 import sys
 import os
-import pandas as pd
 import threading
 import queue
 import time
@@ -25,12 +24,14 @@ from PyQt6.QtWidgets import (
     QFormLayout,
     QMessageBox,
     QGroupBox,
+    QScrollArea,
     QStatusBar,
     QStyle,
     QCheckBox,
     QComboBox,
     QSplitter,
     QDialog,
+    QSpinBox,
 )
 from PyQt6.QtCore import (
     Qt,
@@ -53,17 +54,39 @@ from PyQt6.QtGui import (
     QPixmap,
 )
 
-# Import functions from get_dua.py
-from get_dua import (
-    preencher_formulario,
-    baixar_pdf,
-    SERVICO_MAPPING,
-    set_captcha_callback,
-    captcha_solved_signal,
-)
+# get_dua (Selenium), pandas e a validação da planilha são importados no
+# primeiro uso, para a janela abrir sem esperar por eles
 
 # Import the new captcha dialog
 from captcha_dialog import CaptchaDialog
+from manual_captcha import ManualCaptchaRequest
+from portal_errors import PortalValidationError
+from cancellation import CancellationToken, CancelledError
+from retry_policy import CircuitBreaker, RetryPolicy, RetryQueue, is_transient
+from stage_watchdog import (
+    DEFAULT_DEADLINES,
+    STAGE_LABELS,
+    STAGES,
+    StageTimeout,
+    StageWatchdog,
+)
+from service_catalog import get_service_catalog
+from captcha_stats import get_captcha_stats
+from throttle import AimdController
+from run_timings import RunTimings
+from session_recorder import SessionRecorder
+import metrics_export
+from browser_monitor import BrowserSupervisor, DEFAULT_MAX_ROWS, DEFAULT_MAX_RSS_MB
+
+# Atraso do pré-início do navegador, para a janela ser desenhada antes
+WARMUP_DELAY_MS = 300
+
+
+def probe_portal():
+    """get_dua.probe_portal, importando o get_dua só quando o portal é verificado"""
+    from get_dua import probe_portal as probe
+
+    return probe()
 
 
 class DataFrameModel(QAbstractTableModel):
@@ -71,16 +94,33 @@ class DataFrameModel(QAbstractTableModel):
 
     def __init__(self, data=None):
         super().__init__()
-        self._data = data if data is not None else pd.DataFrame()
+        self._set_data(data)
+
+    def _set_data(self, data):
+        # Sem planilha carregada o modelo fica vazio (sem DataFrame nem pandas)
+        self._data = data
+        self._validation = None
+        if data is not None:
+            from row_validation import VALIDATION_COLUMN
+
+            if VALIDATION_COLUMN in data.columns:
+                self._validation = data[VALIDATION_COLUMN]
 
     def rowCount(self, parent=None):
-        return len(self._data)
+        return 0 if self._data is None else len(self._data)
 
     def columnCount(self, parent=None):
-        return len(self._data.columns)
+        return 0 if self._data is None else len(self._data.columns)
 
     def data(self, index, role=Qt.ItemDataRole.DisplayRole):
-        if not index.isValid() or role != Qt.ItemDataRole.DisplayRole:
+        if not index.isValid():
+            return None
+        if role == Qt.ItemDataRole.BackgroundRole:
+            # Destacar linhas rejeitadas pela validação local
+            if self._validation is not None and self._validation.iat[index.row()]:
+                return QColor(255, 220, 220)
+            return None
+        if role != Qt.ItemDataRole.DisplayRole:
             return None
         return str(self._data.iloc[index.row(), index.column()])
 
@@ -99,7 +139,7 @@ class DataFrameModel(QAbstractTableModel):
 
     def update_data(self, data):
         self.beginResetModel()
-        self._data = data
+        self._set_data(data)
         self.endResetModel()
 
 
@@ -194,21 +234,82 @@ class WorkerThread(QThread):
     finished_signal = pyqtSignal(bool)  # success/failure
     log_signal = pyqtSignal(LogMessage)
     status_signal = pyqtSignal(str, int)  # message, level
-    captcha_signal = pyqtSignal()  # Signal for manual CAPTCHA intervention
-
-    def __init__(self, data, pdf_dir):
+    captcha_signal = pyqtSignal(object)  # ManualCaptchaRequest waiting for the operator
+    throughput_signal = pyqtSignal(float, int, int)  # rows/min, active browsers, limit
+
+    def __init__(
+        self,
+        data,
+        pdf_dir,
+        prefetch_tokens=False,
+        recycle_rows=DEFAULT_MAX_ROWS,
+        recycle_rss_mb=DEFAULT_MAX_RSS_MB,
+        warm_profile=False,
+        stage_deadlines=None,
+        retry_policy=None,
+        breaker=None,
+        max_workers=1,
+        navigation_rate=0,
+        submission_rate=0,
+        metrics_port=0,
+        metrics_textfile=None,
+        record_session=False,
+        profile_run=False,
+        profile_memory=False,
+    ):
         super().__init__()
         self.data = data
         self.pdf_dir = pdf_dir
-        self.running = True
+        self.prefetch_tokens = prefetch_tokens
+        self.warm_profile = warm_profile
+        self.recycle_rows = recycle_rows
+        self.recycle_rss_mb = recycle_rss_mb
+        self.supervisors = []  # um por navegador simultâneo
+        self.token = CancellationToken()
+        self.stage_deadlines = stage_deadlines
+        self.watchdog = None
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker(probe=probe_portal)
+        self.retried_rows = 0
         self.total_success = 0
         self.total_failure = 0
+        self.completed_rows = 0
+        self.max_workers = max(1, max_workers)
+        self.navigation_rate = navigation_rate
+        self.submission_rate = submission_rate
+        self.controller = None
+        self.timings = RunTimings()
+        self.metrics_port = metrics_port
+        self.metrics_textfile = metrics_textfile
+        self.metrics_exporters = []
+        self.record_session = record_session
+        self.recorder = None
+        # Perfil de execução (amostragem + cProfile, e tracemalloc se pedido)
+        self.profiler = None
+        if profile_run:
+            from run_profiler import RunProfiler
+
+            self.profiler = RunProfiler(trace_memory=profile_memory)
+        self.in_flight = 0  # linhas em processamento em algum navegador
+        self.stats_lock = threading.Lock()
+        # Estado de cada thread de processamento (linha atual, supervisor do navegador)
+        self.local = threading.local()
+        self.validation_errors = {}  # código de erro do portal -> quantidade
+        self.invalid_rows = 0  # reprovadas na validação local
+
+    @property
+    def running(self):
+        return not self.token.cancelled
 
     def stop(self):
         """Stop the worker thread safely"""
-        self.running = False
+        self.token.cancel("Interrupção solicitada pelo usuário")
         print("Stop flag set - thread will terminate at next check point")
 
+    def drain(self):
+        """Termina as linhas em andamento (inclusive CAPTCHAs pendentes) sem iniciar novas"""
+        self.token.drain()
+
     def run(self):
         total_rows = len(self.data)
 
@@ -288,6 +389,7 @@ class WorkerThread(QThread):
         # Install our custom print function
         builtins.print = custom_print
         builtins.log_ui = direct_log  # Add a direct UI logger
+        self.direct_log = direct_log
 
         # Inform UI we're starting
         direct_log("🔄 Iniciando processamento de DUAs", LogMessage.INFO)
@@ -296,89 +398,126 @@ class WorkerThread(QThread):
         try:
             self.status_signal.emit("Iniciando processamento...", LogMessage.INFO)
 
+            if self.profiler is not None:
+                self.profiler.start()
+                self.profiler.begin_thread()
+                direct_log("⏱️ Perfil de execução ativado", LogMessage.INFO)
+
             # Import get_dua modules and initialize browser
             direct_log(
                 "🔄 Carregando módulos e inicializando navegador...", LogMessage.INFO
             )
-            from get_dua import initialize_driver, close_browser
+            from get_dua import (
+                set_captcha_callback,
+                set_profile_template,
+                set_cancel_token,
+                set_rate_limits,
+                set_run_timings,
+            )
 
             # Registrar o callback para resolução manual de CAPTCHA
             set_captcha_callback(self.request_manual_captcha)
+            set_cancel_token(self.token)
+            get_captcha_stats().start_session()
+            set_run_timings(self.timings)
 
-            driver = initialize_driver()
-            direct_log("✅ Navegador iniciado com sucesso", LogMessage.SUCCESS)
-
-            # Process each row
-            for index, row in self.data.iterrows():
-                # Check running flag at the start of each row processing
-                if not self.running:
-                    self.status_signal.emit(
-                        "Processamento interrompido pelo usuário.", LogMessage.WARNING
-                    )
-                    direct_log(
-                        "⚠️ Processamento interrompido pelo usuário", LogMessage.WARNING
-                    )
-                    break
+            # Métricas para monitoramento (endpoint /metrics e/ou arquivo .prom)
+            self.metrics_exporters = metrics_export.start_exporters(
+                self.metrics_port, self.metrics_textfile
+            )
 
-                dados = row.to_dict()
+            # Gravação da sessão para reprodução offline (session_replay.py)
+            if self.record_session:
+                from get_dua import (
+                    PORTAL_URL,
+                    discard_warm_drivers,
+                    set_session_recorder,
+                )
 
-                # Update status with current item
-                status_msg = (
-                    f"Processando: {dados['CPF_CNPJ']} - Ref. {dados['REFERENCIA']}"
+                self.recorder = SessionRecorder(PORTAL_URL)
+                # Navegadores pré-iniciados não têm o log de rede habilitado
+                discard_warm_drivers()
+                set_session_recorder(self.recorder)
+                direct_log(
+                    f"⏺️ Gravando a sessão em {self.recorder.path}", LogMessage.INFO
                 )
-                self.status_signal.emit(status_msg, LogMessage.INFO)
 
-                # Use both print and direct UI log (belt and suspenders)
-                msg = f"📝 Processando item {index+1}/{total_rows}: CPF/CNPJ: {dados['CPF_CNPJ']} - Ref: {dados['REFERENCIA']} - Valor: R$ {dados['VALOR']}"
-                direct_log(msg, LogMessage.INFO)
+            # Prazo por etapa: uma etapa travada encerra o navegador daquela thread
+            from get_dua import abort_browser, set_stage_watchdog
 
-                try:
-                    # Step 1: Preencher formulário
-                    direct_log("🔄 Preenchendo formulário DUA...", LogMessage.INFO)
-                    from get_dua import preencher_formulario
-
-                    preencher_formulario(dados)
-
-                    # Step 2: Baixar PDF
-                    direct_log("🔄 Gerando e baixando o PDF...", LogMessage.INFO)
-                    from get_dua import baixar_pdf
-
-                    # Atualizado: Passar todos os parâmetros relevantes
-                    success = baixar_pdf(
-                        dados["CPF_CNPJ"],
-                        dados["REFERENCIA"],
-                        dados.get("INFO_ADICIONAIS", ""),
-                        dados.get("VALOR", ""),
-                    )
+            self.watchdog = StageWatchdog(
+                lambda stage, thread_id: abort_browser(thread_id), self.stage_deadlines
+            )
+            self.watchdog.start()
+            set_stage_watchdog(self.watchdog)
+            set_profile_template(self.warm_profile)
+
+            # Ritmo máximo contra o portal, somando todos os navegadores
+            set_rate_limits(self.navigation_rate, self.submission_rate)
+            self.controller = AimdController(self.max_workers)
+            if self.max_workers > 1:
+                direct_log(
+                    f"🔀 Até {self.max_workers} navegadores simultâneos "
+                    f"(começando com {self.controller.limit})",
+                    LogMessage.INFO,
+                )
 
-                    if success:
-                        self.total_success += 1
-                        direct_log(
-                            f"✅ DUA gerado com sucesso para {dados['CPF_CNPJ']} - Ref: {dados['REFERENCIA']}",
-                            LogMessage.SUCCESS,
-                        )
-                    else:
-                        self.total_failure += 1
-                        direct_log(
-                            f"❌ Falha na emissão do DUA para {dados['CPF_CNPJ']} - Ref: {dados['REFERENCIA']}",
-                            LogMessage.ERROR,
-                        )
+            # Pré-resolver CAPTCHAs numa sessão auxiliar enquanto as linhas são processadas
+            if self.prefetch_tokens:
+                from get_dua import start_token_prefetch
 
-                except Exception as e:
-                    self.total_failure += 1
-                    direct_log(
-                        f"❌ Erro ao processar item {index+1}: {str(e)}",
-                        LogMessage.ERROR,
-                    )
+                start_token_prefetch()
+                direct_log(
+                    "🔄 Pré-resolução de CAPTCHA em segundo plano ativada",
+                    LogMessage.INFO,
+                )
 
-                # Update progress
-                self.progress_signal.emit(index + 1, total_rows)
+            # Cada navegador tem sua thread; linhas com falha transitória voltam para a fila
+            row_queue = RetryQueue(self.data.index)
+            workers = [
+                threading.Thread(
+                    target=self.worker_loop,
+                    args=(slot, row_queue),
+                    name=f"DUAWorker-{slot + 1}",
+                    daemon=True,
+                )
+                for slot in range(self.max_workers)
+            ]
+            for worker in workers:
+                worker.start()
+            alive = workers
+            while alive:
+                alive[0].join(1.0)
+                alive = [worker for worker in workers if worker.is_alive()]
+                rows_per_minute = self.controller.rows_per_minute()
+                active = min(len(alive), self.controller.limit)
+                metrics_export.ROWS_PER_MINUTE.set(rows_per_minute)
+                metrics_export.ACTIVE_BROWSERS.set(active)
+                self.throughput_signal.emit(
+                    rows_per_minute, active, self.controller.limit
+                )
 
-                # Add a small separator in the log
+            if not self.running:
+                self.status_signal.emit(
+                    "Processamento interrompido pelo usuário.", LogMessage.WARNING
+                )
                 direct_log(
-                    "──────────────────────────────────────────────", LogMessage.INFO
+                    "⚠️ Processamento interrompido pelo usuário", LogMessage.WARNING
+                )
+            elif len(row_queue):
+                direct_log(
+                    f"⏹️ Encerrado após as linhas em andamento; "
+                    f"{len(row_queue)} item(ns) não iniciado(s)",
+                    LogMessage.WARNING,
                 )
 
+            # CAPTCHAs que ficaram na fila (interrupção) são contados como falha
+            from get_dua import manual_captcha_queue
+
+            if len(manual_captcha_queue):
+                manual_captcha_queue.cancel_all()
+                self.process_manual_captchas(any_driver=True)
+
             # Final status update
             if self.total_success == total_rows:
                 summary = f"🎉 Processamento concluído com sucesso! Total: {total_rows} DUA(s) gerado(s)."
@@ -390,6 +529,11 @@ class WorkerThread(QThread):
             self.status_signal.emit(summary, level)
             direct_log(summary, level)
 
+        except CancelledError:
+            self.status_signal.emit(
+                "Processamento interrompido pelo usuário.", LogMessage.WARNING
+            )
+
         except Exception as e:
             error_msg = f"❌ Erro crítico no processamento: {str(e)}"
             self.status_signal.emit(error_msg, LogMessage.ERROR)
@@ -407,9 +551,25 @@ class WorkerThread(QThread):
 
             try:
                 direct_log("🔄 Finalizando navegador...", LogMessage.INFO)
-                from get_dua import close_browser
-
-                close_browser()
+                from get_dua import close_all_browsers, stop_token_prefetch
+
+                from get_dua import set_run_timings, set_stage_watchdog
+
+                if self.watchdog is not None:
+                    self.watchdog.stop()
+                    set_stage_watchdog(None)
+                set_run_timings(None)
+                if self.profiler is not None:
+                    self.profiler.end_thread()
+                    self.profiler.stop()
+                metrics_export.stop_exporters(self.metrics_exporters)
+                stop_token_prefetch()
+                close_all_browsers()
+                if self.recorder is not None:
+                    from get_dua import set_session_recorder
+
+                    set_session_recorder(None)
+                    self.recorder.close()
                 direct_log("✅ Navegador finalizado com sucesso", LogMessage.SUCCESS)
             except:
                 direct_log(
@@ -425,11 +585,422 @@ class WorkerThread(QThread):
                 f"   Falhas: {self.total_failure}",
                 LogMessage.ERROR if self.total_failure > 0 else LogMessage.INFO,
             )
+            if self.invalid_rows:
+                direct_log(
+                    f"   Ignorados por dados inválidos: {self.invalid_rows}",
+                    LogMessage.ERROR,
+                )
+            for code, count in sorted(self.validation_errors.items()):
+                direct_log(f"   Rejeitados pelo portal [{code}]: {count}", LogMessage.ERROR)
+            get_captcha_stats().flush()
+            for line in get_captcha_stats().format_summary():
+                direct_log(f"   {line}", LogMessage.INFO)
+            if self.supervisors:
+                direct_log(
+                    f"   Navegador: pico de "
+                    f"{max(s.peak_rss_mb() for s in self.supervisors):.0f} MB, "
+                    f"{sum(s.restarts for s in self.supervisors)} reinício(s)",
+                    LogMessage.INFO,
+                )
+            if self.controller is not None and self.max_workers > 1:
+                direct_log(
+                    f"   Concorrência: {self.controller.limit}/{self.max_workers} "
+                    f"navegador(es) ao final, {len(self.controller.adjustments)} ajuste(s)",
+                    LogMessage.INFO,
+                )
+            from get_dua import navigation_limiter, submission_limiter
+
+            throttled = navigation_limiter.waited + submission_limiter.waited
+            if throttled >= 1:
+                direct_log(
+                    f"   Limite de ritmo: {throttled:.0f}s de espera imposta",
+                    LogMessage.INFO,
+                )
+            if self.retried_rows or self.breaker.trips:
+                direct_log(
+                    f"   Repetições: {self.retried_rows}, "
+                    f"pausas por instabilidade do portal: {self.breaker.trips}",
+                    LogMessage.INFO,
+                )
+            if self.watchdog is not None and self.watchdog.overruns:
+                stages = {}
+                for overrun in self.watchdog.overruns:
+                    stages[overrun["stage"]] = stages.get(overrun["stage"], 0) + 1
+                direct_log(
+                    "   Etapas travadas: "
+                    + ", ".join(f"{name} ({count})" for name, count in stages.items()),
+                    LogMessage.ERROR,
+                )
+            for line in self.timings.format_report():
+                direct_log(f"   {line}", LogMessage.INFO)
+            report_path = self.timings.save(self.pdf_dir)
+            if report_path:
+                direct_log(
+                    f"   Relatório de desempenho salvo em: {report_path}",
+                    LogMessage.INFO,
+                )
+            trace_path = self.timings.save_trace(self.pdf_dir)
+            if trace_path:
+                direct_log(
+                    f"   Linha do tempo (chrome://tracing) salva em: {trace_path}",
+                    LogMessage.INFO,
+                )
+            if self.recorder is not None:
+                direct_log(
+                    f"   Sessão gravada em: {self.recorder.path}", LogMessage.INFO
+                )
+            if self.profiler is not None:
+                for line in self.profiler.format_summary():
+                    direct_log(f"   {line}", LogMessage.INFO)
+                for path in self.profiler.save(self.pdf_dir).values():
+                    direct_log(f"   Perfil salvo em: {path}", LogMessage.INFO)
+            from get_dua import browser_startup_times
+
+            if browser_startup_times:
+                direct_log(
+                    f"   Inicialização do navegador: média de "
+                    f"{sum(browser_startup_times) / len(browser_startup_times):.1f}s "
+                    f"em {len(browser_startup_times)} sessão(ões)",
+                    LogMessage.INFO,
+                )
+
+    def worker_loop(self, slot, row_queue):
+        """Processa linhas da fila num navegador próprio enquanto o slot estiver ativo"""
+        from get_dua import close_browser, current_driver, manual_captcha_queue
+
+        supervisor = BrowserSupervisor(self.recycle_rows, self.recycle_rss_mb)
+        with self.stats_lock:
+            self.supervisors.append(supervisor)
+        self.local.supervisor = supervisor
+        self.local.current_index = None
+
+        try:
+            if self.profiler is not None:
+                self.profiler.begin_thread()
+            while self.running and not self.token.draining:
+                # Slots acima do limite atual ficam parados; o navegador é liberado
+                # assim que não houver CAPTCHA manual pendente nele
+                if slot >= self.controller.limit:
+                    driver = current_driver()
+                    if driver is not None and not manual_captcha_queue.count(driver):
+                        close_browser()
+                        supervisor.rows_since_start = 0
+                    self.process_manual_captchas()
+                    # Sem linhas na fila nem em andamento, o slot não será mais usado
+                    with self.stats_lock:
+                        finished = not len(row_queue) and not self.in_flight
+                    if finished:
+                        break
+                    self.token.sleep(0.5)
+                    continue
+
+                with self.stats_lock:
+                    item = row_queue.pop_ready()
+                    if item is not None:
+                        self.in_flight += 1
+                    finished = item is None and not self.in_flight and not len(row_queue)
+                if finished:
+                    break
+                if item is None:
+                    # Só restam linhas aguardando a espera da repetição
+                    self.process_manual_captchas()
+                    wait = row_queue.next_ready_in()
+                    self.token.sleep(min(1.0, wait if wait is not None else 0.5))
+                    continue
+
+                try:
+                    self.process_row(row_queue, *item)
+                finally:
+                    with self.stats_lock:
+                        self.in_flight -= 1
+
+                # Concluir as linhas cujo CAPTCHA manual já foi resolvido
+                self.process_manual_captchas()
+
+                # Reciclar o navegador entre linhas quando necessário
+                self.check_browser_health()
+
+                # Add a small separator in the log
+                self.direct_log(
+                    "──────────────────────────────────────────────", LogMessage.INFO
+                )
+
+            # Aguardar o operador resolver os CAPTCHAs que ainda estão neste navegador
+            driver = current_driver()
+            pending = manual_captcha_queue.count(driver) if driver is not None else 0
+            if pending and self.running:
+                self.direct_log(
+                    f"⏳ Aguardando resolução manual de {pending} CAPTCHA(s)...",
+                    LogMessage.WARNING,
+                )
+                self.process_manual_captchas(wait=True)
+        except CancelledError:
+            pass
+        except Exception as e:
+            self.direct_log(
+                f"❌ Erro no navegador {slot + 1}: {str(e)}", LogMessage.ERROR
+            )
+        finally:
+            if self.profiler is not None:
+                self.profiler.end_thread()
+
+    def process_row(self, row_queue, index, attempt):
+        from row_validation import VALIDATION_COLUMN
+
+        dados = self.data.loc[index].to_dict()
+
+        # Linhas reprovadas na validação local não vão ao portal
+        if dados.get(VALIDATION_COLUMN):
+            with self.stats_lock:
+                self.total_failure += 1
+                self.invalid_rows += 1
+            metrics_export.record_row(False, "DADOS_INVALIDOS")
+            self.direct_log(
+                f"⛔ Item {index+1} ignorado: {dados[VALIDATION_COLUMN]}",
+                LogMessage.ERROR,
+            )
+            self.update_progress()
+            return
+
+        # Portal instável: esperar o disjuntor fechar antes de enviar a linha
+        self.breaker.wait(self.token)
+        self.timings.begin_row(
+            index + 1, f"{dados['CPF_CNPJ']} - Ref. {dados['REFERENCIA']}"
+        )
+
+        # Update status with current item
+        status_msg = f"Processando: {dados['CPF_CNPJ']} - Ref. {dados['REFERENCIA']}"
+        self.status_signal.emit(status_msg, LogMessage.INFO)
+
+        # Use both print and direct UI log (belt and suspenders)
+        msg = f"📝 Processando item {index+1}/{len(self.data)}: CPF/CNPJ: {dados['CPF_CNPJ']} - Ref: {dados['REFERENCIA']} - Valor: R$ {dados['VALOR']}"
+        if attempt > 1:
+            msg += f" (tentativa {attempt}/{self.retry_policy.max_attempts})"
+        self.direct_log(msg, LogMessage.INFO)
+
+        started = time.monotonic()
+        try:
+            # Step 1: Preencher formulário
+            self.direct_log("🔄 Preenchendo formulário DUA...", LogMessage.INFO)
+            from get_dua import preencher_formulario
+
+            self.local.current_index = index
+            result = preencher_formulario(dados)
+
+            if isinstance(result, ManualCaptchaRequest):
+                # Linha estacionada aguardando o operador; seguir com as próximas
+                self.breaker.record(True)
+                self.direct_log(
+                    f"⏸️ Item {index+1} aguardando CAPTCHA manual, seguindo com os próximos",
+                    LogMessage.WARNING,
+                )
+                return
+
+            if result is False and self.token.cancelled:
+                # Interrompida pelo usuário: não volta à fila nem conta como falha
+                self.direct_log(f"⚠️ Item {index+1} interrompido", LogMessage.WARNING)
+                return
+
+            # Step 2: Baixar PDF
+            success = self.download_pdf(dados)
+            healthy = success
+            if success or not self.retry_row(row_queue, index, attempt):
+                self.finish_row(index, dados, success)
+
+        except Exception as e:
+            # Dados rejeitados não indicam sobrecarga do portal
+            healthy = not is_transient(e)
+            if isinstance(e, StageTimeout):
+                self.recover_browser()
+            if not self.retry_row(row_queue, index, attempt, e):
+                self.fail_row(index, e)
+        finally:
+            self.timings.end_row()
+
+        self.controller.record(time.monotonic() - started, healthy)
+
+    def update_progress(self):
+        with self.stats_lock:
+            self.completed_rows += 1
+            completed = self.completed_rows
+        self.progress_signal.emit(completed, len(self.data))
+
+    def download_pdf(self, dados):
+        self.direct_log("🔄 Gerando e baixando o PDF...", LogMessage.INFO)
+        from get_dua import baixar_pdf
+
+        # Atualizado: Passar todos os parâmetros relevantes
+        return baixar_pdf(
+            dados["CPF_CNPJ"],
+            dados["REFERENCIA"],
+            dados.get("INFO_ADICIONAIS", ""),
+            dados.get("VALOR", ""),
+        )
+
+    def retry_row(self, row_queue, index, attempt, error=None):
+        """Devolve a linha à fila se a falha for transitória; retorna True se devolveu"""
+        # Falha permanente (dados rejeitados) indica que o portal está respondendo
+        self.breaker.record(not is_transient(error))
+        if not self.retry_policy.should_retry(error, attempt):
+            return False
+
+        delay = self.retry_policy.delay(attempt)
+        row_queue.push(index, attempt + 1, delay)
+        with self.stats_lock:
+            self.retried_rows += 1
+        metrics_export.ROW_RETRIES.inc()
+        reason = f": {error}" if error is not None else ""
+        self.direct_log(
+            f"🔁 Item {index+1} será tentado novamente em {delay:.0f}s "
+            f"(tentativa {attempt + 1}/{self.retry_policy.max_attempts}){reason}",
+            LogMessage.WARNING,
+        )
+        return True
+
+    def finish_row(self, index, dados, success):
+        self.timings.finish_row(index + 1, success)
+        metrics_export.record_row(success)
+        if success:
+            self.breaker.record(True)
+            with self.stats_lock:
+                self.total_success += 1
+            self.direct_log(
+                f"✅ DUA gerado com sucesso para {dados['CPF_CNPJ']} - Ref: {dados['REFERENCIA']}",
+                LogMessage.SUCCESS,
+            )
+        else:
+            with self.stats_lock:
+                self.total_failure += 1
+            self.direct_log(
+                f"❌ Falha na emissão do DUA para {dados['CPF_CNPJ']} - Ref: {dados['REFERENCIA']}",
+                LogMessage.ERROR,
+            )
+        self.update_progress()
+
+    def fail_row(self, index, error):
+        self.timings.finish_row(index + 1, False)
+        if isinstance(error, PortalValidationError):
+            reason = error.code
+        elif isinstance(error, StageTimeout):
+            reason = "ETAPA_TRAVADA"
+        else:
+            reason = type(error).__name__
+        metrics_export.record_row(False, reason)
+        with self.stats_lock:
+            self.total_failure += 1
+            if isinstance(error, PortalValidationError):
+                self.validation_errors[error.code] = (
+                    self.validation_errors.get(error.code, 0) + 1
+                )
+        if isinstance(error, PortalValidationError):
+            message = f"❌ Item {index+1} rejeitado pelo portal [{error.code}]: {error.message}"
+        else:
+            message = f"❌ Erro ao processar item {index+1}: {str(error)}"
+        self.direct_log(message, LogMessage.ERROR)
+        self.update_progress()
+
+    def process_manual_captchas(self, wait=False, any_driver=False):
+        """Conclui as linhas cujo CAPTCHA manual foi liberado pelo operador
+
+        Cada thread retoma só as linhas estacionadas no próprio navegador;
+        any_driver=True recolhe as de todos (usado após o término das threads).
+        """
+        from get_dua import (
+            current_driver,
+            manual_captcha_queue,
+            retomar_captcha_manual,
+            fechar_aba_captcha,
+        )
+
+        driver = None
+        if not any_driver:
+            driver = current_driver()
+            if driver is None:
+                return
+
+        while True:
+            for request in manual_captcha_queue.take_ready(driver):
+                index, dados = request.row_index, request.dados
 
-    def request_manual_captcha(self):
-        """Método chamado quando o sistema precisa de intervenção manual para o CAPTCHA"""
+                if request.cancelled or not self.running:
+                    self.direct_log(
+                        f"⚠️ CAPTCHA manual do item {index+1} cancelado",
+                        LogMessage.WARNING,
+                    )
+                    fechar_aba_captcha(request)
+                    self.finish_row(index, dados, False)
+                    continue
+
+                self.direct_log(
+                    f"▶️ Retomando item {index+1} após CAPTCHA manual", LogMessage.INFO
+                )
+                self.timings.begin_row(index + 1)
+                try:
+                    if not retomar_captcha_manual(request):
+                        # Liberado pelo operador, mas o CAPTCHA continua pendente na aba
+                        manual_captcha_queue.park(request)
+                        self.captcha_signal.emit(request)
+                        continue
+
+                    success = self.download_pdf(dados)
+                    fechar_aba_captcha(request)
+                    self.finish_row(index, dados, success)
+                except Exception as e:
+                    fechar_aba_captcha(request)
+                    self.fail_row(index, e)
+                    if isinstance(e, StageTimeout):
+                        self.recover_browser()
+                finally:
+                    self.timings.end_row()
+
+            if not wait or not self.running or not manual_captcha_queue.count(driver):
+                break
+            manual_captcha_queue.wait_ready(0.5)
+
+    def check_browser_health(self):
+        """Mede a memória do navegador e recicla a sessão se passar dos limites"""
+        from get_dua import initialize_driver, recycle_browser, manual_captcha_queue
+
+        driver = initialize_driver()
+        reason = self.local.supervisor.row_finished(driver)
+        if not reason:
+            return
+
+        if manual_captcha_queue.count(driver):
+            # As abas com CAPTCHA pendente seriam perdidas ao fechar o navegador
+            self.direct_log(
+                f"⏳ Reciclagem do navegador adiada ({reason}): há CAPTCHAs pendentes",
+                LogMessage.INFO,
+            )
+            return
+
+        self.direct_log(f"♻️ Reciclando o navegador ({reason})...", LogMessage.INFO)
+        recycle_browser()
+        self.local.supervisor.recycled()
+        self.direct_log("✅ Navegador reiniciado", LogMessage.SUCCESS)
+
+    def recover_browser(self):
+        """Recicla a sessão encerrada pelo watchdog após uma etapa travada"""
+        from get_dua import current_driver, recycle_browser, manual_captcha_queue
+
+        # As abas estacionadas morreram com o navegador
+        driver = current_driver()
+        if driver is not None and manual_captcha_queue.count(driver):
+            manual_captcha_queue.cancel_driver(driver)
+            self.process_manual_captchas()
+
+        self.direct_log(
+            "♻️ Reiniciando o navegador após etapa travada...", LogMessage.WARNING
+        )
+        recycle_browser()
+        self.local.supervisor.recycled()
+        self.direct_log("✅ Navegador reiniciado", LogMessage.SUCCESS)
+
+    def request_manual_captcha(self, request):
+        """Método chamado quando uma linha precisa de intervenção manual para o CAPTCHA"""
         print("Thread de trabalho solicitando intervenção manual para CAPTCHA")
-        self.captcha_signal.emit()
+        request.row_index = self.local.current_index
+        self.captcha_signal.emit(request)
 
 
 class DUAAutomationUI(QMainWindow):
@@ -439,10 +1010,15 @@ class DUAAutomationUI(QMainWindow):
         super().__init__()
         self.settings = QSettings("DUA_Automation", "Settings")
         self.worker = None
+        self.captcha_dialog = None
 
         self.initUI()
         self.loadSettings()
 
+        # Pré-iniciar o navegador logo depois que a janela aparecer (o get_dua
+        # e o Selenium são carregados aqui, não antes da primeira exibição)
+        QTimer.singleShot(WARMUP_DELAY_MS, self.warm_up_browser)
+
     def initUI(self):
         # Definir ícone da aplicação (ícone pequeno para a barra de título)
         icon_path = os.path.join(
@@ -661,6 +1237,9 @@ class DUAAutomationUI(QMainWindow):
         self.progress_bar.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.progress_bar.setFormat("%v/%m - %p%")
         progress_layout.addWidget(self.progress_bar)
+        self.throughput_label = QLabel("")
+        self.throughput_label.setStyleSheet("color: #a9b7c6;")
+        progress_layout.addWidget(self.throughput_label)
 
         left_layout.addWidget(progress_group)
 
@@ -730,7 +1309,11 @@ class DUAAutomationUI(QMainWindow):
         # Settings tab
         settings_tab = QWidget()
         settings_layout = QVBoxLayout(settings_tab)
-        tab_widget.addTab(settings_tab, "Configurações")
+        # A lista de opções não cabe em telas menores
+        settings_scroll = QScrollArea()
+        settings_scroll.setWidgetResizable(True)
+        settings_scroll.setWidget(settings_tab)
+        tab_widget.addTab(settings_scroll, "Configurações")
 
         # PDF directory setting
         pdf_group = QGroupBox("Diretório para PDFs")
@@ -749,6 +1332,180 @@ class DUAAutomationUI(QMainWindow):
 
         settings_layout.addWidget(pdf_group)
 
+        # CAPTCHA settings
+        captcha_group = QGroupBox("CAPTCHA")
+        captcha_layout = QVBoxLayout(captcha_group)
+        self.prefetch_tokens_check = QCheckBox(
+            "Pré-resolver CAPTCHAs em segundo plano (abre uma janela extra do Chrome)"
+        )
+        self.prefetch_tokens_check.setToolTip(
+            "Mantém tokens de CAPTCHA já resolvidos para que o formulário seja enviado sem espera"
+        )
+        captcha_layout.addWidget(self.prefetch_tokens_check)
+
+        settings_layout.addWidget(captcha_group)
+
+        # Browser recycling settings
+        browser_group = QGroupBox("Navegador")
+        browser_layout = QFormLayout(browser_group)
+        self.recycle_rows_spin = QSpinBox()
+        self.recycle_rows_spin.setRange(0, 10000)
+        self.recycle_rows_spin.setSpecialValueText("Nunca")
+        self.recycle_rows_spin.setToolTip(
+            "Reinicia o Chrome após este número de linhas (0 = nunca)"
+        )
+        browser_layout.addRow("Reiniciar a cada (linhas):", self.recycle_rows_spin)
+
+        self.recycle_rss_spin = QSpinBox()
+        self.recycle_rss_spin.setRange(0, 64000)
+        self.recycle_rss_spin.setSingleStep(100)
+        self.recycle_rss_spin.setSpecialValueText("Sem limite")
+        self.recycle_rss_spin.setToolTip(
+            "Reinicia o Chrome quando a memória de todos os seus processos passar deste valor (0 = sem limite)"
+        )
+        browser_layout.addRow("Limite de memória (MB):", self.recycle_rss_spin)
+
+        self.warm_profile_check = QCheckBox(
+            "Usar perfil pré-aquecido do Chrome em vez de janela anônima"
+        )
+        self.warm_profile_check.setToolTip(
+            "A primeira sessão cria um perfil modelo; as seguintes iniciam a partir de uma cópia dele"
+        )
+        browser_layout.addRow(self.warm_profile_check)
+
+        self.prestart_browser_check = QCheckBox(
+            "Pré-iniciar o navegador enquanto a planilha é carregada"
+        )
+        self.prestart_browser_check.setToolTip(
+            "Abre o Chrome em segundo plano ao iniciar o programa e ao selecionar um arquivo"
+        )
+        browser_layout.addRow(self.prestart_browser_check)
+
+        settings_layout.addWidget(browser_group)
+
+        # Prazo de cada etapa de uma linha (watchdog)
+        deadlines_group = QGroupBox("Tempo limite por etapa (segundos)")
+        deadlines_layout = QFormLayout(deadlines_group)
+        self.stage_deadline_spins = {}
+        for stage in STAGES:
+            spin = QSpinBox()
+            spin.setRange(0, 3600)
+            spin.setSpecialValueText("Sem limite")
+            spin.setToolTip(
+                "Se a etapa passar deste tempo, o navegador é reiniciado e o item conta como falha"
+            )
+            deadlines_layout.addRow(f"{STAGE_LABELS[stage]}:", spin)
+            self.stage_deadline_spins[stage] = spin
+
+        settings_layout.addWidget(deadlines_group)
+
+        # Repetição de falhas transitórias e pausa quando o portal está instável
+        retry_group = QGroupBox("Repetição de falhas")
+        retry_layout = QFormLayout(retry_group)
+        self.retry_attempts_spin = QSpinBox()
+        self.retry_attempts_spin.setRange(1, 10)
+        self.retry_attempts_spin.setToolTip(
+            "Tentativas por item para falhas transitórias (timeout, erro 5xx, navegador travado)"
+        )
+        retry_layout.addRow("Tentativas por item:", self.retry_attempts_spin)
+
+        self.retry_delay_spin = QSpinBox()
+        self.retry_delay_spin.setRange(1, 600)
+        self.retry_delay_spin.setToolTip(
+            "Espera antes da 2ª tentativa; dobra a cada nova tentativa"
+        )
+        retry_layout.addRow("Espera inicial (s):", self.retry_delay_spin)
+
+        self.breaker_rate_spin = QSpinBox()
+        self.breaker_rate_spin.setRange(10, 100)
+        self.breaker_rate_spin.setSuffix("%")
+        self.breaker_rate_spin.setToolTip(
+            "Pausa o processamento quando esta fração dos últimos itens falhar"
+        )
+        retry_layout.addRow("Pausar com falhas acima de:", self.breaker_rate_spin)
+
+        settings_layout.addWidget(retry_group)
+
+        # Navegadores em paralelo e ritmo máximo de acesso ao portal
+        concurrency_group = QGroupBox("Paralelismo e ritmo")
+        concurrency_layout = QFormLayout(concurrency_group)
+        self.max_workers_spin = QSpinBox()
+        self.max_workers_spin.setRange(1, 8)
+        self.max_workers_spin.setToolTip(
+            "Máximo de navegadores processando ao mesmo tempo. Começa com um e "
+            "aumenta enquanto o portal responde bem; cai pela metade quando ele "
+            "fica lento ou falha"
+        )
+        concurrency_layout.addRow(
+            "Navegadores simultâneos (máx):", self.max_workers_spin
+        )
+
+        self.navigation_rate_spin = QSpinBox()
+        self.navigation_rate_spin.setRange(0, 600)
+        self.navigation_rate_spin.setSpecialValueText("Sem limite")
+        self.navigation_rate_spin.setToolTip(
+            "Aberturas do formulário por minuto, somando todos os navegadores"
+        )
+        concurrency_layout.addRow("Navegações por minuto:", self.navigation_rate_spin)
+
+        self.submission_rate_spin = QSpinBox()
+        self.submission_rate_spin.setRange(0, 600)
+        self.submission_rate_spin.setSpecialValueText("Sem limite")
+        self.submission_rate_spin.setToolTip(
+            "Envios do formulário por minuto, somando todos os navegadores"
+        )
+        concurrency_layout.addRow("Envios por minuto:", self.submission_rate_spin)
+
+        settings_layout.addWidget(concurrency_group)
+
+        # Exportação de métricas para monitoramento (Prometheus / node_exporter)
+        metrics_group = QGroupBox("Métricas e diagnóstico")
+        metrics_layout = QFormLayout(metrics_group)
+        self.metrics_port_spin = QSpinBox()
+        self.metrics_port_spin.setRange(0, 65535)
+        self.metrics_port_spin.setSpecialValueText("Desativado")
+        self.metrics_port_spin.setToolTip(
+            "Porta local do endpoint http://127.0.0.1:<porta>/metrics durante o processamento"
+        )
+        metrics_layout.addRow("Porta do endpoint /metrics:", self.metrics_port_spin)
+
+        self.metrics_textfile_edit = QLineEdit()
+        self.metrics_textfile_edit.setPlaceholderText("Desativado")
+        self.metrics_textfile_edit.setToolTip(
+            "Arquivo .prom atualizado periodicamente para o textfile collector do node_exporter"
+        )
+        metrics_layout.addRow("Arquivo de métricas (.prom):", self.metrics_textfile_edit)
+
+        self.record_session_check = QCheckBox(
+            "Gravar a sessão para reprodução offline (CPF/CNPJ anonimizados)"
+        )
+        self.record_session_check.setToolTip(
+            "Grava as respostas do portal e as páginas de cada etapa em "
+            "dados_aplicacao/gravacoes; reproduza com session_replay.py"
+        )
+        metrics_layout.addRow(self.record_session_check)
+
+        self.profile_run_check = QCheckBox(
+            "Gerar perfil de execução (flamegraph e cProfile)"
+        )
+        self.profile_run_check.setToolTip(
+            "Amostra as pilhas do processamento e grava perfil_*.folded e "
+            "perfil_*.pstats junto aos PDFs"
+        )
+        metrics_layout.addRow(self.profile_run_check)
+
+        self.profile_memory_check = QCheckBox(
+            "Incluir crescimento de memória (tracemalloc, mais lento)"
+        )
+        self.profile_memory_check.setToolTip(
+            "Compara a memória alocada no início e no fim e grava memoria_*.txt"
+        )
+        self.profile_memory_check.setEnabled(False)
+        self.profile_run_check.toggled.connect(self.profile_memory_check.setEnabled)
+        metrics_layout.addRow(self.profile_memory_check)
+
+        settings_layout.addWidget(metrics_group)
+
         # Add help/instructions tab
         help_tab = QWidget()
         help_layout = QVBoxLayout(help_tab)
@@ -826,9 +1583,102 @@ class DUAAutomationUI(QMainWindow):
         pdf_dir = self.settings.value("pdf_directory")
         if pdf_dir:
             self.pdf_dir_edit.setText(pdf_dir)
+        self.prefetch_tokens_check.setChecked(
+            self.settings.value("prefetch_tokens", False, type=bool)
+        )
+        self.recycle_rows_spin.setValue(
+            self.settings.value("recycle_rows", DEFAULT_MAX_ROWS, type=int)
+        )
+        self.recycle_rss_spin.setValue(
+            self.settings.value("recycle_rss_mb", DEFAULT_MAX_RSS_MB, type=int)
+        )
+        self.warm_profile_check.setChecked(
+            self.settings.value("warm_profile", False, type=bool)
+        )
+        self.prestart_browser_check.setChecked(
+            self.settings.value("prestart_browser", True, type=bool)
+        )
+        self.retry_attempts_spin.setValue(
+            self.settings.value("retry_attempts", 3, type=int)
+        )
+        self.retry_delay_spin.setValue(
+            self.settings.value("retry_base_delay", 5, type=int)
+        )
+        self.breaker_rate_spin.setValue(
+            self.settings.value("breaker_failure_rate", 50, type=int)
+        )
+        self.max_workers_spin.setValue(self.settings.value("max_workers", 1, type=int))
+        self.metrics_port_spin.setValue(self.settings.value("metrics_port", 0, type=int))
+        self.metrics_textfile_edit.setText(self.settings.value("metrics_textfile", ""))
+        self.record_session_check.setChecked(
+            self.settings.value("record_session", False, type=bool)
+        )
+        self.profile_run_check.setChecked(
+            self.settings.value("profile_run", False, type=bool)
+        )
+        self.profile_memory_check.setChecked(
+            self.settings.value("profile_memory", False, type=bool)
+        )
+        self.navigation_rate_spin.setValue(
+            self.settings.value("navigation_rate", 0, type=int)
+        )
+        self.submission_rate_spin.setValue(
+            self.settings.value("submission_rate", 0, type=int)
+        )
+        for stage, spin in self.stage_deadline_spins.items():
+            spin.setValue(
+                self.settings.value(
+                    f"stage_deadline/{stage}", DEFAULT_DEADLINES[stage], type=int
+                )
+            )
 
     def saveSettings(self):
         self.settings.setValue("pdf_directory", self.pdf_dir_edit.text())
+        self.settings.setValue(
+            "prefetch_tokens", self.prefetch_tokens_check.isChecked()
+        )
+        self.settings.setValue("recycle_rows", self.recycle_rows_spin.value())
+        self.settings.setValue("recycle_rss_mb", self.recycle_rss_spin.value())
+        self.settings.setValue("warm_profile", self.warm_profile_check.isChecked())
+        self.settings.setValue(
+            "prestart_browser", self.prestart_browser_check.isChecked()
+        )
+        for stage, spin in self.stage_deadline_spins.items():
+            self.settings.setValue(f"stage_deadline/{stage}", spin.value())
+        self.settings.setValue("retry_attempts", self.retry_attempts_spin.value())
+        self.settings.setValue("retry_base_delay", self.retry_delay_spin.value())
+        self.settings.setValue("breaker_failure_rate", self.breaker_rate_spin.value())
+        self.settings.setValue("max_workers", self.max_workers_spin.value())
+        self.settings.setValue("navigation_rate", self.navigation_rate_spin.value())
+        self.settings.setValue("submission_rate", self.submission_rate_spin.value())
+        self.settings.setValue("metrics_port", self.metrics_port_spin.value())
+        self.settings.setValue(
+            "metrics_textfile", self.metrics_textfile_edit.text().strip()
+        )
+        self.settings.setValue(
+            "record_session", self.record_session_check.isChecked()
+        )
+        self.settings.setValue("profile_run", self.profile_run_check.isChecked())
+        self.settings.setValue(
+            "profile_memory", self.profile_memory_check.isChecked()
+        )
+
+    def warm_up_browser(self):
+        """Pré-inicia o navegador em segundo plano enquanto o operador prepara os dados"""
+        if not self.prestart_browser_check.isChecked():
+            return
+        if self.worker and self.worker.isRunning():
+            return
+
+        from get_dua import set_profile_template, start_browser_warmup
+
+        set_profile_template(self.warm_profile_check.isChecked())
+        if start_browser_warmup():
+            self.log_text.append_log(
+                LogMessage(
+                    "🔄 Pré-iniciando o navegador em segundo plano...", LogMessage.INFO
+                )
+            )
 
     def apply_log_filter(self, index):
         # Implement log filtering functionality
@@ -894,6 +1744,11 @@ class DUAAutomationUI(QMainWindow):
             self.saveSettings()
 
     def load_csv_data(self, file_path):
+        import pandas as pd
+
+        from get_dua import SERVICO_MAPPING
+        from row_validation import VALIDATION_COLUMN, apply_validation
+
         try:
             self.log_text.append_log(
                 LogMessage(f"Carregando arquivo: {file_path}", LogMessage.INFO)
@@ -1072,10 +1927,33 @@ class DUAAutomationUI(QMainWindow):
                 + data["INFO_ADICIONAIS"].fillna("")
             )
 
+            # Validar CPF/CNPJ, datas, valores e serviços antes de usar o navegador
+            invalid_count = apply_validation(
+                data, get_service_catalog(SERVICO_MAPPING).mapping()
+            )
+            if invalid_count:
+                self.log_text.append_log(
+                    LogMessage(
+                        f"{invalid_count} registro(s) com dados inválidos serão ignorados "
+                        f"(veja a coluna {VALIDATION_COLUMN})",
+                        LogMessage.WARNING,
+                    )
+                )
+                invalid_rows = data[data[VALIDATION_COLUMN] != ""]
+                for i, row in invalid_rows.head(10).iterrows():
+                    self.log_text.append_log(
+                        LogMessage(
+                            f"  Item {i+1}: {row[VALIDATION_COLUMN]}", LogMessage.WARNING
+                        )
+                    )
+
             # Update table
             self.table_model.update_data(data)
             self.data = data
 
+            # Garantir que o navegador já esteja abrindo antes do início do processamento
+            self.warm_up_browser()
+
             # Enable start button
             self.start_btn.setEnabled(True)
 
@@ -1161,11 +2039,38 @@ class DUAAutomationUI(QMainWindow):
         )
 
         # Start worker thread
-        self.worker = WorkerThread(self.data, pdf_dir)
+        self.worker = WorkerThread(
+            self.data,
+            pdf_dir,
+            prefetch_tokens=self.prefetch_tokens_check.isChecked(),
+            recycle_rows=self.recycle_rows_spin.value(),
+            recycle_rss_mb=self.recycle_rss_spin.value(),
+            warm_profile=self.warm_profile_check.isChecked(),
+            stage_deadlines={
+                stage: spin.value()
+                for stage, spin in self.stage_deadline_spins.items()
+            },
+            retry_policy=RetryPolicy(
+                max_attempts=self.retry_attempts_spin.value(),
+                base_delay=self.retry_delay_spin.value(),
+            ),
+            breaker=CircuitBreaker(
+                failure_rate=self.breaker_rate_spin.value() / 100, probe=probe_portal
+            ),
+            max_workers=self.max_workers_spin.value(),
+            navigation_rate=self.navigation_rate_spin.value(),
+            submission_rate=self.submission_rate_spin.value(),
+            metrics_port=self.metrics_port_spin.value(),
+            metrics_textfile=self.metrics_textfile_edit.text().strip() or None,
+            record_session=self.record_session_check.isChecked(),
+            profile_run=self.profile_run_check.isChecked(),
+            profile_memory=self.profile_memory_check.isChecked(),
+        )
         self.worker.progress_signal.connect(self.update_progress)
         self.worker.finished_signal.connect(self.process_finished)
         self.worker.log_signal.connect(self.update_log)
         self.worker.status_signal.connect(self.update_status)
+        self.worker.throughput_signal.connect(self.update_throughput)
         self.worker.captcha_signal.connect(
             self.show_captcha_dialog
         )  # Conectar o sinal de captcha
@@ -1173,61 +2078,74 @@ class DUAAutomationUI(QMainWindow):
 
     def stop_processing(self):
         if self.worker and self.worker.isRunning():
-            reply = QMessageBox.question(
-                self,
-                "Confirmar",
-                "Deseja realmente interromper o processamento?",
-                QMessageBox.StandardButton.Yes | QMessageBox.StandardButton.No,
+            if self.worker.token.draining:
+                # Segundo clique durante a drenagem: parar de imediato
+                self.stop_now()
+                return
+
+            box = QMessageBox(self)
+            box.setWindowTitle("Confirmar")
+            box.setIcon(QMessageBox.Icon.Question)
+            box.setText("Como deseja interromper o processamento?")
+            stop_now_btn = box.addButton(
+                "Parar agora", QMessageBox.ButtonRole.DestructiveRole
+            )
+            drain_btn = box.addButton(
+                "Concluir itens em andamento", QMessageBox.ButtonRole.AcceptRole
             )
+            box.addButton("Continuar", QMessageBox.ButtonRole.RejectRole)
+            box.exec()
 
-            if reply == QMessageBox.StandardButton.Yes:
+            if box.clickedButton() is stop_now_btn:
+                self.stop_now()
+            elif box.clickedButton() is drain_btn:
+                self.worker.drain()
                 self.log_text.append_log(
-                    LogMessage("⚠️ Interrompendo processamento...", LogMessage.WARNING)
+                    LogMessage(
+                        "⏹️ Nenhum item novo será iniciado; concluindo os itens em andamento...",
+                        LogMessage.WARNING,
+                    )
                 )
-                self.status_label.setText("Status: Interrompendo processamento...")
+                self.status_label.setText("Status: Concluindo itens em andamento...")
+                self.stop_btn.setText("Parar agora")
 
-                # Improved stop operation
-                try:
-                    self.worker.stop()
-                    # Signal UI that we're stopping
-                    self.stop_btn.setEnabled(False)
-                    self.stop_btn.setText("Parando...")
-
-                    # Give visual feedback that stop was requested
-                    self.statusBar.showMessage(
-                        "Aguardando término das operações em andamento..."
-                    )
+    def stop_now(self):
+        self.log_text.append_log(
+            LogMessage("⚠️ Interrompendo processamento...", LogMessage.WARNING)
+        )
+        self.status_label.setText("Status: Interrompendo processamento...")
 
-                    # Optional: Force quit after timeout (uncomment if needed)
-                    # QTimer.singleShot(10000, self.force_stop)
-                except Exception as e:
-                    self.log_text.append_log(
-                        LogMessage(f"Erro ao tentar parar: {str(e)}", LogMessage.ERROR)
-                    )
+        try:
+            # Todas as esperas consultam o token a cada 200 ms
+            self.worker.stop()
+            self.stop_btn.setEnabled(False)
+            self.stop_btn.setText("Parando...")
+            self.statusBar.showMessage(
+                "Aguardando término das operações em andamento..."
+            )
+
+            # Uma chamada WebDriver travada não vê o token; encerrar o navegador após 1 s
+            QTimer.singleShot(1000, self.force_stop)
+        except Exception as e:
+            self.log_text.append_log(
+                LogMessage(f"Erro ao tentar parar: {str(e)}", LogMessage.ERROR)
+            )
 
     def force_stop(self):
         """Emergency force stop if regular stop doesn't work"""
         if self.worker and self.worker.isRunning():
             try:
-                # Try to terminate the thread (more forceful)
-                self.worker.terminate()
+                # Matar o navegador faz a chamada pendente falhar e a thread terminar
+                # normalmente, sem QThread.terminate()
+                from get_dua import abort_browser
+
+                abort_browser()
                 self.log_text.append_log(
                     LogMessage(
-                        "Processamento terminado forçadamente", LogMessage.WARNING
+                        "Navegador encerrado para interromper uma operação travada",
+                        LogMessage.WARNING,
                     )
                 )
-
-                # Update UI
-                self.start_btn.setEnabled(True)
-                self.stop_btn.setEnabled(False)
-                self.stop_btn.setText("Parar")
-                self.select_file_btn.setEnabled(True)
-                self.statusBar.showMessage("Processamento interrompido forçadamente")
-
-                # Close browser if it's still open
-                from get_dua import close_browser
-
-                close_browser()
             except Exception as e:
                 self.log_text.append_log(
                     LogMessage(f"Erro ao forçar parada: {str(e)}", LogMessage.ERROR)
@@ -1238,6 +2156,11 @@ class DUAAutomationUI(QMainWindow):
         percentage = int(current / total * 100)
         self.statusBar.showMessage(f"Processando... {percentage}%")
 
+    def update_throughput(self, rows_per_minute, active, limit):
+        self.throughput_label.setText(
+            f"{rows_per_minute:.1f} itens/min · {active}/{limit} navegador(es) ativo(s)"
+        )
+
     def update_log(self, message):
         self.log_text.append_log(message)
         # Update counters based on message type
@@ -1260,47 +2183,43 @@ class DUAAutomationUI(QMainWindow):
         else:
             self.status_label.setStyleSheet("font-weight: bold;")
 
-    def show_captcha_dialog(self):
-        """Exibe o diálogo de resolução manual de CAPTCHA"""
+    def show_captcha_dialog(self, request):
+        """Exibe (sem bloquear) a fila de CAPTCHAs para resolução manual"""
+        row_label = (
+            f"item {request.row_index + 1}" if request.row_index is not None else "item"
+        )
         self.log_text.append_log(
             LogMessage(
-                "⚠️ O CAPTCHA não pôde ser resolvido automaticamente!",
+                f"⚠️ O CAPTCHA do {row_label} não pôde ser resolvido automaticamente!",
                 LogMessage.WARNING,
             )
         )
         self.log_text.append_log(
             LogMessage(
-                "🔐 Por favor, resolva o CAPTCHA manualmente no navegador.",
+                "🔐 A linha ficou numa aba própria do navegador; resolva quando puder.",
                 LogMessage.WARNING,
             )
         )
 
         # Importar apenas quando necessário
-        from get_dua import captcha_solved_signal
+        from get_dua import manual_captcha_queue
 
-        # Criar e exibir o diálogo
-        captcha_dialog = CaptchaDialog(
-            self, captcha_solved_callback=captcha_solved_signal
-        )
-        result = captcha_dialog.exec()
-
-        if result == QDialog.DialogCode.Accepted:
-            self.log_text.append_log(
-                LogMessage(
-                    "✅ CAPTCHA resolvido manualmente pelo usuário.", LogMessage.SUCCESS
-                )
-            )
-        else:
-            self.log_text.append_log(
-                LogMessage(
-                    "❌ Resolução de CAPTCHA cancelada pelo usuário.", LogMessage.ERROR
-                )
+        # Um único diálogo não modal lista todas as linhas pendentes
+        if self.captcha_dialog is None:
+            self.captcha_dialog = CaptchaDialog(
+                self, captcha_queue=manual_captcha_queue
             )
-            self.stop_processing()
+        self.captcha_dialog.refresh()
+        self.captcha_dialog.show()
+        self.captcha_dialog.raise_()
 
     def process_finished(self, success):
+        if self.captcha_dialog is not None:
+            self.captcha_dialog.hide()
+
         self.start_btn.setEnabled(True)
         self.stop_btn.setEnabled(False)
+        self.stop_btn.setText("Parar")
         self.select_file_btn.setEnabled(True)
 
         if success:
@@ -1316,6 +2235,9 @@ class DUAAutomationUI(QMainWindow):
             LogMessage("Processamento concluído!", LogMessage.SUCCESS)
         )
 
+        # Deixar um navegador pronto para a próxima execução
+        self.warm_up_browser()
+
     def closeEvent(self, event):
         self.saveSettings()
 
@@ -1329,13 +2251,27 @@ class DUAAutomationUI(QMainWindow):
 
             if reply == QMessageBox.StandardButton.Yes:
                 self.worker.stop()
-                self.worker.wait()
+                if not self.worker.wait(1000):
+                    # Operação WebDriver travada: encerrar o navegador para liberar a thread
+                    self.force_stop()
+                    self.worker.wait()
+                self.discard_warm_browser()
                 event.accept()
             else:
                 event.ignore()
         else:
+            self.discard_warm_browser()
             event.accept()
 
+    def discard_warm_browser(self):
+        """Fecha o navegador pré-iniciado que não chegou a ser usado"""
+        try:
+            from get_dua import discard_warm_drivers
+
+            discard_warm_drivers()
+        except Exception as e:
+            print(f"Erro ao fechar navegador pré-iniciado: {e}")
+
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)